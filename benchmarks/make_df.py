@@ -0,0 +1,132 @@
+"""
+Benchmark building a data frame from a ``json_bi`` result versus the same
+result fetched as ``csv`` (see :mod:`looker_powerpoint.csv_results`).
+
+Both paths start from the response as received, so JSON decoding and CSV
+parsing are included, and both must produce the same frame.
+
+Run from the repository root::
+
+    python -m benchmarks.make_df [--rows 100000] [--repeat 3]
+"""
+
+import argparse
+import csv
+import io
+import json
+import time
+from unittest.mock import patch
+
+import pandas as pd
+
+from looker_powerpoint.cli import Cli
+from looker_powerpoint.models import QueryResult
+
+FIELDS = [
+    {
+        "name": "orders.created_date",
+        "category": "dimension",
+        "label": "Orders Created Date",
+        "field_group_variant": "Created Date",
+    },
+    {
+        "name": "orders.region",
+        "category": "dimension",
+        "label": "Orders Region",
+        "field_group_variant": "Region",
+    },
+    {
+        "name": "orders.revenue",
+        "category": "measure",
+        "label": "Orders Revenue",
+        "field_group_variant": "Revenue",
+        "is_numeric": True,
+    },
+    {
+        "name": "orders.cost",
+        "category": "measure",
+        "label": "Orders Cost",
+        "field_group_variant": "Cost",
+        "is_numeric": True,
+    },
+    {
+        "name": "orders.count",
+        "category": "measure",
+        "label": "Orders Count",
+        "field_group_variant": "Count",
+        "is_numeric": True,
+    },
+]
+
+
+def _rows(n):
+    regions = ["North", "South", "East", "West"]
+    for i in range(n):
+        yield [
+            f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+            regions[i % 4],
+            round(i * 1.25, 2),
+            round(i * 0.75, 2),
+            i % 97,
+        ]
+
+
+def make_payloads(n):
+    """The same ``n`` rows as a ``json_bi`` and a ``csv`` response."""
+    metadata = QueryResult(fields=FIELDS).metadata_fields()
+    json_bi = json.dumps(
+        {
+            "metadata": {"fields": metadata},
+            "rows": [
+                {f["name"]: {"value": v} for f, v in zip(FIELDS, row)}
+                for row in _rows(n)
+            ],
+        }
+    ).encode("utf-8")
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow([f["label"] for f in FIELDS])
+    writer.writerows(_rows(n))
+    return json_bi, buffer.getvalue().encode("utf-8")
+
+
+def _best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with patch("os.getenv", return_value="dummy_value"):
+        cli = Cli()
+    json_bi, csv_payload = make_payloads(args.rows)
+
+    json_time, json_df = _best_of(
+        args.repeat,
+        lambda: cli._make_df(QueryResult.from_payload(json_bi, "json_bi")),
+    )
+    csv_time, csv_df = _best_of(
+        args.repeat,
+        lambda: cli._make_df(
+            QueryResult.from_payload(csv_payload, "csv", fields=FIELDS)
+        ),
+    )
+    pd.testing.assert_frame_equal(json_df, csv_df)
+
+    print(f"{args.rows} rows, best of {args.repeat}")
+    print(f"  json_bi: {json_time:8.3f}s  {len(json_bi) / 1e6:7.1f} MB")
+    print(f"  csv:     {csv_time:8.3f}s  {len(csv_payload) / 1e6:7.1f} MB")
+    print(f"  speedup: {json_time / csv_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
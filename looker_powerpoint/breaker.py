@@ -0,0 +1,170 @@
+"""
+Circuit breaker for the Looker API.
+
+During a Looker incident every shape would otherwise time out and retry on its
+own, so a run takes hours to fail.  :class:`CircuitBreaker` watches the
+outcome of the most recent Looker calls and *opens* once too many of them fail
+with errors an outage causes (see :func:`~looker_powerpoint.retry.is_retryable`:
+timeouts, connection errors, 429 and 5xx responses).  While open, every call
+fails at once with :class:`CircuitOpenError`, which is not retried, so the
+remaining shapes are marked as failed within seconds.
+
+After ``cooldown`` seconds the circuit *half-opens*: the next call is let
+through as a probe while the others keep failing fast.  A successful probe
+closes the circuit and the run carries on normally; a failed one opens it
+again for another cooldown.  Errors that say nothing about Looker's health,
+such as a missing Look, count as successful calls.
+"""
+
+import collections
+import logging
+import threading
+import time
+
+import looker_sdk
+
+# Fraction of failed calls that opens the circuit when
+# --circuit-breaker-error-rate / CIRCUIT_BREAKER_ERROR_RATE is not set.
+DEFAULT_ERROR_RATE = 0.5
+# Seconds the circuit stays open before a probe is let through when
+# --circuit-breaker-cooldown / CIRCUIT_BREAKER_COOLDOWN is not set.
+DEFAULT_COOLDOWN = 30.0
+# The error rate is taken over the outcomes of the last WINDOW calls, once at
+# least MIN_CALLS have completed.
+WINDOW = 20
+MIN_CALLS = 5
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(looker_sdk.error.SDKError):
+    """Raised instead of calling Looker while the circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker shared by all Looker calls of a run.
+
+    Callers ask :meth:`before_call` for permission and report the outcome with
+    :meth:`record_success` or :meth:`record_failure`, or :meth:`record_cancelled`
+    if the call was abandoned without an outcome. :meth:`check` rejects calls
+    early, e.g. before they queue for a rate limit.
+
+    Args:
+        error_rate: Fraction of failed calls among the recent ones that opens
+            the circuit. ``0`` or less disables the breaker.
+        cooldown: Seconds the circuit stays open before half-opening.
+        window: Number of recent calls the error rate is taken over.
+        min_calls: Calls that must have completed before the circuit can open.
+    """
+
+    def __init__(
+        self,
+        error_rate: float = DEFAULT_ERROR_RATE,
+        cooldown: float = DEFAULT_COOLDOWN,
+        window: int = WINDOW,
+        min_calls: int = MIN_CALLS,
+    ):
+        self.error_rate = error_rate
+        self.cooldown = max(0.0, cooldown)
+        self.min_calls = max(1, min_calls)
+        self.state = CLOSED
+        self.rejected = 0
+        self.times_opened = 0
+        self._outcomes = collections.deque(maxlen=max(self.min_calls, window))
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.error_rate > 0
+
+    def before_call(self):
+        """
+        Let a call through, or raise :class:`CircuitOpenError` while the
+        circuit is open or a probe is already in flight.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    self._reject()
+                logging.info("Looker circuit breaker half-open; probing Looker.")
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    self._reject()
+                self._probing = True
+
+    def check(self):
+        """
+        Raise :class:`CircuitOpenError` if :meth:`before_call` would, without
+        letting a call through or taking the probe.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    self._reject()
+            elif self.state == HALF_OPEN and self._probing:
+                self._reject()
+
+    def _reject(self):
+        self.rejected += 1
+        raise CircuitOpenError(
+            "Looker circuit breaker is open after repeated failures; not calling Looker."
+        )
+
+    def record_success(self):
+        """Report a call that completed, or failed for reasons other than an outage."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self.state == OPEN:
+                return
+            if self.state == HALF_OPEN:
+                logging.warning("Looker recovered; circuit breaker closed.")
+                self.state = CLOSED
+                self._probing = False
+                self._outcomes.clear()
+            self._outcomes.append(True)
+
+    def record_failure(self):
+        """Report a call that failed the way calls fail during an outage."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._open("the probe failed")
+                return
+            if self.state == OPEN:
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if (
+                len(self._outcomes) >= self.min_calls
+                and failures / len(self._outcomes) >= self.error_rate
+            ):
+                self._open(f"{failures} of the last {len(self._outcomes)} calls failed")
+
+    def record_cancelled(self):
+        """Report a call abandoned without an outcome, freeing the probe."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = False
+
+    def _open(self, reason: str):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._probing = False
+        self.times_opened += 1
+        logging.warning(
+            f"Looker circuit breaker opened ({reason}); failing Looker calls for "
+            f"{self.cooldown:g}s before probing again."
+        )
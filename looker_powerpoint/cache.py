@@ -0,0 +1,286 @@
+"""
+Persistent on-disk cache for Looker query results and Look definitions.
+
+Results are stored in a single SQLite file keyed by
+:func:`~looker_powerpoint.looker.query_fingerprint` of the query, the Looker
+instance and the API user, so re-rendering a deck within the TTL does not
+re-run its warehouse queries, and runs against other instances or as other
+users sharing the cache directory do not get each other's results.  Entries older than the
+TTL are ignored on read and removed by :meth:`QueryCache.evict`, which also
+drops the least recently used entries once the file grows beyond its size
+limit.
+
+Look definitions are kept alongside, together with the Look's ``updated_at``.
+Within the TTL of when they were fetched or last checked they are used as they
+are, so re-rendering a deck within the TTL does not call Looker at all.  They
+do not expire with the TTL though: after it, callers revalidate them against
+Looker with a lightweight request and only refetch Looks that have changed.
+The tiles of dashboards are stored the same way, under a ``dashboard:<id>``
+key, and the fields of explores under an ``explore:<model>::<explore>`` key;
+explores have no ``updated_at`` and are fetched again once the TTL is over.
+
+The cache also indexes the ids of the query objects saved on the Looker
+instance, so an identical query is run by id (``run_query``) instead of being
+saved again, and hits Looker's own result cache across runs and decks.  Ids
+do not expire with the TTL either; callers forget an id Looker no longer knows.
+"""
+
+import logging
+import os
+import sqlite3
+import time
+from typing import Optional, Union
+
+# Seconds a cached result stays valid when --cache-ttl / CACHE_TTL is not set.
+DEFAULT_TTL = 3600
+# Total size of cached results in bytes before least recently used entries
+# are evicted, when --cache-max-size / CACHE_MAX_SIZE is not set.
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Look definitions and query ids that have not been used for this many seconds
+# are evicted.
+LOOK_RETENTION = 30 * 24 * 3600
+QUERY_ID_RETENTION = 30 * 24 * 3600
+
+CACHE_FILE_NAME = "cache.sqlite3"
+
+
+def default_cache_dir() -> str:
+    """Return the per-user cache directory, honouring ``XDG_CACHE_HOME``."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "looker_powerpoint")
+
+
+class QueryCache:
+    """
+    SQLite-backed store of query results with a TTL and a total size limit,
+    plus Look definitions keyed by Look id and Looker query ids keyed by query
+    fingerprint.
+
+    Args:
+        cache_dir: Directory holding the cache file. Created if missing.
+        ttl: Seconds a result stays valid.
+        max_bytes: Total size of stored results before LRU eviction kicks in.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        ttl: int = DEFAULT_TTL,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.path = os.path.join(self.cache_dir, CACHE_FILE_NAME)
+        # Several lppt processes may share the cache on a build agent.  Within
+        # a run, LookerClient uses the connection from a single cache thread.
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                is_text INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS looks (
+                look_id TEXT PRIMARY KEY,
+                updated_at TEXT NOT NULL,
+                query BLOB NOT NULL,
+                accessed_at REAL NOT NULL,
+                checked_at REAL NOT NULL DEFAULT 0
+            )
+            """
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(looks)")]
+        if "checked_at" not in columns:
+            # Cache files written before definitions were trusted within the TTL.
+            self._conn.execute(
+                "ALTER TABLE looks ADD COLUMN checked_at REAL NOT NULL DEFAULT 0"
+            )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS query_ids (
+                key TEXT PRIMARY KEY,
+                query_id TEXT NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Union[str, bytes]]:
+        """
+        Return the cached result for ``key``, or ``None`` if missing or expired.
+        """
+        now = time.time()
+        row = self._conn.execute(
+            "SELECT value, is_text, created_at FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, is_text, created_at = row
+        if now - created_at > self.ttl:
+            return None
+        self._conn.execute(
+            "UPDATE results SET accessed_at = ? WHERE key = ?", (now, key)
+        )
+        self._conn.commit()
+        return value.decode("utf-8") if is_text else bytes(value)
+
+    def cached_size(self, key: str) -> Optional[int]:
+        """
+        Return the size in bytes of the valid cached result for ``key``, or
+        ``None`` if missing or expired, without counting it as used.
+        """
+        row = self._conn.execute(
+            "SELECT size, created_at FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return row[0]
+
+    def set(self, key: str, value: Union[str, bytes]):
+        """Store ``value`` (text or bytes) under ``key``."""
+        is_text = isinstance(value, str)
+        blob = value.encode("utf-8") if is_text else bytes(value)
+        now = time.time()
+        self._conn.execute(
+            """
+            INSERT OR REPLACE INTO results
+                (key, value, is_text, size, created_at, accessed_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (key, blob, int(is_text), len(blob), now, now),
+        )
+        self._conn.commit()
+
+    def get_look(self, look_id: str) -> Optional[tuple]:
+        """
+        Return ``(updated_at, query_json)`` stored for a Look, or ``None``.
+        """
+        row = self._conn.execute(
+            "SELECT updated_at, query FROM looks WHERE look_id = ?", (look_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        self._conn.execute(
+            "UPDATE looks SET accessed_at = ? WHERE look_id = ?",
+            (time.time(), look_id),
+        )
+        self._conn.commit()
+        return row[0], bytes(row[1])
+
+    def set_look(self, look_id: str, updated_at: str, query_json: bytes):
+        """Store the serialized query of a Look together with its ``updated_at``."""
+        now = time.time()
+        self._conn.execute(
+            """
+            INSERT OR REPLACE INTO looks
+                (look_id, updated_at, query, accessed_at, checked_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (look_id, updated_at, query_json, now, now),
+        )
+        self._conn.commit()
+
+    def look_is_fresh(self, look_id: str) -> bool:
+        """
+        Whether the Look stored for ``look_id`` was fetched or checked against
+        Looker within the TTL, so it can be used without asking Looker.
+        """
+        row = self._conn.execute(
+            "SELECT checked_at FROM looks WHERE look_id = ?", (look_id,)
+        ).fetchone()
+        return row is not None and time.time() - row[0] <= self.ttl
+
+    def mark_look_checked(self, look_id: str):
+        """Record that the Look stored for ``look_id`` is still current."""
+        self._conn.execute(
+            "UPDATE looks SET checked_at = ? WHERE look_id = ?", (time.time(), look_id)
+        )
+        self._conn.commit()
+
+    def get_query_id(self, key: str) -> Optional[str]:
+        """Return the Looker query id stored for a query fingerprint, or ``None``."""
+        row = self._conn.execute(
+            "SELECT query_id FROM query_ids WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        self._conn.execute(
+            "UPDATE query_ids SET accessed_at = ? WHERE key = ?", (time.time(), key)
+        )
+        self._conn.commit()
+        return row[0]
+
+    def set_query_id(self, key: str, query_id: str):
+        """Store the Looker query id of a query fingerprint."""
+        self._conn.execute(
+            """
+            INSERT OR REPLACE INTO query_ids (key, query_id, accessed_at)
+            VALUES (?, ?, ?)
+            """,
+            (key, str(query_id), time.time()),
+        )
+        self._conn.commit()
+
+    def forget_query_id(self, key: str):
+        """Drop the query id stored for a query fingerprint."""
+        self._conn.execute("DELETE FROM query_ids WHERE key = ?", (key,))
+        self._conn.commit()
+
+    def size(self) -> int:
+        """Total size in bytes of the stored results."""
+        return self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM results"
+        ).fetchone()[0]
+
+    def evict(self):
+        """
+        Remove expired entries, then the least recently used ones until the
+        total size is within ``max_bytes``.
+        """
+        now = time.time()
+        expired = self._conn.execute(
+            "DELETE FROM results WHERE created_at < ?", (now - self.ttl,)
+        ).rowcount
+        self._conn.execute(
+            "DELETE FROM looks WHERE accessed_at < ?", (now - LOOK_RETENTION,)
+        )
+        self._conn.execute(
+            "DELETE FROM query_ids WHERE accessed_at < ?", (now - QUERY_ID_RETENTION,)
+        )
+
+        total = self.size()
+        evicted = 0
+        if total > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM results ORDER BY accessed_at ASC"
+            ).fetchall()
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                total -= size
+                evicted += 1
+        self._conn.commit()
+
+        if expired or evicted:
+            logging.debug(
+                f"Query cache: removed {expired} expired and {evicted} least recently used entries."
+            )
+
+    def close(self):
+        self._conn.close()
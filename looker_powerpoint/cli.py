@@ -1,13 +1,30 @@
+"""
+The ``lppt`` command line interface.
+
+:class:`Cli` scans a deck slide by slide (``_discover_shapes``) and submits each
+shape's query to :class:`~looker_powerpoint.looker.LookerClient` as soon as it
+is found. It renders each shape on a single render thread (``_render_shape``)
+as soon as its result arrives. With ``--deadline``, outstanding queries are
+cancelled once the run is out of time and their shapes are marked as failed
+(``_abandon``). Several ``--filter`` values render one deck per value from the
+same template (``get_variant_queries``). ``--plan`` describes every shape's
+query without running it (``get_plan``).
+"""
+
 import argparse
 import asyncio
 import collections
+import copy
 import datetime
+import hashlib
 import io
 import json
 import logging
 import os
 import re
 import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 
 import pandas as pd
@@ -20,13 +37,24 @@ from pptx.util import Pt
 from pydantic import ValidationError
 from rich.logging import RichHandler
 from rich_argparse import RichHelpFormatter
-import requests
 
 from looker_powerpoint import gemini as gemini_module
+from looker_powerpoint import csv_results, pushdown
+from looker_powerpoint import plan as plan_module
+from looker_powerpoint.breaker import DEFAULT_COOLDOWN, DEFAULT_ERROR_RATE
+from looker_powerpoint.cache import (
+    DEFAULT_MAX_BYTES,
+    DEFAULT_TTL,
+    QueryCache,
+    default_cache_dir,
+)
 from looker_powerpoint.looker import LookerClient
-from looker_powerpoint.models import LookerShape, GeminiShape
+from looker_powerpoint.retry import DEFAULT_RETRY_BUDGET
+from looker_powerpoint.tokens import TokenCache
+from looker_powerpoint.models import LookerShape, GeminiShape, QueryResult
 from looker_powerpoint.tools.find_alt_text import (
     get_presentation_objects_with_descriptions,
+    iter_slide_descriptions,
 )
 from looker_powerpoint.tools.pptx_text_handler import (
     process_text_field,
@@ -45,22 +73,133 @@ class Cli:
 
     def __init__(self):
         self.client = None
-        self.relevant_shapes = []
-        self.looker_shapes = []
-        self.gemini_shapes = []
-        self.data = {}
+        self._reset_deck_state()
+        # The value applied to the shapes' filter dimension, or None.
+        self.filter_value = None
+        # With several filter values, the value this copy of the deck is
+        # rendered for, and the name of its output file it is reduced to.
+        self.variant = None
+        self.variant_name = None
+        # The alternative text of the deck's shapes per slide, when read once
+        # for several copies of the deck, or None to read it from the deck.
+        self.slide_descriptions = None
+        # time.monotonic() by which all queries must have finished, or None.
+        self.deadline = None
 
         # Initialize the argument parser
         self.parser = self._init_argparser()
 
         # load tools
         self.get_alt_text = get_presentation_objects_with_descriptions
+        self.iter_alt_text = iter_slide_descriptions
+
+    def _reset_deck_state(self):
+        """Forget the shapes and results of the deck being rendered."""
+        self.relevant_shapes = []
+        self.looker_shapes = []
+        self.gemini_shapes = []
+        self.references_found = 0
+        self.data = {}
+        # (slide_number, shape_number) of the shapes already rendered.
+        self._rendered = set()
 
     def _init_looker(self):
         """Initialize the Looker client"""
         if not self.args.debug_queries:
             logging.getLogger("looker_sdk").setLevel(logging.ERROR)
-        self.client = LookerClient()
+        self.client = LookerClient(
+            max_workers=self.args.max_workers,
+            async_transport=self.args.async_transport,
+            cache=self._init_cache(),
+            query_tasks=self.args.query_tasks,
+            max_concurrent=self.args.max_concurrent_queries,
+            requests_per_second=self.args.requests_per_second,
+            retry_budget=self.args.retry_budget,
+            csv_results=self.args.csv_results,
+            prefer_cached=self.args.prefer_cached,
+            cache_only=self.args.cache_only,
+            token_cache=self._init_token_cache(),
+            max_connections_per_host=self.args.max_connections_per_host,
+            query_timeout=self.args.query_timeout,
+            circuit_breaker_error_rate=self.args.circuit_breaker_error_rate,
+            circuit_breaker_cooldown=self.args.circuit_breaker_cooldown,
+            deadline=self.deadline,
+        )
+
+    def _init_deadline(self):
+        """
+        Return the ``time.monotonic()`` by which all queries must have finished,
+        counted from now, or None without --deadline.
+        """
+        seconds = self.args.deadline
+        if seconds is None:
+            seconds = float(os.environ.get("DEADLINE", "0"))
+        if not seconds:
+            return None
+        self.args.deadline = seconds
+        return time.monotonic() + seconds
+
+    def _filter_values(self):
+        """
+        Return the filter values given with --filter and --filter-file, in order
+        and without duplicates. One deck is rendered per value.
+        """
+        values = list(self.args.filter or [])
+        if self.args.filter_file:
+            try:
+                with open(self.args.filter_file, encoding="utf-8") as f:
+                    lines = f.readlines()
+            except (OSError, UnicodeDecodeError) as e:
+                logging.error(f"Error reading {self.args.filter_file}: {e}")
+                exit(1)
+            for line in lines:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    values.append(line)
+        return list(dict.fromkeys(values))
+
+    def _init_token_cache(self):
+        """
+        Return the store of access tokens shared across runs, or None when
+        --no-token-cache is set. It lives in the cache directory.
+        """
+        if self.args.no_token_cache:
+            return None
+        return TokenCache(
+            self.args.cache_dir or os.environ.get("CACHE_DIR") or default_cache_dir()
+        )
+
+    def _init_cache(self):
+        """
+        Open the on-disk query result cache, or return None when it is disabled.
+
+        Command line arguments take precedence over the CACHE_TTL, CACHE_DIR and
+        CACHE_MAX_SIZE environment variables.
+        """
+        if self.args.no_cache:
+            return None
+        ttl = self.args.cache_ttl
+        if ttl is None:
+            ttl = int(os.environ.get("CACHE_TTL", DEFAULT_TTL))
+        if ttl <= 0:
+            return None
+        cache_dir = (
+            self.args.cache_dir or os.environ.get("CACHE_DIR") or default_cache_dir()
+        )
+        max_size = self.args.cache_max_size
+        if max_size is None and os.environ.get("CACHE_MAX_SIZE"):
+            max_size = int(os.environ["CACHE_MAX_SIZE"])
+        max_bytes = (
+            max_size * 1024 * 1024 if max_size is not None else DEFAULT_MAX_BYTES
+        )
+        try:
+            cache = QueryCache(cache_dir, ttl=ttl, max_bytes=max_bytes)
+            cache.evict()
+        except Exception as e:
+            logging.warning(f"Could not open the query cache in {cache_dir}: {e}")
+            return None
+        logging.debug(f"Using query cache {cache.path} with a TTL of {ttl}s.")
+        return cache
 
     def _init_argparser(self):
         """Create and configure the argument parser"""
@@ -133,8 +272,33 @@ class Cli:
 
         parser.add_argument(
             "--filter",
-            help="""use the string to filter shapes if they have a set filter dimension""",
+            help="""use the string to filter shapes if they have a set filter dimension.
+                Several values render one deck per value in a single run.""",
+            action="store",
+            nargs="+",
+            default=None,
+            type=str,
+        )
+
+        parser.add_argument(
+            "--filter-file",
+            help="""Path to a file with one filter value per line, rendering one deck per
+                value like several --filter values. Blank lines and lines starting
+                with '#' are ignored.""",
+            action="store",
+            default=None,
+            type=str,
+        )
+
+        parser.add_argument(
+            "--plan",
+            help="""Run no queries; instead print the deck's query plan as JSON, or write it
+                to the given file: the distinct Looks and queries, the dedup ratio, the
+                results expected from the result cache and each shape's rows, fields
+                and estimated payload size.""",
             action="store",
+            nargs="?",
+            const="-",
             default=None,
             type=str,
         )
@@ -147,6 +311,197 @@ class Cli:
             default=False,
         )
 
+        parser.add_argument(
+            "--max-workers",
+            help="""Maximum number of Looker queries to run concurrently. \n
+                .env: MAX_WORKERS""",
+            action="store",
+            default=None,
+            type=int,
+        )
+
+        parser.add_argument(
+            "--max-concurrent-queries",
+            help="""Maximum number of Looker API calls in flight at once across the run.
+                Defaults to --max-workers. \n
+                .env: MAX_CONCURRENT_QUERIES""",
+            action="store",
+            default=None,
+            type=int,
+        )
+
+        parser.add_argument(
+            "--max-connections-per-host",
+            help="""Maximum number of connections kept open to, and used at once with,
+                each host: the Looker instance and the hosts of downloaded images.
+                Defaults to --max-workers. \n
+                .env: MAX_CONNECTIONS_PER_HOST""",
+            action="store",
+            default=None,
+            type=int,
+        )
+
+        parser.add_argument(
+            "--query-timeout",
+            help="""Seconds a single Looker query may take once it is sent, not counting
+                the wait for a slot or the request rate limit, before it is given
+                up on and its shape marked as failed. Defaults to no limit. \n
+                .env: QUERY_TIMEOUT""",
+            action="store",
+            default=None,
+            type=float,
+        )
+
+        parser.add_argument(
+            "--deadline",
+            help="""Seconds after the start of the run by which all queries must have
+                finished. Queries still running then are cancelled, their shapes
+                marked as failed and the deck saved with everything else. \n
+                .env: DEADLINE""",
+            action="store",
+            default=None,
+            type=float,
+        )
+
+        parser.add_argument(
+            "--requests-per-second",
+            help="""Maximum number of Looker API calls and image downloads started per
+                second. 0 means no limit. \n
+                .env: REQUESTS_PER_SECOND""",
+            action="store",
+            default=None,
+            type=float,
+        )
+
+        parser.add_argument(
+            "--retry-budget",
+            help=f"""Maximum number of query retries across the whole run. Shapes opt in
+                to retries with 'retries' in their alternative text. Defaults to {DEFAULT_RETRY_BUDGET}. \n
+                .env: RETRY_BUDGET""",
+            action="store",
+            default=None,
+            type=int,
+        )
+
+        parser.add_argument(
+            "--circuit-breaker-error-rate",
+            help=f"""Fraction of recent Looker calls that must fail with timeouts, connection
+                or server errors before all further calls fail fast, marking their shapes
+                as failed. 0 disables the circuit breaker. Defaults to {DEFAULT_ERROR_RATE}. \n
+                .env: CIRCUIT_BREAKER_ERROR_RATE""",
+            action="store",
+            default=None,
+            type=float,
+        )
+
+        parser.add_argument(
+            "--circuit-breaker-cooldown",
+            help=f"""Seconds calls fail fast once the circuit breaker has opened, before a
+                single call probes whether Looker has recovered. Defaults to {DEFAULT_COOLDOWN:g}. \n
+                .env: CIRCUIT_BREAKER_COOLDOWN""",
+            action="store",
+            default=None,
+            type=float,
+        )
+
+        parser.add_argument(
+            "--async-transport",
+            help="""Talk to Looker through a native asyncio HTTP transport instead of
+                one worker thread per request. Requires the 'async' extra. \n
+                .env: ASYNC_TRANSPORT""",
+            action="store_true",
+            default=False,
+        )
+
+        parser.add_argument(
+            "--query-tasks",
+            help="""Submit queries as Looker query tasks and poll for their results in
+                batches instead of holding one connection open per query. \n
+                .env: QUERY_TASKS""",
+            action="store_true",
+            default=False,
+        )
+
+        parser.add_argument(
+            "--csv-results",
+            help="""Fetch plain Look results as CSV and parse them with pandas' C engine
+                instead of decoding json_bi, which is much faster for large Looks. \n
+                .env: CSV_RESULTS""",
+            action="store_true",
+            default=False,
+        )
+
+        parser.add_argument(
+            "--no-pushdown",
+            help="""Always request every field and row of a Look, even when the shapes
+                using it only read some of its measures or rows.""",
+            action="store_true",
+            default=False,
+        )
+
+        parser.add_argument(
+            "--no-cache",
+            help="""Always run queries against Looker instead of reusing cached results.""",
+            action="store_true",
+            default=False,
+        )
+
+        parser.add_argument(
+            "--no-token-cache",
+            help="""Log in to Looker on every run instead of reusing the access token
+                of an earlier run.""",
+            action="store_true",
+            default=False,
+        )
+
+        parser.add_argument(
+            "--prefer-cached",
+            help="""Take query results from Looker's own result cache when it has them,
+                even if they have expired, and only query the warehouse for the rest. \n
+                .env: PREFER_CACHED""",
+            action="store_true",
+            default=False,
+        )
+
+        parser.add_argument(
+            "--cache-only",
+            help="""Only take query results from Looker's own result cache; shapes
+                without a cached result are marked as failed instead of querying
+                the warehouse. \n
+                .env: CACHE_ONLY""",
+            action="store_true",
+            default=False,
+        )
+
+        parser.add_argument(
+            "--cache-ttl",
+            help=f"""Seconds a cached query result stays valid. 0 disables the cache.
+                Defaults to {DEFAULT_TTL}. \n
+                .env: CACHE_TTL""",
+            action="store",
+            default=None,
+            type=int,
+        )
+
+        parser.add_argument(
+            "--cache-dir",
+            help="""Directory for the query result cache. Defaults to ~/.cache/looker_powerpoint. \n
+                .env: CACHE_DIR""",
+            action="store",
+            default=None,
+            type=str,
+        )
+
+        parser.add_argument(
+            "--cache-max-size",
+            help=f"""Maximum size of the query result cache in MB before the least
+                recently used results are evicted. Defaults to {DEFAULT_MAX_BYTES // (1024 * 1024)}. \n
+                .env: CACHE_MAX_SIZE""",
+            action="store",
+            default=None,
+            type=int,
+        )
+
         parser.add_argument(
             "-v",
             "--verbose",
@@ -608,7 +963,13 @@ class Cli:
         # Stores synthesized text keyed by gemini_id for chaining
         gemini_results: dict[str, str] = {}
 
-        for gemini_shape in ordered_shapes:
+        for i, gemini_shape in enumerate(ordered_shapes):
+            if self._time_left() == 0:
+                logging.warning(
+                    f"Deadline of {self.args.deadline:g}s reached; "
+                    f"skipped Gemini synthesis of {len(ordered_shapes) - i} shapes."
+                )
+                break
             slide = self.presentation.slides[gemini_shape.slide_number]
             current_shape = None
             for shape in slide.shapes:
@@ -695,14 +1056,25 @@ class Cli:
         """
         Create a pandas DataFrame from Looker data based on the integration settings.
         Categorizes and sorts columns into Dimensions -> Pivots -> Table Calcs.
+
+        Args:
+            result: A ``QueryResult`` (JSON, or csv with its ``fields``), or a
+                JSON string carrying the Look's sorts and pivots as
+                ``custom_sorts`` / ``custom_pivots``.
         """
-        data = json.loads(result)
+        if isinstance(result, QueryResult) and result.fields is not None:
+            # A csv result run in place of json_bi; see csv_results.
+            return csv_results.read_frame(result.raw, result.fields)
+        if isinstance(result, QueryResult):
+            data = result.parsed()
+            look_sorts = result.sorts
+            look_pivots = result.pivots
+        else:
+            data = json.loads(result)
+            look_sorts = data.get("custom_sorts", [])
+            look_pivots = data.get("custom_pivots", [])
         fields = data.get("metadata", {}).get("fields", {})
 
-        # 1. Pull the injected sorts and pivots rules from the Look
-        look_sorts = data.get("custom_sorts", [])
-        look_pivots = data.get("custom_pivots", [])
-
         # Determine if the primary pivot is sorted descending
         pivot_descending = False
         if look_pivots:
@@ -808,11 +1180,7 @@ class Cli:
             + fields.get("table_calculations", [])
         )
         mappy = {
-            f"{item['name']}.value": item.get("field_group_variant", item["name"])
-            .strip()
-            .lower()
-            .replace(" ", "_")
-            for item in all_fields
+            f"{item['name']}.value": pushdown.column_label(item) for item in all_fields
         }
         df.rename(columns=mappy, inplace=True)
 
@@ -825,12 +1193,14 @@ class Cli:
         metadata_rows = []
         looks = set()
         for looker_shape in self.looker_shapes:
-            if looker_shape.integration.id not in looks:
-                looks.add(looker_shape.integration.id)
+            integration = looker_shape.integration
+            path = "dashboards" if integration.id_type == "dashboard" else "looks"
+            if (path, integration.id) not in looks:
+                looks.add((path, integration.id))
                 metadata_rows.append(
                     {
                         "looks": {
-                            "value": f"{os.environ.get('LOOKERSDK_BASE_URL')}looks/{looker_shape.integration.id}"
+                            "value": f"{os.environ.get('LOOKERSDK_BASE_URL')}{path}/{integration.id}"
                         }
                     }
                 )
@@ -838,298 +1208,660 @@ class Cli:
             "metadata": {"fields": {"dimensions": [{"name": "looks"}]}},
             "rows": metadata_rows,
         }
-        self.data["metadata_shapes"] = json.dumps(metadata_object)
+        self.data["metadata_shapes"] = QueryResult(data=metadata_object)
 
     async def get_queries(self):
         """
-        asynchronously fetch a list of look references
+        Fetch and render the Looker shapes of the deck (see :meth:`_query_deck`),
+        then close the client's async transport.
+        """
+        await self._query_deck()
+        self.client.log_dedup_stats()
+        self._log_cached_shapes()
+        await self.client.aclose()
+
+    async def get_plan(self, filter_values=()):
+        """
+        Build the query of every Looker shape of the deck, once per filter
+        value, without running any of them (see ``LookerClient.plan_query``).
+
+        Args:
+            filter_values: The values the deck would be rendered for.
+        Returns:
+            The report of :func:`looker_powerpoint.plan.summarize`, with the
+            deck and the filter values. Each shape's entry has its own row and
+            column ``needs`` and, with several filter values, its
+            ``filter_value``.
+        """
+        for looker_shape in self._discover_shapes():
+            if self._is_queryable(looker_shape):
+                self.looker_shapes.append(looker_shape)
+        shape_needs = {}
+        result_needs = {}
+        for looker_shape in self.looker_shapes:
+            needs = self._shape_needs(looker_shape)
+            shape_needs[looker_shape.shape_id] = needs
+            source = self._source(looker_shape)
+            result_needs[source] = (
+                result_needs[source].merge(needs) if source in result_needs else needs
+            )
+        if self.args.no_pushdown:
+            result_needs = {}
+
+        async def plan(looker_shape, filter_value):
+            entry = await self.client.plan_query(
+                looker_shape.shape_id,
+                filter_value,
+                result_needs=result_needs.get(self._source(looker_shape)),
+                **dict(looker_shape.integration),
+            )
+            entry["needs"] = shape_needs[looker_shape.shape_id].as_dict()
+            if len(filter_values) > 1:
+                entry["filter_value"] = filter_value
+            return entry
+
+        try:
+            entries = await asyncio.gather(
+                *(
+                    plan(looker_shape, filter_value)
+                    for filter_value in (filter_values or [None])
+                    for looker_shape in self.looker_shapes
+                )
+            )
+        finally:
+            await self.client.aclose()
+        return {
+            "deck": self.file_path,
+            "filter_values": list(filter_values),
+            **plan_module.summarize(list(entries)),
+        }
+
+    async def get_variant_queries(self, filter_values):
+        """
+        Render one copy of the deck per filter value in a single run.
+
+        The template is read, and the alternative text of its shapes parsed,
+        once; every copy is opened from memory and shares the parsed shapes.
+        All copies share the Looker client, so the login, the connection pool
+        and the Look, dashboard and explore definitions are fetched once for
+        the whole run, and queries the filter does not change run once for all
+        copies. Up to ``max_workers`` copies are fetched and rendered
+        concurrently, each on its own render thread, and saved as soon as they
+        are done.
+
+        Args:
+            filter_values: The values to render the deck for.
+        Returns:
+            The decks rendered, one per value; see :meth:`_finish_deck` for
+            their ``destination``.
         """
+        loop = asyncio.get_running_loop()
+
+        def read_template():
+            with open(self.file_path, "rb") as f:
+                template = f.read()
+            descriptions = list(self.iter_alt_text(Presentation(BytesIO(template))))
+            return template, descriptions
+
+        template, descriptions = await loop.run_in_executor(None, read_template)
+        names = self._variant_names(filter_values)
+        variants = [self._variant(value, names[value]) for value in filter_values]
+        for variant in variants:
+            variant.slide_descriptions = descriptions
         logging.info(
-            f"Running Looker queries... {len(self.looker_shapes)} queries to run."
+            f"Rendering {len(variants)} decks, one per filter value, from {self.file_path}."
         )
-        tasks = [
-            self.client._async_write_queries(
-                shape.shape_id, self.args.filter, **dict(shape.integration)
+        # Each deck in flight holds its presentation and a render thread.
+        in_flight = asyncio.Semaphore(self.client.max_workers)
+
+        async def render(variant):
+            async with in_flight:
+                variant.presentation = await loop.run_in_executor(
+                    None, Presentation, BytesIO(template)
+                )
+                try:
+                    await variant._query_deck()
+                    await loop.run_in_executor(None, variant._finish_deck)
+                except Exception as e:
+                    logging.error(
+                        f"Could not render the deck for {variant.variant!r}: {e}"
+                    )
+                finally:
+                    variant._log_cached_shapes()
+                    # Only the saved file is needed from here on; drop the deck
+                    # and its results so memory does not grow with the values.
+                    variant.presentation = None
+                    variant.data = {}
+
+        try:
+            await asyncio.gather(*(render(variant) for variant in variants))
+        finally:
+            self.client.log_dedup_stats()
+            await self.client.aclose()
+        return variants
+
+    def _variant(self, filter_value, name=None):
+        """
+        A copy of this Cli rendering the deck for ``filter_value``, sharing its
+        arguments, Looker client and deadline but not its shapes or results.
+        It is saved under ``name``, by default one made from the value.
+        """
+        variant = copy.copy(self)
+        variant._reset_deck_state()
+        variant.filter_value = filter_value
+        variant.variant = filter_value
+        variant.variant_name = name or self._variant_names([filter_value])[filter_value]
+        variant.destination = None
+        return variant
+
+    @staticmethod
+    def _variant_names(filter_values):
+        """
+        The names the decks rendered for ``filter_values`` are saved under: each
+        value with the characters not safe in a file name replaced, plus a short
+        hash of the value where that would give two values the same name.
+
+        Returns:
+            A dict mapping each value to its name.
+        """
+        names = {}
+        used = set()
+        for value in filter_values:
+            name = re.sub(r"[^\w.-]+", "_", value).strip("_") or "blank"
+            # File systems on macOS and Windows ignore case.
+            if name.lower() in used:
+                name += "_" + hashlib.sha1(value.encode("utf-8")).hexdigest()[:8]
+            used.add(name.lower())
+            names[value] = name
+        return names
+
+    async def _query_deck(self):
+        """
+        Discover the deck's shapes, fetch the results of its Looker shapes and
+        render each of them as soon as its result arrives.
+
+        The deck is scanned slide by slide (see :meth:`_discover_shapes`) and a
+        shape's query is submitted as soon as it is found, so the Looker round
+        trips overlap with reading the rest of a large deck. With pushdown, a
+        Look whose shapes read only part of its result is run once the whole
+        deck has been read, as later shapes may need more of it; its Look
+        definition is fetched in the meantime. Dashboard tiles are handled
+        alike, the dashboard being fetched once for all of its tiles.
+
+        Rendering runs on a single worker thread, one shape at a time, while the
+        event loop keeps serving the outstanding requests; the scan waits for
+        each render, so the presentation is never touched by two threads at once.
+
+        Once the run's deadline (``--deadline``) has passed, queries still
+        outstanding are cancelled and their shapes marked as failed, as are the
+        shapes found after it, whose queries are not submitted.
+        """
+        result_needs = {}
+        deferred = []
+        pending = set()
+        shapes = {}
+        # Shapes found after the deadline.
+        late = []
+        self._render_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="render"
+        )
+
+        def submit(shape):
+            if self._time_left() == 0:
+                late.append(shape)
+                return
+            task = asyncio.ensure_future(
+                self._fetch_shape(shape, result_needs.get(self._source(shape)))
             )
-            for shape in self.looker_shapes
-        ]
+            pending.add(task)
+            shapes[task] = shape
 
-        # Run all tasks concurrently and gather the results
-        results = await asyncio.gather(*tasks)
-        for r in results:
-            self.data.update(r)
+        for looker_shape in self._discover_shapes():
+            if not self._is_queryable(looker_shape):
+                continue
+            self.looker_shapes.append(looker_shape)
+            source = self._source(looker_shape)
+            if self.args.no_pushdown:
+                submit(looker_shape)
+            else:
+                shape_needs = self._shape_needs(looker_shape)
+                result_needs[source] = (
+                    result_needs[source].merge(shape_needs)
+                    if source in result_needs
+                    else shape_needs
+                )
+                if result_needs[source].everything:
+                    submit(looker_shape)
+                elif looker_shape.integration.id_type == "dashboard":
+                    deferred.append(looker_shape)
+                    self.client.prefetch_dashboard(looker_shape.integration.id)
+                else:
+                    deferred.append(looker_shape)
+                    self.client.prefetch_look(looker_shape.integration.id)
+            # Let the submitted requests progress before reading the next shape,
+            # and render the shapes whose results have already arrived.
+            await asyncio.sleep(0)
+            done = {task for task in pending if task.done()}
+            pending -= done
+            await self._render_results(done)
+
+        for looker_shape in deferred:
+            submit(looker_shape)
+        logging.info(
+            f"Running Looker queries... {len(self.looker_shapes)} queries to run."
+        )
 
-    def _test_str_to_int(self, s):
+        # Queries run concurrently; render each shape as its result arrives.
         try:
-            int(s)
-            return True
-        except ValueError:
-            return False
+            while pending and not late:
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=self._time_left(),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    break
+                await self._render_results(done)
+            if late or pending:
+                await self._abandon(late + [shapes[task] for task in pending], pending)
+        finally:
+            self._render_executor.shutdown(wait=True)
+
+    async def _fetch_shape(self, looker_shape, result_needs):
+        """Fetches the result of a Looker shape, returning the shape with it."""
+        result = await self.client._async_write_queries(
+            looker_shape.shape_id,
+            self.filter_value,
+            result_needs=result_needs,
+            **dict(looker_shape.integration),
+        )
+        return looker_shape, result
 
-    def run(self, **kwargs):
+    async def _render_results(self, tasks):
         """
-        Main method to run the CLI application.
+        Stores the results of completed :meth:`_fetch_shape` tasks and renders
+        their shapes one after the other on the render thread.
         """
-        self.args = self.parser.parse_args()
-        self._setup_logging()
-        self._pick_file()
-        self._init_looker()
+        loop = asyncio.get_running_loop()
+        for task in tasks:
+            looker_shape, result = task.result()
+            self.data.update(result)
+            await loop.run_in_executor(
+                self._render_executor, self._render_shape, looker_shape
+            )
 
-        references = self.get_alt_text(self.file_path)
-        if not references:
-            logging.error(
-                "No shapes with id found in the presentation. Add a 'id' : '<look_id>' to the alternative text of a shape to load data into the shape."
+    def _time_left(self):
+        """Seconds until the run's deadline, or None without a deadline."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    async def _abandon(self, looker_shapes, tasks):
+        """
+        Cancels the fetches of shapes whose results did not arrive before the
+        deadline, and the executions they share, and marks the shapes as failed.
+        """
+        for task in tasks:
+            task.cancel()
+        self.client.cancel_pending()
+        logging.warning(
+            f"Deadline of {self.args.deadline:g}s reached; "
+            f"cancelled the queries of {len(looker_shapes)} shapes: "
+            f"{', '.join(s.shape_id for s in looker_shapes)}"
+        )
+        loop = asyncio.get_running_loop()
+        for looker_shape in looker_shapes:
+            await loop.run_in_executor(
+                self._render_executor, self._fail_shape, looker_shape
             )
-            return
 
-        for ref in references:
-            integration = ref.get("integration", {})
-            # Try to parse as a Gemini shape first (type: gemini discriminator)
-            if isinstance(integration, dict) and integration.get("type") == "gemini":
-                try:
-                    gemini_shape = GeminiShape.model_validate(ref)
-                    if gemini_shape.shape_type not in (
-                        "TEXT_BOX",
-                        "TITLE",
-                        "AUTO_SHAPE",
-                    ):
-                        logging.warning(
-                            f"Gemini synthesis config found on shape "
-                            f"{gemini_shape.shape_id} (type: {gemini_shape.shape_type}). "
-                            "Gemini synthesis only works for text boxes (TEXT_BOX, TITLE, "
-                            "AUTO_SHAPE). This shape will be skipped."
-                        )
-                        continue
-                    self.gemini_shapes.append(gemini_shape)
-                except ValidationError as e:
-                    logging.debug(
-                        f"Could not parse Gemini config in shape {ref.get('shape_id', '?')}: {e}"
-                    )
+    def _log_cached_shapes(self):
+        """Reports which shapes were served from a cache instead of the warehouse."""
+        served = collections.defaultdict(list)
+        for looker_shape in self.looker_shapes:
+            result = self.data.get(looker_shape.shape_id)
+            if not isinstance(result, QueryResult):
                 continue
+            if result.from_cache:
+                served["the local result cache"].append(looker_shape.shape_id)
+            elif result.from_looker_cache:
+                served["Looker's result cache"].append(looker_shape.shape_id)
+        for source, shape_ids in served.items():
+            logging.info(
+                f"{len(shape_ids)} of {len(self.looker_shapes)} shapes were served "
+                f"from {source}: {', '.join(shape_ids)}"
+            )
+
+    def _is_queryable(self, looker_shape):
+        """Whether a shape references a Look by id or a dashboard tile."""
+        integration = looker_shape.integration
+        if integration.id_type == "dashboard":
+            if integration.tile is None:
+                logging.warning(
+                    f"Shape {looker_shape.shape_id} references dashboard "
+                    f"{integration.id} without a tile; it will be skipped."
+                )
+                return False
+            return True
+        return integration.id_type == "look" and self._test_str_to_int(integration.id)
+
+    def _source(self, looker_shape):
+        """The Look or dashboard tile a shape takes its query from."""
+        integration = looker_shape.integration
+        return integration.id_type, integration.id, integration.tile
 
-            # Otherwise try to parse as a regular Looker shape
+    def _shape_needs(self, looker_shape):
+        """
+        Work out which result columns and rows a shape reads, so the client can
+        drop measures and rows none of the shapes using its Look need.
+
+        Returns:
+            The shape's ``ResultNeeds``; merge those of all shapes using a Look.
+        """
+        text = None
+        table_rows = None
+        if looker_shape.shape_type in pushdown.TEXT_SHAPE_TYPES + ("TABLE",):
+            slide = self.presentation.slides[looker_shape.slide_number]
+            for shape in slide.shapes:
+                if shape.shape_id != looker_shape.shape_number:
+                    continue
+                if shape.has_text_frame:
+                    text = shape.text_frame.text
+                if getattr(shape, "has_table", False):
+                    table_rows = len(shape.table.rows)
+        return pushdown.shape_result_needs(looker_shape, text, table_rows)
+
+    def _discover_shapes(self):
+        """
+        Reads the alternative text of the deck slide by slide and yields each
+        valid Looker shape as soon as its slide has been read.
+
+        All Looker shapes are collected in ``relevant_shapes`` and Gemini shapes
+        in ``gemini_shapes``; ``references_found`` counts the shapes with
+        alternative text.
+        """
+        self.references_found = 0
+        presentation = getattr(self, "presentation", None)
+        if presentation is None:
+            # _pick_file could not open the file and has said so.
+            return
+        slides = self.slide_descriptions
+        if slides is None:
+            slides = self.iter_alt_text(presentation)
+        for references in slides:
+            self.references_found += len(references)
+            for ref in references:
+                looker_shape = self._parse_reference(ref)
+                if looker_shape is not None:
+                    self.relevant_shapes.append(looker_shape)
+                    yield looker_shape
+
+    def _parse_reference(self, ref):
+        """
+        Validates the alternative text of one shape.
+
+        Gemini shapes are added to ``gemini_shapes``.
+
+        Returns:
+            The ``LookerShape``, or None for Gemini and invalid shapes.
+        """
+        integration = ref.get("integration", {})
+        # Try to parse as a Gemini shape first (type: gemini discriminator)
+        if isinstance(integration, dict) and integration.get("type") == "gemini":
             try:
-                self.relevant_shapes.append(LookerShape.model_validate(ref))
+                gemini_shape = GeminiShape.model_validate(ref)
+                if gemini_shape.shape_type not in (
+                    "TEXT_BOX",
+                    "TITLE",
+                    "AUTO_SHAPE",
+                ):
+                    logging.warning(
+                        f"Gemini synthesis config found on shape "
+                        f"{gemini_shape.shape_id} (type: {gemini_shape.shape_type}). "
+                        "Gemini synthesis only works for text boxes (TEXT_BOX, TITLE, "
+                        "AUTO_SHAPE). This shape will be skipped."
+                    )
+                    return None
+                self.gemini_shapes.append(gemini_shape)
             except ValidationError as e:
                 logging.debug(
-                    f"Could not parse the alternate text in slide {ref['shape_id'].split(',')[0]}, shape {ref['shape_id'].split(',')[1]}: {e}"
+                    f"Could not parse Gemini config in shape {ref.get('shape_id', '?')}: {e}"
                 )
-                continue
+            return None
 
-        self.looker_shapes = [
-            s
-            for s in self.relevant_shapes
-            if s.integration.id_type == "look"
-            and self._test_str_to_int(s.integration.id)
-        ]
+        # Otherwise try to parse as a regular Looker shape
+        try:
+            return LookerShape.model_validate(ref)
+        except ValidationError as e:
+            logging.debug(
+                f"Could not parse the alternate text in slide {ref['shape_id'].split(',')[0]}, shape {ref['shape_id'].split(',')[1]}: {e}"
+            )
+            return None
 
-        self._build_metadata_object()
+    def _test_str_to_int(self, s):
+        try:
+            int(s)
+            return True
+        except ValueError:
+            return False
 
-        asyncio.run(self.get_queries())
+    def _render_shape(self, looker_shape):
+        """
+        Writes the result of one Looker shape into the presentation, or marks
+        the shape as failed.
+        """
+        self._rendered.add((looker_shape.slide_number, looker_shape.shape_number))
+        if looker_shape.integration.meta:
+            if not self.args.self:
+                self._remove_shape(
+                    looker_shape.slide_number,
+                    looker_shape.shape_number,
+                )
 
-        for looker_shape in self.relevant_shapes:
-            if looker_shape.integration.meta:
-                if not self.args.self:
-                    self._remove_shape(
-                        looker_shape.slide_number,
-                        looker_shape.shape_number,
-                    )
+        else:
+            result = self.data.get(looker_shape.shape_id)
+            if result is None:
+                result = self.data.get(looker_shape.integration.id)
 
-            else:
-                result = self.data.get(looker_shape.shape_id)
-                if result is None:
-                    result = self.data.get(looker_shape.integration.id)
+            try:
+                if looker_shape.shape_type == "PICTURE":
+                    if looker_shape.integration.result_format in ("jpg", "png"):
+                        if isinstance(result, QueryResult):
+                            result = result.raw
+                        image_stream = BytesIO(result)
+                    else:
+                        df = self._make_df(result)
+                        url = self._select_slice_from_df(df, looker_shape.integration)
 
-                try:
-                    if looker_shape.shape_type == "PICTURE":
-                        if looker_shape.integration.result_format in ("jpg", "png"):
-                            image_stream = BytesIO(result)
-                        else:
-                            df = self._make_df(result)
-                            url = self._select_slice_from_df(
-                                df, looker_shape.integration
-                            )
+                        image_stream = io.BytesIO(self.client.download_image(url))
 
-                            response = requests.get(url)
-                            response.raise_for_status()
-                            image_stream = io.BytesIO(response.content)
+                    logging.debug(
+                        f"Replacing image for shape {looker_shape.shape_number} on slide {looker_shape.slide_number}..."
+                    )
+
+                    self._replace_image_with_object(
+                        looker_shape.slide_number,
+                        looker_shape.shape_number,
+                        image_stream,
+                        looker_shape.original_integration,
+                    )
 
+                elif looker_shape.shape_type in [
+                    "CHART",
+                    "TABLE",
+                    "TEXT_BOX",
+                    "TITLE",
+                    "AUTO_SHAPE",
+                ]:
+                    slide = self.presentation.slides[looker_shape.slide_number]
+                    for shape in slide.shapes:
+                        if shape.shape_id == looker_shape.shape_number:
+                            current_shape = shape
+                    df = self._make_df(result)
+
+                    if looker_shape.shape_type == "TABLE":
                         logging.debug(
-                            f"Replacing image for shape {looker_shape.shape_number} on slide {looker_shape.slide_number}..."
+                            f"Updating table for shape {looker_shape.shape_number} on slide {looker_shape.slide_number}..."
                         )
-
-                        self._replace_image_with_object(
-                            looker_shape.slide_number,
-                            looker_shape.shape_number,
-                            image_stream,
-                            looker_shape.original_integration,
+                        self._fill_table(
+                            current_shape.table,
+                            df,
+                            looker_shape.integration.headers,
                         )
 
                     elif looker_shape.shape_type in [
-                        "CHART",
-                        "TABLE",
                         "TEXT_BOX",
                         "TITLE",
                         "AUTO_SHAPE",
                     ]:
-                        slide = self.presentation.slides[looker_shape.slide_number]
-                        for shape in slide.shapes:
-                            if shape.shape_id == looker_shape.shape_number:
-                                current_shape = shape
-                        df = self._make_df(result)
-
-                        if looker_shape.shape_type == "TABLE":
-                            logging.debug(
-                                f"Updating table for shape {looker_shape.shape_number} on slide {looker_shape.slide_number}..."
-                            )
-                            self._fill_table(
-                                current_shape.table,
-                                df,
-                                looker_shape.integration.headers,
-                            )
-
-                        elif looker_shape.shape_type in [
-                            "TEXT_BOX",
-                            "TITLE",
-                            "AUTO_SHAPE",
-                        ]:
-                            logging.debug(
-                                f"Updating text for shape {looker_shape.shape_number} on slide {looker_shape.slide_number}..."
-                            )
+                        logging.debug(
+                            f"Updating text for shape {looker_shape.shape_number} on slide {looker_shape.slide_number}..."
+                        )
 
-                            try:
-                                text_to_insert = self._select_slice_from_df(
-                                    df, looker_shape.integration
-                                )
-                            except Exception as e:
-                                text_to_insert = df.to_string(index=False, header=False)
-                                logging.debug(
-                                    f"inserting whole text for shape {looker_shape.shape_number} on slide {looker_shape.slide_number}: {e}"
-                                )
-                            current_shape = process_text_field(
-                                current_shape,
-                                text_to_insert,
-                                df,
+                        try:
+                            text_to_insert = self._select_slice_from_df(
+                                df, looker_shape.integration
                             )
-                            # add_text_with_numbered_links(current_shape.text_frame, str(text_to_insert))
-
-                        elif looker_shape.shape_type == "CHART":
-                            chart_data = CategoryChartData()
-                            chart_data.categories = df.iloc[
-                                :, 0
-                            ].tolist()  # Assuming the first column contains categories
-                            chart = current_shape.chart
-                            existing_chart_data = chart.plots[0].series
+                        except Exception as e:
+                            text_to_insert = df.to_string(index=False, header=False)
                             logging.debug(
-                                f"Existing chart series: {[s.name for s in existing_chart_data]}"
+                                f"inserting whole text for shape {looker_shape.shape_number} on slide {looker_shape.slide_number}: {e}"
                             )
+                        current_shape = process_text_field(
+                            current_shape,
+                            text_to_insert,
+                            df,
+                        )
+                        # add_text_with_numbered_links(current_shape.text_frame, str(text_to_insert))
+
+                    elif looker_shape.shape_type == "CHART":
+                        chart_data = CategoryChartData()
+                        chart_data.categories = df.iloc[
+                            :, 0
+                        ].tolist()  # Assuming the first column contains categories
+                        chart = current_shape.chart
+                        existing_chart_data = chart.plots[0].series
+                        logging.debug(
+                            f"Existing chart series: {[s.name for s in existing_chart_data]}"
+                        )
 
-                            if looker_shape.integration.headers:
-                                for series_name in df.columns[1:]:
-                                    try:
-                                        match = (
-                                            re.search(
-                                                r"^[^\.]*\.[^\.]*\.(.*)\.value$",
-                                                series_name,
-                                            )
-                                            .group(1)
-                                            .replace(".", " - ")
-                                            .strip()
-                                            .replace("|FIELD|", " ")
+                        if looker_shape.integration.headers:
+                            for series_name in df.columns[1:]:
+                                try:
+                                    match = (
+                                        re.search(
+                                            r"^[^\.]*\.[^\.]*\.(.*)\.value$",
+                                            series_name,
                                         )
-                                    except AttributeError as e:
-                                        logging.debug(
-                                            f"Could not parse series name {series_name}, setting name to {series_name}"
-                                        )
-                                        match = series_name
-                                    chart_data.add_series(match, df[series_name])
-                            else:
-                                if len(df.columns[1:]) != len(existing_chart_data):
-                                    logging.warning(
-                                        f"{looker_shape.shape_id}. Missing headers! Number of series ({len(df.columns[1:])}) does not match number of existing chart series ({len(existing_chart_data)}). Perhaps you need to enable headers in the integration settings?"
+                                        .group(1)
+                                        .replace(".", " - ")
+                                        .strip()
+                                        .replace("|FIELD|", " ")
                                     )
-                                for series_name, series in zip(
-                                    df.columns[1:], existing_chart_data
-                                ):
-                                    chart_data.add_series(series.name, df[series_name])
-
-                            chart.replace_data(chart_data)
-                            if looker_shape.integration.show_latest_chart_label:
-                                for plot in chart.plots:
-                                    s = 0
-                                    for series in plot.series:
-                                        series_has_label = False
-                                        index = 0
-                                        for i, v in zip(
-                                            series.points, df.iloc[:, s + 1]
-                                        ):
-                                            if i.data_label._dLbl is not None:
-                                                series_has_label = True
-                                                logging.debug(
-                                                    f"Series {series.name} has data labels."
-                                                )
-                                            if v is not None and v != "":
+                                except AttributeError as e:
+                                    logging.debug(
+                                        f"Could not parse series name {series_name}, setting name to {series_name}"
+                                    )
+                                    match = series_name
+                                chart_data.add_series(match, df[series_name])
+                        else:
+                            if len(df.columns[1:]) != len(existing_chart_data):
+                                logging.warning(
+                                    f"{looker_shape.shape_id}. Missing headers! Number of series ({len(df.columns[1:])}) does not match number of existing chart series ({len(existing_chart_data)}). Perhaps you need to enable headers in the integration settings?"
+                                )
+                            for series_name, series in zip(
+                                df.columns[1:], existing_chart_data
+                            ):
+                                chart_data.add_series(series.name, df[series_name])
+
+                        chart.replace_data(chart_data)
+                        if looker_shape.integration.show_latest_chart_label:
+                            for plot in chart.plots:
+                                s = 0
+                                for series in plot.series:
+                                    series_has_label = False
+                                    index = 0
+                                    for i, v in zip(series.points, df.iloc[:, s + 1]):
+                                        if i.data_label._dLbl is not None:
+                                            series_has_label = True
+                                            logging.debug(
+                                                f"Series {series.name} has data labels."
+                                            )
+                                        if v is not None and v != "":
+                                            logging.debug(
+                                                f"Value for point {index} in series {series.name}: {v}"
+                                            )
+                                            index += 1
+                                    if series_has_label is True:
+                                        new_index = 0
+                                        for point in series.points:
+                                            new_index += 1
+                                            if new_index == index:
                                                 logging.debug(
-                                                    f"Value for point {index} in series {series.name}: {v}"
+                                                    f"Showing data label for point {new_index} in series {series.name}."
                                                 )
-                                                index += 1
-                                        if series_has_label is True:
-                                            new_index = 0
-                                            for point in series.points:
-                                                new_index += 1
-                                                if new_index == index:
-                                                    logging.debug(
-                                                        f"Showing data label for point {new_index} in series {series.name}."
-                                                    )
-                                                    point.data_label.text_frame.text = (
-                                                        ""
-                                                    )
-                                                    point.data_label.has_text_frame = (
-                                                        False
-                                                    )
-                                                else:
-                                                    point.data_label.text_frame.text = (
-                                                        ""
-                                                    )
-                                                    point.data_label.has_text_frame = (
-                                                        True
-                                                    )
-                                        s += 1
+                                                point.data_label.text_frame.text = ""
+                                                point.data_label.has_text_frame = False
+                                            else:
+                                                point.data_label.text_frame.text = ""
+                                                point.data_label.has_text_frame = True
+                                    s += 1
 
-                    else:
-                        logging.warning(
-                            f"unknown shape type {looker_shape.shape_type} for shape {looker_shape.shape_number} on slide {looker_shape.slide_number}."
-                        )
-                        continue
+                else:
+                    logging.warning(
+                        f"unknown shape type {looker_shape.shape_type} for shape {looker_shape.shape_number} on slide {looker_shape.slide_number}."
+                    )
+                    return
 
-                except Exception as e:
-                    logging.error(f"Error processing reference {looker_shape}: {e}")
-                    # import traceback
-                    # traceback.print_exc()  # Prints the full traceback
+            except Exception as e:
+                logging.error(f"Error processing reference {looker_shape}: {e}")
+                # import traceback
+                # traceback.print_exc()  # Prints the full traceback
+                self._fail_shape(looker_shape)
+
+    def _fail_shape(self, looker_shape):
+        """Marks a Looker shape as failed, unless errors are hidden."""
+        self._rendered.add((looker_shape.slide_number, looker_shape.shape_number))
+        if not self.args.hide_errors:
+            slide = self.presentation.slides[looker_shape.slide_number]
+            for shape in slide.shapes:
+                if shape.shape_id == looker_shape.shape_number:
+                    self._mark_failure(slide, shape)
+
+    def run(self, **kwargs):
+        """
+        Main method to run the CLI application.
+        """
+        self.args = self.parser.parse_args()
+        self.deadline = self._init_deadline()
+        self._setup_logging()
+        filter_values = self._filter_values()
+        if len(filter_values) > 1 and self.args.self and self.args.plan is None:
+            logging.error(
+                "--self cannot be combined with several filter values, as each value is saved to a file of its own."
+            )
+            exit(1)
+        self._pick_file()
+        self._init_looker()
 
-                    if not self.args.hide_errors:
-                        slide = self.presentation.slides[looker_shape.slide_number]
-                        for shape in slide.shapes:
-                            if shape.shape_id == looker_shape.shape_number:
-                                self._mark_failure(slide, shape)
+        if self.args.plan is not None:
+            self._write_plan(filter_values)
+            return
 
-        # Process Gemini synthesis shapes
-        self._process_gemini_shapes()
+        if len(filter_values) > 1:
+            self._run_variants(filter_values)
+            return
 
-        if self.args.self:
-            self.destination = self.file_path
-        else:
-            if not self.args.output_dir.endswith("/"):
-                self.args.output_dir += "/"
-            self.destination = (
-                self.args.output_dir
-                + os.path.basename(self.file_path).removesuffix(".pptx")
-                + datetime.datetime.now().strftime("_%Y%m%d_%H%M%S.pptx")
+        self.filter_value = filter_values[0] if filter_values else None
+        asyncio.run(self.get_queries())
+        self.client.close()
+        if not self.references_found:
+            logging.error(
+                "No shapes with id found in the presentation. Add a 'id' : '<look_id>' to the alternative text of a shape to load data into the shape."
             )
-        if not os.path.exists(self.args.output_dir) and not self.args.self:
-            os.makedirs(self.args.output_dir)
+            return
 
-        self.presentation.save(self.destination)
+        self._finish_deck()
 
         if not self.args.quiet:
             try:
@@ -1143,6 +1875,94 @@ class Cli:
                     logging.error(f"Failed to open the PowerPoint file: {e}")
                     logging.info(f"You can find the file at {self.destination}.")
 
+    def _write_plan(self, filter_values):
+        """
+        Prints the deck's query plan (see :meth:`get_plan`), or writes it to
+        the file given with --plan.
+        """
+        report = asyncio.run(self.get_plan(filter_values))
+        self.client.close()
+        output = json.dumps(report, indent=2, default=str)
+        if self.args.plan == "-":
+            print(output)
+        else:
+            with open(self.args.plan, "w", encoding="utf-8") as f:
+                f.write(output + "\n")
+            logging.info(f"Wrote the query plan to {self.args.plan}.")
+        logging.info(
+            f"{report['queries_requested']} shapes would run "
+            f"{report['distinct_queries']} distinct queries on "
+            f"{report['distinct_looks']} Looks and "
+            f"{report['distinct_dashboards']} dashboards "
+            f"(dedup ratio {report['dedup_ratio']:.2f}x); "
+            f"{report['expected_cache_hits']} are expected from the result cache."
+        )
+
+    def _run_variants(self, filter_values):
+        """
+        Renders and saves one deck per filter value; the decks are not opened.
+        """
+        if getattr(self, "presentation", None) is None:
+            # _pick_file could not open the file and has said so.
+            return
+        variants = asyncio.run(self.get_variant_queries(filter_values))
+        self.client.close()
+        if not any(variant.references_found for variant in variants):
+            logging.error(
+                "No shapes with id found in the presentation. Add a 'id' : '<look_id>' to the alternative text of a shape to load data into the shape."
+            )
+            return
+        saved = [variant for variant in variants if variant.destination]
+        for variant in saved:
+            logging.info(
+                f"Saved the deck for {variant.variant!r} to {variant.destination}."
+            )
+        logging.info(f"Saved {len(saved)} of {len(variants)} decks.")
+
+    def _finish_deck(self):
+        """
+        Renders the shapes waiting for all results and the Gemini shapes, then
+        saves the deck to ``destination``. Decks without shapes are not saved.
+        """
+        if not self.references_found:
+            return
+
+        self._build_metadata_object()
+
+        # Shapes without a Look of their own, e.g. those showing the results of
+        # meta shapes, once all results are in.
+        for looker_shape in self.relevant_shapes:
+            if (
+                looker_shape.slide_number,
+                looker_shape.shape_number,
+            ) not in self._rendered:
+                self._render_shape(looker_shape)
+
+        # Process Gemini synthesis shapes
+        self._process_gemini_shapes()
+
+        self.destination = self._destination()
+        if not self.args.self:
+            os.makedirs(self.args.output_dir, exist_ok=True)
+
+        self.presentation.save(self.destination)
+
+    def _destination(self):
+        """
+        The path the deck is saved to: the input file with --self, or else a
+        timestamped file in the output directory, named after the filter value
+        when one deck is rendered per value.
+        """
+        if self.args.self:
+            return self.file_path
+        name = os.path.basename(self.file_path).removesuffix(".pptx")
+        if self.variant is not None:
+            name += f"_{self.variant_name}"
+        return os.path.join(
+            self.args.output_dir,
+            name + datetime.datetime.now().strftime("_%Y%m%d_%H%M%S.pptx"),
+        )
+
 
 def main():
     cli = Cli()
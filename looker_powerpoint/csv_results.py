@@ -0,0 +1,103 @@
+"""
+Fast path for tabular results: run ``json_bi`` queries as ``csv`` instead.
+
+``json_bi`` wraps every cell in its own object and is decoded with ``json.loads``
+and ``pd.json_normalize``, which dominates the run time of large Looks.  A
+``csv`` response carries the same rows and is parsed by pandas' C engine
+straight from the response bytes, but lacks the field metadata ``Cli._make_df``
+names and orders its columns with.  That metadata is taken from the explore
+instead (:func:`csv_fields`), and :func:`read_frame` builds the exact frame
+``_make_df`` would have built from the ``json_bi`` result.
+
+Only plain queries qualify: pivots and dynamic fields change the columns of a
+result in ways the explore cannot describe.  Looker writes the field labels as
+the CSV header; :func:`header_matches` checks them so a response that does not
+line up with the expected fields is never misread.
+"""
+
+import csv
+import io
+from typing import List, Optional, Union
+
+import pandas as pd
+
+from looker_powerpoint.pushdown import column_label
+
+CSV_FORMAT = "csv"
+
+
+def csv_fields(query, explore_fields: dict) -> Optional[List[dict]]:
+    """
+    Describe the columns of a query's CSV result, or ``None`` if it has no
+    CSV fast path.
+
+    Args:
+        query: The ``models.Query`` to run, with the fields to select.
+        explore_fields: ``{name: field}`` of the explore's dimensions and
+            measures, as returned by ``LookerClient.get_explore_fields``.
+    Returns:
+        One dict per CSV column, in column order, with the ``name``,
+        ``field_group_variant``, ``label``, ``category`` (``dimension`` or
+        ``measure``) and ``is_numeric`` of its field.
+    """
+    if not query.fields or query.pivots or query.dynamic_fields:
+        return None
+    fields = []
+    for name in query.fields:
+        field = explore_fields.get(name)
+        if field is None:
+            return None
+        fields.append(field)
+    return fields
+
+
+def _text(payload: Union[str, bytes]) -> str:
+    return payload.decode("utf-8-sig") if isinstance(payload, bytes) else payload
+
+
+def header_matches(payload: Union[str, bytes], fields: List[dict]) -> bool:
+    """Whether the CSV header holds the labels of ``fields``, in order."""
+    text = _text(payload)
+    header = next(csv.reader(io.StringIO(text[: text.find("\n") + 1 or None])), [])
+    if len(header) != len(fields):
+        return False
+    return all(
+        cell.strip() in (f.get("label"), f.get("label_short"), f["name"])
+        for cell, f in zip(header, fields)
+    )
+
+
+def read_frame(payload: Union[str, bytes], fields: List[dict]) -> pd.DataFrame:
+    """
+    Parse a CSV result into the frame ``Cli._make_df`` builds from ``json_bi``:
+    dimensions, then measures, each in query order, named with
+    :func:`~looker_powerpoint.pushdown.column_label`.
+
+    Args:
+        payload: The CSV response.
+        fields: The columns of the response, as returned by :func:`csv_fields`.
+    """
+    source = io.BytesIO(payload) if isinstance(payload, bytes) else io.StringIO(payload)
+    positions = [str(i) for i in range(len(fields))]
+    df = pd.read_csv(
+        source,
+        engine="c",
+        header=0,
+        names=positions,
+        encoding="utf-8-sig",
+        # json_bi keeps non-numeric values such as zip codes as strings; only
+        # empty cells are missing values.
+        dtype={p: str for p, f in zip(positions, fields) if not f.get("is_numeric")},
+        keep_default_na=False,
+        na_values=[""],
+    ).fillna("")
+    if len(df) == 0:
+        # json_normalize has no columns to offer for an empty result either.
+        return pd.DataFrame(columns=[])
+
+    order = [i for i, f in enumerate(fields) if f["category"] == "dimension"] + [
+        i for i, f in enumerate(fields) if f["category"] == "measure"
+    ]
+    df = df[[positions[i] for i in order]]
+    df.columns = [column_label(fields[i]) for i in order]
+    return df
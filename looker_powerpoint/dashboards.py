@@ -0,0 +1,137 @@
+"""
+Dashboard tiles as a source of shape data.
+
+A shape can reference a tile of a dashboard instead of a Look by setting
+``id_type: dashboard`` and ``tile`` to the element's title or id.  The
+dashboard definition is fetched once per run (see
+``LookerClient.get_dashboard``) and reduced to its :class:`Tile` objects: each
+element backed by a query, with the default values of the dashboard filters the
+element listens to applied to that query.  Tile queries then run like the
+queries of Looks, so identical tiles, and tiles identical to a Look used
+elsewhere in the deck, share one execution.
+
+Elements without a query of their own (text tiles, merged results) cannot be
+referenced.
+"""
+
+import copy
+import json
+from typing import List, Optional
+
+from looker_sdk import models40 as models
+from looker_sdk.rtl import serialize
+
+
+class Tile:
+    """
+    A queryable dashboard element.
+
+    Args:
+        id: The dashboard element id.
+        title: The title shown on the tile, or None.
+        query: The element's ``models.Query`` with the dashboard's default
+            filter values applied.
+    """
+
+    def __init__(self, id: str, title: Optional[str], query):
+        self.id = id
+        self.title = title
+        self.query = query
+
+    def __repr__(self):
+        return f"Tile(id={self.id!r}, title={self.title!r})"
+
+
+def _element_query(element):
+    """The query behind a dashboard element, or None if it has none."""
+    result_maker = element.result_maker
+    if element.merge_result_id or (result_maker and result_maker.merge_result_id):
+        return None
+    if result_maker is not None and result_maker.query is not None:
+        return result_maker.query
+    if element.query is not None:
+        return element.query
+    if element.look is not None:
+        return element.look.query
+    return None
+
+
+def _apply_filter_defaults(query, element, defaults: dict):
+    """Sets the fields ``element`` wires to dashboard filters to their defaults."""
+    result_maker = element.result_maker
+    for filterable in (result_maker and result_maker.filterables) or []:
+        for listen in filterable.listen or []:
+            value = defaults.get(listen.dashboard_filter_name)
+            if value and listen.field:
+                if query.filters is None:
+                    query.filters = {}
+                query.filters[listen.field] = value
+    return query
+
+
+def dashboard_tiles(dashboard) -> List[Tile]:
+    """
+    Returns the queryable elements of a dashboard, in dashboard order.
+
+    Args:
+        dashboard: A ``models.Dashboard`` with its ``dashboard_elements`` and
+            ``dashboard_filters``.
+    """
+    defaults = {
+        f.name: f.default_value for f in dashboard.dashboard_filters or [] if f.name
+    }
+    tiles = []
+    for element in dashboard.dashboard_elements or []:
+        query = _element_query(element)
+        if query is None:
+            continue
+        query = _apply_filter_defaults(copy.deepcopy(query), element, defaults)
+        tiles.append(Tile(str(element.id), element.title or element.title_text, query))
+    return tiles
+
+
+def find_tile(tiles: List[Tile], selector: str) -> Tile:
+    """
+    Picks the tile a shape's ``tile`` selects: the element with that id, or
+    else the first with that title, ignoring case.
+
+    Raises:
+        ValueError: No tile matches; the message lists the available titles.
+    """
+    selector = str(selector)
+    for tile in tiles:
+        if tile.id == selector:
+            return tile
+    for tile in tiles:
+        if tile.title is not None and tile.title.casefold() == selector.casefold():
+            return tile
+    available = ", ".join(repr(t.title or t.id) for t in tiles) or "none"
+    raise ValueError(f"No tile {selector!r}; available tiles: {available}")
+
+
+def dump_tiles(tiles: List[Tile]) -> bytes:
+    """Serializes tiles for the Look definition store of the result cache."""
+    return json.dumps(
+        [
+            {
+                "id": t.id,
+                "title": t.title,
+                "query": json.loads(serialize.serialize40(api_model=t.query)),
+            }
+            for t in tiles
+        ]
+    ).encode("utf-8")
+
+
+def load_tiles(data: bytes) -> List[Tile]:
+    """Restores tiles serialized with :func:`dump_tiles`."""
+    return [
+        Tile(
+            t["id"],
+            t["title"],
+            serialize.deserialize40(
+                data=json.dumps(t["query"]), structure=models.Query
+            ),
+        )
+        for t in json.loads(data)
+    ]
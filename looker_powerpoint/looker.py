@@ -1,15 +1,320 @@
+"""
+:class:`LookerClient`, the Looker API client used by the CLI.
+
+Blocking SDK calls run in a bounded thread pool, or through the optional async
+transport. Every call passes the run's concurrency limit, rate limiter and
+circuit breaker in ``_api``. Look, dashboard and explore definitions are
+fetched at most once per run. Shapes with an identical query
+(:func:`query_fingerprint`) share one execution, whose result is kept in a
+size-bounded :class:`ResultMemo`. Queries can also run as Looker query tasks,
+picture shapes as render tasks, and results can be taken from Looker's own
+result cache first (``_fetch``).
+"""
+
+import asyncio
+import collections
+import copy
+import datetime
+import functools
+import hashlib
 import logging
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 import looker_sdk
 from dotenv import load_dotenv, find_dotenv
 from looker_sdk import models40 as models
-from tenacity import retry, stop_after_attempt, wait_fixed, before_sleep_log
+from looker_sdk.rtl import auth_token, serialize
+from tenacity import (
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    before_sleep_log,
+)
 import json
+import requests
+
+from looker_powerpoint import csv_results, dashboards, pool, pushdown
+from looker_powerpoint import breaker as breaker_module
+from looker_powerpoint import plan as plan_module
+from looker_powerpoint import retry as retry_module
+from looker_powerpoint import transport as transport_module
+from looker_powerpoint.cache import QueryCache
+from looker_powerpoint.models import QueryResult
+from looker_powerpoint.ratelimit import TokenBucket
+from looker_powerpoint.tokens import TokenCache
+
+# Number of Looker API calls allowed in flight at once when neither the
+# ``--max-workers`` argument nor the MAX_WORKERS environment variable is set.
+DEFAULT_MAX_WORKERS = 8
+
+# Query-task mode polls query_task_multi_results for all pending tasks at once.
+# The poll interval starts small, grows by QUERY_TASK_POLL_BACKOFF while no task
+# completes and is capped at QUERY_TASK_POLL_MAX_INTERVAL seconds. Task ids are
+# sent QUERY_TASK_BATCH_SIZE at a time to keep the request URL short.
+QUERY_TASK_POLL_INTERVAL = 0.5
+QUERY_TASK_POLL_MAX_INTERVAL = 5.0
+QUERY_TASK_POLL_BACKOFF = 1.5
+QUERY_TASK_BATCH_SIZE = 50
+# query_task_multi_results statuses of tasks that have not finished yet.
+QUERY_TASK_PENDING_STATUSES = ("added", "pending", "running")
+# A pending task missing from this many query_task_multi_results responses in
+# a row is failed rather than awaited forever.
+QUERY_TASK_MISSING_POLLS = 3
+# Result formats query tasks can produce; others (png, jpg) always run inline.
+QUERY_TASK_FORMATS = {f.value for f in models.ResultFormat} - {"invalid_api_enum_value"}
+# Image formats rendered with Looker render tasks, sized to the picture shape.
+# Pending render tasks are polled together, with the query task poll timing.
+RENDER_TASK_FORMATS = ("png", "jpg")
+# render_task statuses of tasks that have finished.
+RENDER_TASK_DONE_STATUSES = ("success", "failure")
+# Run options giving the pixel size of images; part of the query fingerprint.
+IMAGE_SIZE_OPTIONS = ("image_width", "image_height")
+# Fields of a dashboard fetched to reference its tiles.
+DASHBOARD_FIELDS = (
+    "id,updated_at,dashboard_filters(name,default_value),"
+    "dashboard_elements(id,title,title_text,merge_result_id,query,look(query),"
+    "result_maker(query,merge_result_id,filterables(listen)))"
+)
+# Looker execution options a shape may set. ``cache`` and ``cache_only`` only
+# decide where Looker takes the result from, so they are not fingerprinted,
+# except ``cache: false``: such a shape asks for a fresh result and does not
+# share one that may have come from a cache.
+EXECUTION_OPTIONS = ("cache", "cache_only", "force_production")
+CACHE_CONTROL_OPTIONS = ("cache", "cache_only")
+# Bytes of query results kept in memory for later shapes with an identical
+# query, e.g. in the other decks of a --filter fan-out; the least recently used
+# results are dropped beyond it.
+RESULT_MEMO_MAX_BYTES = 256 * 1024 * 1024
+
+
+def _env_flag(name: str) -> bool:
+    return os.environ.get(name, "").lower() in ("1", "true", "yes")
+
+
+def _call_sdk(func, *args, **kwargs):
+    """Calls a blocking SDK method, attaching the HTTP status to its errors."""
+    retry_module.reset_last_response()
+    try:
+        return func(*args, **kwargs)
+    except retry_module.LookerAPIError:
+        raise
+    except looker_sdk.error.SDKError as e:
+        raise retry_module.LookerAPIError.from_sdk_error(e) from e
+
+
+def query_fingerprint(query: dict) -> str:
+    """
+    Computes a canonical fingerprint for a query and its run options.
+
+    Two queries with the same fingerprint return the same result, so it can be
+    used to execute byte-identical queries only once.
+
+    Args:
+        query: A dict with ``body`` (a ``models.WriteQuery``) and the run options
+            ``result_format``, ``apply_vis``, ``apply_formatting`` and
+            ``server_table_calcs``, plus any :data:`EXECUTION_OPTIONS`.
+    Returns:
+        A hex SHA-256 digest.
+    """
+    canonical = {
+        k: v for k, v in query.items() if k != "body" and k not in CACHE_CONTROL_OPTIONS
+    }
+    if query.get("cache") is False:
+        canonical["cache"] = False
+    canonical["body"] = json.loads(serialize.serialize40(api_model=query["body"]))
+    encoded = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def write_query(q, fields) -> models.WriteQuery:
+    """
+    Builds the ``WriteQuery`` run for the (modified) query ``q`` of a Look or
+    tile, selecting ``fields``.
+    """
+    return models.WriteQuery(
+        model=q.model,
+        view=q.view,
+        fields=fields,
+        pivots=q.pivots,
+        fill_fields=q.fill_fields,
+        filters=q.filters,
+        sorts=q.sorts,
+        limit=q.limit,
+        column_limit=q.column_limit,
+        total=q.total,
+        row_total=q.row_total,
+        subtotals=q.subtotals,
+        dynamic_fields=q.dynamic_fields,
+        query_timezone=q.query_timezone,
+        vis_config=q.vis_config,
+        visible_ui_sections=q.visible_ui_sections,
+    )
+
+
+class ResultMemo(collections.OrderedDict):
+    """
+    Query results of a run keyed by fingerprint, dropping the least recently
+    used ones once their total size exceeds ``max_bytes``. A dropped result is
+    run again, or taken from the result cache, by the next shape needing it.
+    """
+
+    def __init__(self, max_bytes: int = RESULT_MEMO_MAX_BYTES):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.bytes = 0
+
+    @staticmethod
+    def _size(result) -> int:
+        if result is None:
+            return 0
+        if result.size is not None:
+            return result.size
+        # Query task results arrive decoded.
+        return len(json.dumps(result.data, default=str))
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self:
+            self.bytes -= self._size(super().__getitem__(key))
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        self.bytes += self._size(value)
+        while self.bytes > self.max_bytes and len(self) > 1:
+            oldest = next(iter(self))
+            self.bytes -= self._size(super().__getitem__(oldest))
+            super().__delitem__(oldest)
 
 
 class LookerClient:
-    def __init__(self):
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        async_transport: bool = False,
+        cache: Optional[QueryCache] = None,
+        query_tasks: bool = False,
+        max_concurrent: Optional[int] = None,
+        requests_per_second: Optional[float] = None,
+        retry_budget: Optional[int] = None,
+        csv_results: bool = False,
+        prefer_cached: bool = False,
+        cache_only: bool = False,
+        token_cache: Optional[TokenCache] = None,
+        max_connections_per_host: Optional[int] = None,
+        query_timeout: Optional[float] = None,
+        circuit_breaker_error_rate: Optional[float] = None,
+        circuit_breaker_cooldown: Optional[float] = None,
+        deadline: Optional[float] = None,
+    ):
         load_dotenv(find_dotenv(usecwd=True))
+        if max_workers is None:
+            max_workers = int(os.environ.get("MAX_WORKERS", DEFAULT_MAX_WORKERS))
+        self.max_workers = max(1, max_workers)
+        # Run-wide limits protecting the Looker instance: API calls in flight at
+        # once, and API calls started per second (0 means no limit).
+        if max_concurrent is None:
+            max_concurrent = int(
+                os.environ.get("MAX_CONCURRENT_QUERIES", self.max_workers)
+            )
+        self.max_concurrent = max(1, max_concurrent)
+        if requests_per_second is None:
+            requests_per_second = float(os.environ.get("REQUESTS_PER_SECOND", "0"))
+        self.rate_limiter = TokenBucket(requests_per_second)
+        self._semaphore = None
+        self._semaphore_loop = None
+        self._queued = 0
+        self._in_flight = 0
+        # Retries allowed across all shapes of the run.
+        if retry_budget is None:
+            retry_budget = int(
+                os.environ.get("RETRY_BUDGET", retry_module.DEFAULT_RETRY_BUDGET)
+            )
+        self.retry_budget = retry_module.RetryBudget(retry_budget)
+        # Connections kept open, and used at once, per host by the shared pool.
+        if max_connections_per_host is None:
+            max_connections_per_host = int(
+                os.environ.get("MAX_CONNECTIONS_PER_HOST", self.max_workers)
+            )
+        self.max_connections_per_host = max(1, max_connections_per_host)
+        # Seconds a query attempt may take once sent to Looker, not counting the
+        # wait for an API slot or rate token (None or 0: no limit).
+        if query_timeout is None:
+            query_timeout = float(os.environ.get("QUERY_TIMEOUT", "0"))
+        self.query_timeout = query_timeout or None
+        # time.monotonic() by which the run's requests must have finished, or
+        # None; blocking requests are given no more time than is left.
+        self.deadline = deadline
+        # Fails Looker calls fast once too many recent calls failed (0: disabled).
+        if circuit_breaker_error_rate is None:
+            circuit_breaker_error_rate = float(
+                os.environ.get(
+                    "CIRCUIT_BREAKER_ERROR_RATE", breaker_module.DEFAULT_ERROR_RATE
+                )
+            )
+        if circuit_breaker_cooldown is None:
+            circuit_breaker_cooldown = float(
+                os.environ.get(
+                    "CIRCUIT_BREAKER_COOLDOWN", breaker_module.DEFAULT_COOLDOWN
+                )
+            )
+        self.breaker = breaker_module.CircuitBreaker(
+            circuit_breaker_error_rate, circuit_breaker_cooldown
+        )
+        # The Looker SDK is synchronous; its calls are dispatched to this pool so
+        # that queries for different shapes are actually in flight concurrently.
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="looker"
+        )
+        # The persistent cache is SQLite; its reads and writes run on a thread of
+        # their own, so they neither block the event loop nor queue behind
+        # blocking Looker calls in the worker pool.
+        self._cache_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="cache"
+        )
+        # Look definitions fetched during this run, and fetches still in flight.
+        self._looks = {}
+        self._look_tasks = {}
+        # Tiles of the dashboards referenced by shapes, and fetches in flight.
+        self._dashboards = {}
+        self._dashboard_tasks = {}
+        self._prefetches = set()
+        # Fields per explore, used to narrow queries and to read CSV results,
+        # and fetches in flight.
+        self._explores = {}
+        self._explore_tasks = {}
+        # Query results keyed by query_fingerprint(), and executions in flight.
+        self._results = ResultMemo()
+        self._result_tasks = {}
+        self.queries_requested = 0
+        self.queries_executed = 0
+        # Optional persistent result cache shared across runs.
+        self.cache = cache
+        self.cache_hits = 0
+        self.query_ids_reused = 0
+        # Query-task mode: pending task ids mapped to the futures awaiting them,
+        # and the single coroutine polling for their results.
+        self.query_tasks = query_tasks or _env_flag("QUERY_TASKS")
+        self._pending_tasks = {}
+        self._poller = None
+        # Render tasks: pending task ids mapped to the futures awaiting them,
+        # and the coroutine polling for their status.
+        self._pending_renders = {}
+        self._render_poller = None
+        # Run json_bi queries as csv and parse them with pandas' C engine.
+        self.csv_results = csv_results or _env_flag("CSV_RESULTS")
+        # Take results from Looker's own result cache first (prefer_cached), or
+        # exclusively (cache_only), instead of querying the warehouse.
+        self.cache_only = cache_only or _env_flag("CACHE_ONLY")
+        self.prefer_cached = (
+            prefer_cached or _env_flag("PREFER_CACHED") or self.cache_only
+        )
+        self.looker_cache_hits = 0
         try:
             self.client = looker_sdk.init40()  # or init40() for the v4.0 API
         except looker_sdk.error.SDKError as e:
@@ -18,23 +323,793 @@ class LookerClient:
             )
             exit(1)
 
+        # Looker query ids are only valid on the instance that saved them, and
+        # results also depend on the API user's access filters.
+        self._base_url = str(getattr(self.client.auth.settings, "base_url", ""))
+        # read_config() re-reads looker.ini and the environment; read it once.
+        self._client_id = str(
+            self.client.auth.settings.read_config().get("client_id") or ""
+        )
+
+        # The SDK's transport drops the HTTP status of failed requests; record
+        # it so errors can be classified as retryable or fatal.
+        session = getattr(self.client.transport, "session", None)
+        if isinstance(session, requests.Session):
+            session.hooks["response"].append(retry_module.record_response)
+        else:
+            session = requests.Session()
+        # One keep-alive pool, shared by SDK calls and image downloads.
+        self.session = pool.configure_session(session, self.max_connections_per_host)
+
+        self.transport = None
+        if async_transport or _env_flag("ASYNC_TRANSPORT"):
+            if transport_module.is_available():
+                self.transport = transport_module.AsyncLookerTransport.from_settings(
+                    self.client.auth.settings,
+                    max_connections=min(
+                        self.max_workers, self.max_connections_per_host
+                    ),
+                )
+            else:
+                logging.warning(
+                    "httpx is not installed; falling back to the blocking Looker SDK transport. "
+                    "Install it with 'pip install looker_powerpoint[async]' to use the async transport."
+                )
+
+        # Access token shared with earlier runs, if one is still valid.
+        self.token_cache = token_cache
+        self._restored_token = None
+        if self.token_cache is not None:
+            self._restore_token()
+
+    def _result_key(self, query: dict) -> str:
+        """
+        The key of ``query``'s result in the persistent cache: its fingerprint
+        on this Looker instance for this API user, so instances and users with
+        different access filters sharing a cache directory do not get each
+        other's results.
+        """
+        # A fresh result of a cache: false shape is stored for the others.
+        query = {k: v for k, v in query.items() if k != "cache"}
+        return query_fingerprint(
+            {**query, "base_url": self._base_url, "client_id": self._client_id}
+        )
+
+    def _restore_token(self):
+        """Hands an access token stored by an earlier run to the SDK and transport."""
+        try:
+            saved = self.token_cache.get(self._base_url, self._client_id)
+        except Exception as e:
+            logging.debug(f"Not reusing a stored access token: {e}")
+            return
+        if saved is None:
+            return
+        access_token, expires_in = saved
+        self.client.auth.token = auth_token.AuthToken(
+            auth_token.AccessToken(
+                access_token=access_token,
+                token_type="Bearer",
+                expires_in=int(expires_in),
+            )
+        )
+        if self.transport is not None:
+            self.transport.use_token(access_token, expires_in)
+        self._restored_token = access_token
+        logging.debug(f"Reusing the stored access token ({expires_in:.0f}s left).")
+
+    def _save_token(self):
+        """Stores the access token of this run for later runs, if it is new."""
+        if self.transport is not None and self.transport.access_token:
+            access_token = self.transport.access_token
+            expires_in = self.transport.token_expires_in
+        else:
+            token = self.client.auth.token
+            if not token.is_active:
+                return
+            access_token = token.access_token
+            expires_in = (token.expires_at - datetime.datetime.now()).total_seconds()
+        if access_token == self._restored_token:
+            return
+        try:
+            self.token_cache.set(
+                self._base_url, self._client_id, access_token, expires_in
+            )
+        except Exception as e:
+            logging.debug(f"Could not store the access token: {e}")
+
+    async def _call(self, func, *args, **kwargs):
+        """
+        Runs a blocking Looker SDK call in the worker pool and awaits its result.
+
+        Args:
+            func: The SDK method to call.
+            *args, **kwargs: Arguments passed on to ``func``.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+
+    async def _cache_call(self, func, *args):
+        """
+        Runs a persistent cache method on the cache's thread and awaits its result.
+
+        Args:
+            func: The ``QueryCache`` method to call.
+            *args: Arguments passed on to ``func``.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._cache_executor, functools.partial(func, *args)
+        )
+
+    async def _api(self, method: str, *args, timeout: Optional[float] = None, **kwargs):
+        """
+        Calls a Looker API method by its SDK name.
+
+        Uses the async transport when it is enabled and implements ``method``,
+        otherwise runs the blocking SDK method in the worker pool. Every call
+        waits for one of ``max_concurrent`` slots and for the request rate limit,
+        and fails at once with ``CircuitOpenError`` while the circuit breaker is
+        open, before queuing for either and again once it has its slot; its
+        outcome is reported to the breaker.
+
+        Args:
+            method: Name of the ``Looker40SDK`` method, e.g. ``"look"``.
+            timeout: Seconds the request may take once it has its slot and rate
+                token; it then fails with ``TimeoutError``. Also the HTTP
+                timeout of a blocking SDK call, so a worker thread is not held
+                by a request that was given up on.
+            *args, **kwargs: Arguments passed on to the method.
+        """
+        # Calls the open circuit rejects do not queue for a slot or rate token.
+        self.breaker.check()
+        semaphore = self._get_semaphore()
+        waiting_since = time.monotonic()
+        self._queued += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self._queued -= 1
+        self._in_flight += 1
+        try:
+            # The circuit may have opened while the call was queued.
+            self.breaker.before_call()
+            try:
+                await self.rate_limiter.acquire_async()
+                logging.debug(
+                    f"Looker API {method}: waited {time.monotonic() - waiting_since:.2f}s "
+                    f"({self._queued} queued, {self._in_flight} in flight)"
+                )
+                result = await asyncio.wait_for(
+                    self._dispatch(method, *args, timeout=timeout, **kwargs), timeout
+                )
+            except asyncio.CancelledError:
+                self.breaker.record_cancelled()
+                raise
+            except Exception as e:
+                if retry_module.is_retryable(e):
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                raise
+            self.breaker.record_success()
+            return result
+        finally:
+            self._in_flight -= 1
+            semaphore.release()
+
+    async def _dispatch(
+        self, method: str, *args, timeout: Optional[float] = None, **kwargs
+    ):
+        """Sends one API call through the async transport or the SDK; see :meth:`_api`."""
+        if self.transport is not None and hasattr(self.transport, method):
+            return await getattr(self.transport, method)(*args, **kwargs)
+        timeout = self._http_timeout(timeout)
+        if timeout is not None:
+            kwargs["transport_options"] = {"timeout": timeout}
+        try:
+            return await self._call(
+                _call_sdk, getattr(self.client, method), *args, **kwargs
+            )
+        except retry_module.LookerAPIError as e:
+            if e.status != 401:
+                raise
+            # The token was revoked or expired early (e.g. a stored one);
+            # drop it so the SDK logs in again, and retry once.
+            logging.debug(f"Looker rejected the access token for {method}")
+            self.client.auth.token = auth_token.AuthToken()
+            return await self._call(
+                _call_sdk, getattr(self.client, method), *args, **kwargs
+            )
+
+    def _http_timeout(self, timeout: Optional[float]) -> Optional[int]:
+        """
+        The HTTP timeout of a blocking SDK call: ``timeout``, cut to the time
+        left before the run's deadline, so that no worker thread outlives it
+        and keeps the process from exiting.
+        """
+        if self.deadline is not None:
+            left = self.deadline - time.monotonic()
+            timeout = left if timeout is None else min(timeout, left)
+        if timeout is None:
+            return None
+        return max(1, math.ceil(timeout))
+
+    def _get_semaphore(self):
+        """Return the semaphore limiting API calls in flight on the running loop."""
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    def download_image(self, url: str) -> bytes:
+        """
+        Downloads an image referenced by a query result, subject to the same
+        request rate limit as Looker API calls.
+
+        The download reuses the connections of the shared pool, so images from
+        the same host do not each open a new connection.
+
+        Args:
+            url: The image URL.
+        Returns:
+            The image content.
+        """
+        waited = self.rate_limiter.acquire()
+        logging.debug(f"Downloading image {url} (waited {waited:.2f}s)")
+        response = self.session.get(
+            url,
+            # The session carries the SDK's settings for the Looker instance;
+            # image hosts always get certificate verification and no Looker
+            # headers.
+            verify=True,
+            headers=self._image_headers(),
+        )
+        response.raise_for_status()
+        return response.content
+
+    def _image_headers(self) -> dict:
+        """
+        Request headers undoing those the SDK set on the session for Looker;
+        ``None`` drops a header from the request.
+        """
+        defaults = requests.utils.default_headers()
+        return {
+            header: defaults.get(header)
+            for header, value in self.session.headers.items()
+            if defaults.get(header) != value
+        }
+
+    async def _single_flight(self, key, memo: dict, in_flight: dict, factory):
+        """
+        Runs ``factory()`` at most once per key for the lifetime of the client.
+
+        Concurrent callers with the same key await a single shielded task, so one
+        cancelled caller does not cancel it for the others. Successful results are
+        remembered in ``memo``; failures are not, so a later caller retries.
+
+        Args:
+            key: Identifies the work, e.g. a Look id or a query fingerprint.
+            memo: Dict of completed results.
+            in_flight: Dict of tasks that have not completed yet.
+            factory: Zero-argument coroutine function doing the work.
+        """
+        if key in memo:
+            return memo[key]
+
+        task = in_flight.get(key)
+        if task is None:
+
+            async def run():
+                try:
+                    memo[key] = await factory()
+                    return memo[key]
+                finally:
+                    in_flight.pop(key, None)
+
+            task = asyncio.ensure_future(run())
+            in_flight[key] = task
+        else:
+            logging.debug(f"Awaiting in-flight request for {key}")
+
+        return await asyncio.shield(task)
+
+    async def get_look(self, id):
+        """
+        Fetches a Look definition, at most once per run.
+
+        Concurrent callers asking for the same Look await a single request.
+
+        Args:
+            id: The ID of the Look.
+        Returns:
+            The Look, shared between callers; copy it before modifying.
+        """
+        return await self._single_flight(
+            id, self._looks, self._look_tasks, lambda: self._fetch_look(id)
+        )
+
+    def prefetch_look(self, id):
+        """
+        Starts fetching a Look definition without waiting for it, so the request
+        overlaps with other work. A later :meth:`get_look` shares the request;
+        failures are left for it to report.
+
+        Returns:
+            The task fetching the Look.
+        """
+        return self._prefetch(self.get_look(id))
+
+    def prefetch_dashboard(self, id):
+        """Like :meth:`prefetch_look`, for the tiles of a dashboard."""
+        return self._prefetch(self.get_dashboard(id))
+
+    def _prefetch(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._prefetches.add(task)
+        task.add_done_callback(self._prefetches.discard)
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+
+    def _definition_key(self, key) -> str:
+        """
+        The key of a Look, dashboard or explore definition in the cache; ids
+        are only meaningful on the Looker instance they come from.
+        """
+        return f"{self._base_url}|{key}"
+
+    async def _fetch_look(self, id):
+        """
+        Fetches a Look, reusing the definition stored in the cache by a previous
+        run: as it is within the cache TTL of when it was last checked, and
+        after that when the Look's ``updated_at`` shows it has not changed.
+        """
+        if self.cache is None:
+            return await self._api("look", id)
+
+        key = self._definition_key(id)
+        cached = await self._cache_call(self.cache.get_look, key)
+        if cached is not None:
+            updated_at, query_json = cached
+            if await self._cache_call(self.cache.look_is_fresh, key):
+                logging.debug(f"Reusing cached definition of Look {id}")
+                return self._cached_look(id, query_json)
+            meta = await self._api("look", id, fields="id,updated_at")
+            if meta.updated_at is not None and str(meta.updated_at) == updated_at:
+                logging.debug(f"Look {id} is unchanged; reusing its cached definition")
+                await self._cache_call(self.cache.mark_look_checked, key)
+                return self._cached_look(id, query_json)
+            logging.debug(f"Look {id} changed since it was cached; refetching")
+
+        look = await self._api("look", id)
+        if look.updated_at is not None and look.query is not None:
+            await self._cache_call(
+                self.cache.set_look,
+                key,
+                str(look.updated_at),
+                serialize.serialize40(api_model=look.query),
+            )
+        return look
+
+    @staticmethod
+    def _cached_look(id, query_json: bytes):
+        return models.LookWithQuery(
+            id=str(id),
+            query=serialize.deserialize40(data=query_json, structure=models.Query),
+        )
+
+    async def get_dashboard(self, id):
+        """
+        Fetches the tiles of a dashboard, at most once per run.
+
+        Args:
+            id: The ID of the dashboard.
+        Returns:
+            The dashboard's ``dashboards.Tile`` objects, shared between callers;
+            copy a tile's query before modifying it.
+        """
+        return await self._single_flight(
+            id,
+            self._dashboards,
+            self._dashboard_tasks,
+            lambda: self._fetch_dashboard(id),
+        )
+
+    async def get_tile(self, id, tile):
+        """
+        Returns the tile of dashboard ``id`` selected by ``tile``, its title or
+        element id. Raises ValueError if the dashboard has no such tile.
+        """
+        return dashboards.find_tile(await self.get_dashboard(id), tile)
+
+    async def _fetch_dashboard(self, id):
+        """
+        Fetches a dashboard's tiles, reusing those stored in the cache by a
+        previous run like :meth:`_fetch_look` reuses Look definitions.
+        """
+        # Dashboards share the Look definition store, under a prefixed key.
+        key = self._definition_key(f"dashboard:{id}")
+        cached = (
+            await self._cache_call(self.cache.get_look, key)
+            if self.cache is not None
+            else None
+        )
+        if cached is not None:
+            updated_at, tiles_json = cached
+            if await self._cache_call(self.cache.look_is_fresh, key):
+                logging.debug(f"Reusing cached tiles of dashboard {id}")
+                return dashboards.load_tiles(tiles_json)
+            meta = await self._api("dashboard", str(id), fields="id,updated_at")
+            if meta.updated_at is not None and str(meta.updated_at) == updated_at:
+                logging.debug(f"Dashboard {id} is unchanged; reusing its cached tiles")
+                await self._cache_call(self.cache.mark_look_checked, key)
+                return dashboards.load_tiles(tiles_json)
+            logging.debug(f"Dashboard {id} changed since it was cached; refetching")
+
+        dashboard = await self._api("dashboard", str(id), fields=DASHBOARD_FIELDS)
+        tiles = dashboards.dashboard_tiles(dashboard)
+        if self.cache is not None and dashboard.updated_at is not None:
+            await self._cache_call(
+                self.cache.set_look,
+                key,
+                str(dashboard.updated_at),
+                dashboards.dump_tiles(tiles),
+            )
+        return tiles
+
+    def log_dedup_stats(self):
+        """Logs how many distinct queries were executed for the shapes requested."""
+        if not self.queries_requested:
+            return
+        ratio = self.queries_requested / max(self.queries_executed, 1)
+        logging.info(
+            f"Executed {self.queries_executed} distinct queries for "
+            f"{self.queries_requested} shapes (dedup ratio {ratio:.2f}x, "
+            f"{self.queries_requested - self.queries_executed} duplicates skipped)."
+        )
+        if self.cache is not None:
+            logging.info(
+                f"{self.cache_hits} of {self.queries_executed} distinct queries were served from the result cache; "
+                f"{self.query_ids_reused} reused a saved Looker query."
+            )
+        if self.prefer_cached:
+            logging.info(
+                f"{self.looker_cache_hits} of {self.queries_executed} distinct queries were served from Looker's result cache."
+            )
+        if self.breaker.times_opened:
+            logging.warning(
+                f"The Looker circuit breaker opened {self.breaker.times_opened} times "
+                f"and failed {self.breaker.rejected} Looker calls without sending them."
+            )
+        if self.retry_budget.used:
+            logging.info(
+                f"Used {min(self.retry_budget.used, self.retry_budget.total)} of "
+                f"{self.retry_budget.total} retries in the run's retry budget."
+            )
+
+    def cancel_pending(self):
+        """
+        Cancels the query executions and definition fetches still in flight,
+        e.g. once the run's deadline has passed. Blocking SDK calls already
+        sent finish in their worker thread within their HTTP timeout.
+        """
+        for in_flight in (
+            self._result_tasks,
+            self._look_tasks,
+            self._dashboard_tasks,
+            self._explore_tasks,
+        ):
+            for task in list(in_flight.values()):
+                task.cancel()
+        for task in list(self._prefetches):
+            task.cancel()
+
+    async def aclose(self):
+        """Closes the async transport's connection pool, keeping its token."""
+        for poller in (self._poller, self._render_poller):
+            if poller is not None and not poller.done():
+                poller.cancel()
+        if self.transport is not None:
+            await self.transport.aclose()
+
+    def close(self):
+        """Shuts down the worker pool and the result cache once all queries have been run."""
+        # Calls still queued, e.g. after the run's deadline, are not started.
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        # Writes already handed to the cache's thread are finished first.
+        self._cache_executor.shutdown(wait=True)
+        if self.cache is not None:
+            self.cache.close()
+        if self.token_cache is not None:
+            self._save_token()
+
     async def run_query(self, query_object):
         """
         Runs a query against the Looker API.
 
+        With the result cache enabled the query is run by id through the
+        persisted query id index (see :meth:`_with_query_id`), so identical
+        queries across runs and decks hit Looker's own result cache; otherwise
+        it runs inline.
+
         Args:
             query_object: The query object containing the necessary parameters.
         """
+        options = {
+            "result_format": query_object["result_format"],
+            "apply_vis": query_object["apply_vis"],
+            "apply_formatting": query_object["apply_formatting"],
+            "server_table_calcs": query_object["server_table_calcs"],
+        }
+        for option in EXECUTION_OPTIONS + IMAGE_SIZE_OPTIONS:
+            if query_object.get(option) is not None:
+                options[option] = query_object[option]
+        if self.cache is None:
+            return await self._api(
+                "run_inline_query",
+                body=query_object["body"],
+                timeout=self.query_timeout,
+                **options,
+            )
 
-        response = self.client.run_inline_query(
-            result_format=query_object["result_format"],
-            body=query_object["body"],
-            apply_vis=query_object["apply_vis"],
-            apply_formatting=query_object["apply_formatting"],
-            server_table_calcs=query_object["server_table_calcs"],
+        async def run(query_id):
+            return await self._api(
+                "run_query", query_id=query_id, timeout=self.query_timeout, **options
+            )
+
+        return await self._with_query_id(query_object["body"], run)
+
+    async def _with_query_id(self, body, run):
+        """
+        Calls ``run(query_id)`` with the Looker query id of ``body``.
+
+        The id is looked up in the persisted index, or the query is saved with
+        ``create_query`` and its id indexed. An indexed id Looker no longer
+        knows (404) is forgotten and replaced by a freshly saved query.
+
+        Args:
+            body: The ``models.WriteQuery``.
+            run: Coroutine function using the query id.
+        """
+        key = None
+        if self.cache is not None:
+            key = query_fingerprint({"base_url": self._base_url, "body": body})
+            query_id = await self._cache_call(self.cache.get_query_id, key)
+            if query_id is not None:
+                try:
+                    result = await run(query_id)
+                    self.query_ids_reused += 1
+                    return result
+                except retry_module.LookerAPIError as e:
+                    if e.status != 404:
+                        raise
+                    logging.info(
+                        f"Looker query {query_id} no longer exists; saving the query again"
+                    )
+                    await self._cache_call(self.cache.forget_query_id, key)
+
+        query = await self._api("create_query", body=body, fields="id")
+        if key is not None:
+            await self._cache_call(self.cache.set_query_id, key, query.id)
+        return await run(query.id)
+
+    async def run_query_task(self, query_object):
+        """
+        Runs a query as a Looker query task and awaits its result.
+
+        The query is saved with ``create_query`` and submitted with
+        ``create_query_task``; instead of holding a connection open until the
+        warehouse answers, the result is collected by :meth:`_poll_query_tasks`,
+        which polls for every pending task with one request.
+
+        Args:
+            query_object: The query object containing the necessary parameters.
+        """
+
+        async def submit(query_id):
+            return await self._api(
+                "create_query_task",
+                body=models.WriteCreateQueryTask(
+                    query_id=query_id,
+                    result_format=models.ResultFormat(query_object["result_format"]),
+                    source="looker_powerpoint",
+                ),
+                apply_vis=query_object["apply_vis"],
+                apply_formatting=query_object["apply_formatting"],
+                server_table_calcs=query_object["server_table_calcs"],
+                **{
+                    option: query_object[option]
+                    for option in EXECUTION_OPTIONS
+                    if query_object.get(option) is not None
+                },
+            )
+
+        task = await self._with_query_id(query_object["body"], submit)
+        future = asyncio.get_running_loop().create_future()
+        self._pending_tasks[task.id] = future
+        logging.debug(f"Submitted query task {task.id} for query {task.query_id}")
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.ensure_future(self._poll_query_tasks())
+        try:
+            return await asyncio.wait_for(future, self.query_timeout)
+        finally:
+            self._pending_tasks.pop(task.id, None)
+
+    async def _poll_query_tasks(self):
+        """
+        Polls ``query_task_multi_results`` until no query task is pending.
+
+        Futures of finished tasks are resolved with the task's data, or with an
+        ``SDKError`` if the task failed. A failed poll fails the tasks it asked
+        for, so their callers can retry, and so does a task Looker leaves out
+        of ``QUERY_TASK_MISSING_POLLS`` responses in a row.
+        """
+        interval = QUERY_TASK_POLL_INTERVAL
+        # Consecutive responses each pending task was missing from.
+        missing = {}
+        while self._pending_tasks:
+            await asyncio.sleep(interval)
+            task_ids = [i for i, f in self._pending_tasks.items() if not f.done()]
+            missing = {i: missing[i] for i in task_ids if i in missing}
+            finished = 0
+            for start in range(0, len(task_ids), QUERY_TASK_BATCH_SIZE):
+                batch = task_ids[start : start + QUERY_TASK_BATCH_SIZE]
+                try:
+                    results = await self._api(
+                        "query_task_multi_results",
+                        query_task_ids=models.DelimSequence(batch),
+                    )
+                except Exception as e:
+                    for task_id in batch:
+                        future = self._pending_tasks.get(task_id)
+                        if future is not None and not future.done():
+                            future.set_exception(e)
+                    finished += len(batch)
+                    continue
+                results = results or {}
+                for task_id in batch:
+                    if task_id in results:
+                        missing.pop(task_id, None)
+                        continue
+                    missing[task_id] = missing.get(task_id, 0) + 1
+                    future = self._pending_tasks.get(task_id)
+                    if (
+                        missing[task_id] >= QUERY_TASK_MISSING_POLLS
+                        and future is not None
+                        and not future.done()
+                    ):
+                        del missing[task_id]
+                        finished += 1
+                        future.set_exception(
+                            looker_sdk.error.SDKError(
+                                f"Query task {task_id} missing from {QUERY_TASK_MISSING_POLLS} polls in a row"
+                            )
+                        )
+                for task_id, entry in results.items():
+                    future = self._pending_tasks.get(task_id)
+                    status = (entry or {}).get("status")
+                    if (
+                        future is None
+                        or future.done()
+                        or status in QUERY_TASK_PENDING_STATUSES
+                    ):
+                        continue
+                    finished += 1
+                    data = entry.get("data")
+                    if status == "complete":
+                        future.set_result(data)
+                    else:
+                        future.set_exception(
+                            looker_sdk.error.SDKError(
+                                f"Query task {task_id} {status}: {entry.get('errors') or data}"
+                            )
+                        )
+            if finished:
+                interval = QUERY_TASK_POLL_INTERVAL
+            else:
+                interval = min(
+                    interval * QUERY_TASK_POLL_BACKOFF, QUERY_TASK_POLL_MAX_INTERVAL
+                )
+            logging.debug(
+                f"Polled {len(task_ids)} query tasks, {finished} finished; "
+                f"next poll in {interval:.1f}s"
+            )
+
+    async def run_render_task(self, query_object):
+        """
+        Renders a query as an image with a Looker render task and awaits it.
+
+        The image is rendered at ``image_width`` x ``image_height`` pixels, the
+        size of the picture shape, so it does not have to be rescaled. The
+        query is saved with ``create_query`` and submitted with
+        ``create_query_render_task``; :meth:`_poll_render_tasks` polls every
+        pending render task in one round, and the image is downloaded with
+        ``render_task_results`` once the task has succeeded.
+
+        Args:
+            query_object: The query object containing the necessary parameters.
+        Returns:
+            The image content.
+        """
+
+        async def submit(query_id):
+            return await self._api(
+                "create_query_render_task",
+                query_id=query_id,
+                result_format=query_object["result_format"],
+                width=query_object["image_width"],
+                height=query_object["image_height"],
+            )
+
+        task = await self._with_query_id(query_object["body"], submit)
+        future = asyncio.get_running_loop().create_future()
+        self._pending_renders[task.id] = future
+        logging.debug(
+            f"Submitted render task {task.id} "
+            f"({query_object['image_width']}x{query_object['image_height']})"
         )
+        if self._render_poller is None or self._render_poller.done():
+            self._render_poller = asyncio.ensure_future(self._poll_render_tasks())
+        try:
+            await asyncio.wait_for(future, self.query_timeout)
+        finally:
+            self._pending_renders.pop(task.id, None)
+        return await self._api("render_task_results", render_task_id=task.id)
 
-        return response
+    async def _poll_render_tasks(self):
+        """
+        Polls the status of every pending render task until none is pending.
+
+        Looker has no endpoint returning the status of several render tasks, so
+        each round asks for all of them concurrently. Futures of finished tasks
+        are resolved, or failed with an ``SDKError``; a failed poll fails the
+        task it asked for, so its caller can retry.
+        """
+        interval = QUERY_TASK_POLL_INTERVAL
+        while self._pending_renders:
+            await asyncio.sleep(interval)
+            task_ids = [i for i, f in self._pending_renders.items() if not f.done()]
+            statuses = await asyncio.gather(
+                *(
+                    self._api(
+                        "render_task",
+                        render_task_id=task_id,
+                        fields="id,status,status_detail",
+                    )
+                    for task_id in task_ids
+                ),
+                return_exceptions=True,
+            )
+            finished = 0
+            for task_id, status in zip(task_ids, statuses):
+                future = self._pending_renders.get(task_id)
+                if future is None or future.done():
+                    continue
+                if isinstance(status, Exception):
+                    future.set_exception(status)
+                    finished += 1
+                elif status.status in RENDER_TASK_DONE_STATUSES:
+                    finished += 1
+                    if status.status == "success":
+                        future.set_result(None)
+                    else:
+                        future.set_exception(
+                            looker_sdk.error.SDKError(
+                                f"Render task {task_id} failed: {status.status_detail}"
+                            )
+                        )
+            if finished:
+                interval = QUERY_TASK_POLL_INTERVAL
+            else:
+                interval = min(
+                    interval * QUERY_TASK_POLL_BACKOFF, QUERY_TASK_POLL_MAX_INTERVAL
+                )
+            logging.debug(
+                f"Polled {len(task_ids)} render tasks, {finished} finished; "
+                f"next poll in {interval:.1f}s"
+            )
 
     async def make_query(
         self,
@@ -43,29 +1118,112 @@ class LookerClient:
         filter_value: Optional[str] = None,
         filter_overwrites: Optional[dict] = None,
         id: Optional[int] = None,
+        result_needs: Optional[pushdown.ResultNeeds] = None,
+        id_type: str = "look",
+        tile: Optional[str] = None,
         **kwargs,
-    ) -> models.WriteQuery:
+    ) -> dict:
         """
-        Constructs a WriteQuery object based on a Look's definition and provided parameters.
+        Constructs a WriteQuery object based on a Look's definition and provided parameters,
+        and runs it.
         Args:
-            id: The ID of the Look.
+            id: The ID of the Look, or of the dashboard with ``id_type: dashboard``.
+            id_type: ``look``, or ``dashboard`` to run the query of a dashboard tile.
+            tile: The title or element id of the dashboard tile.
             filter: The name of the filter to apply.
             filter_value: The value to set for the filter.
             filter_overwrites: A dictionary of filters to overwrite with new values.
+            result_needs: The columns and rows read by every shape using this
+                Look. When given, measures none of them read are dropped from
+                the query and its row limit is lowered to the rows they read.
             **kwargs: Additional query parameters to set.
         Returns:
-            A WriteQuery object representing the modified query.
+            ``{shape_id: QueryResult}``, or ``{shape_id: None}`` if the query failed.
         """
+        prepared = await self._prepare_query(
+            filter,
+            filter_value,
+            filter_overwrites,
+            id,
+            result_needs,
+            id_type,
+            tile,
+            **kwargs,
+        )
+        if prepared is None:
+            return {shape_id: None}
+        q, projected, options = prepared
+        retries = kwargs.get("retries", 0)
+        self.queries_requested += 1
+
         try:
-            # check if string can be converted to int
-            look = self.client.look(id)
+            if projected is not None:
+                result = await self._run(id, q, projected, options, retries)
+                label = kwargs.get("label")
+                if label is not None and label not in pushdown.result_labels(
+                    result.metadata_fields()
+                ):
+                    logging.debug(
+                        f"Label {label} is not in the narrowed result of Look {id}; "
+                        "running the full query"
+                    )
+                    result = await self._run(id, q, q.fields, options, retries)
+            else:
+                result = await self._run(id, q, q.fields, options, retries)
+        except looker_sdk.error.SDKError as e:
+            logging.error(f"Error retrieving Look with ID {id} : {e}")
+            result = None
+        except TimeoutError:
+            limit = f" within {self.query_timeout:g}s" if self.query_timeout else ""
+            logging.error(f"Query for Look with ID {id} did not finish{limit}")
+            result = None
         except Exception as e:
-            logging.error(
-                f"Error fetching Look with ID {id}, is this a valid Look ID? If it is a meta reference, remember to set id_type: 'meta'"
-            )
-            return {shape_id: None}
+            logging.error(f"Unexpected error retrieving Look with ID {id} : {e}")
+            result = None
+
+        return {shape_id: result}
+
+    async def _prepare_query(
+        self,
+        filter: Optional[str] = None,
+        filter_value: Optional[str] = None,
+        filter_overwrites: Optional[dict] = None,
+        id: Optional[int] = None,
+        result_needs: Optional[pushdown.ResultNeeds] = None,
+        id_type: str = "look",
+        tile: Optional[str] = None,
+        **kwargs,
+    ):
+        """
+        Builds the query of a shape from its Look or tile, as described in
+        :meth:`make_query`, without running it.
 
-        q = look.query
+        Returns:
+            ``(q, projected, options)``: the modified ``models.Query``, the
+            narrowed field list or None, and the run options; or None if the
+            Look or tile could not be fetched.
+        """
+        if id_type == "dashboard":
+            try:
+                query = (await self.get_tile(id, tile)).query
+            except Exception as e:
+                logging.error(f"Error fetching tile {tile!r} of dashboard {id}: {e}")
+                return None
+        else:
+            try:
+                # check if string can be converted to int
+                query = (await self.get_look(id)).query
+            except breaker_module.CircuitOpenError as e:
+                logging.error(f"Not fetching Look with ID {id}: {e}")
+                return None
+            except Exception as e:
+                logging.error(
+                    f"Error fetching Look with ID {id}, is this a valid Look ID? If it is a meta reference, remember to set id_type: 'meta'"
+                )
+                return None
+
+        # The query is shared with other shapes; work on a private copy.
+        q = copy.deepcopy(query)
         for parameter, value in kwargs.items():
             if value is not None:
                 if hasattr(q, parameter):
@@ -107,80 +1265,368 @@ class LookerClient:
                     f"Filter {filter} not found in query filters. Available filters: {q.filters}"
                 )
 
-        body = models.WriteQuery(
-            model=q.model,
-            view=q.view,
-            fields=q.fields,
-            pivots=q.pivots,
-            fill_fields=q.fill_fields,
-            filters=q.filters,
-            sorts=q.sorts,
-            limit=q.limit,
-            column_limit=q.column_limit,
-            total=q.total,
-            row_total=q.row_total,
-            subtotals=q.subtotals,
-            dynamic_fields=q.dynamic_fields,
-            query_timezone=q.query_timezone,
-            vis_config=q.vis_config,
-            visible_ui_sections=q.visible_ui_sections,
-        )
-
         result_format = kwargs.get("result_format", "json_bi")
-        apply_vis = kwargs.get("apply_vis", False)
-        apply_formatting = kwargs.get("apply_formatting", False)
-        server_table_calcs = kwargs.get("server_table_calcs", False)
-        retries = kwargs.get("retries", 0)
+        options = {
+            "result_format": result_format,
+            "apply_vis": kwargs.get("apply_vis", False),
+            "apply_formatting": kwargs.get("apply_formatting", False),
+            "server_table_calcs": kwargs.get("server_table_calcs", False),
+        }
+        for option in EXECUTION_OPTIONS:
+            if kwargs.get(option) is not None:
+                options[option] = kwargs[option]
+        if result_format in RENDER_TASK_FORMATS:
+            # Images are rendered at the size of the picture shape.
+            for option in IMAGE_SIZE_OPTIONS:
+                if kwargs.get(option):
+                    options[option] = kwargs[option]
+
+        projected = None
+        if result_needs is not None and result_format in pushdown.PROJECTABLE_FORMATS:
+            projected = await self._project_fields(q, result_needs)
+        if result_needs is not None and result_format not in ("jpg", "png"):
+            limit = pushdown.row_limit(q, result_needs)
+            if limit is not None:
+                logging.debug(
+                    f"Lowered row limit of Look {id} from {q.limit} to {limit}"
+                )
+                q.limit = limit
 
-        query_object = {
+        return q, projected, options
+
+    async def plan_query(
+        self,
+        shape_id: str,
+        filter_value: Optional[str] = None,
+        result_needs: Optional[pushdown.ResultNeeds] = None,
+        **kwargs,
+    ) -> dict:
+        """
+        Builds the query a shape would run, like :meth:`make_query`, and
+        describes it without running it. Look, dashboard and explore
+        definitions are fetched as usual; nothing is sent to the warehouse.
+
+        Args:
+            shape_id: The shape's id.
+            filter_value: The value to set for the shape's filter.
+            result_needs: As for :meth:`make_query`.
+            **kwargs: The shape's integration, as for :meth:`make_query`.
+        Returns:
+            A plan entry for :func:`looker_powerpoint.plan.summarize`: the
+            shape's ``id_type``, ``id`` and ``tile``, and the ``fingerprint``,
+            ``result_format``, ``fields``, ``limit``, whether the result is
+            ``cached`` in the result cache and its ``estimated_bytes``; or an
+            ``error`` if the query could not be built.
+        """
+        entry = {
             "shape_id": shape_id,
-            "query": {
-                "result_format": result_format,
-                "body": body,
-                "apply_vis": apply_vis,
-                "apply_formatting": apply_formatting,
-                "server_table_calcs": server_table_calcs,
-            },
+            "id_type": kwargs.get("id_type", "look"),
+            "id": kwargs.get("id"),
         }
+        if kwargs.get("tile") is not None:
+            entry["tile"] = kwargs["tile"]
+        prepared = await self._prepare_query(
+            filter_value=filter_value, result_needs=result_needs, **kwargs
+        )
+        if prepared is None:
+            entry["error"] = "The Look or dashboard tile could not be fetched."
+            return entry
+        q, projected, options = prepared
+        fields = projected if projected is not None else q.fields
+        if (
+            self.csv_results
+            and options["result_format"] == "json_bi"
+            and not options["apply_vis"]
+            and not options["apply_formatting"]
+            and await self._csv_fields(q, fields) is not None
+        ):
+            options = {**options, "result_format": csv_results.CSV_FORMAT}
+        query = {**options, "body": write_query(q, fields)}
+        fingerprint = query_fingerprint(query)
+        cached_size = (
+            await self._cache_call(self.cache.cached_size, self._result_key(query))
+            if self.cache is not None and query.get("cache") is not False
+            else None
+        )
+        entry.update(
+            fingerprint=fingerprint,
+            result_format=options["result_format"],
+            fields=list(fields or []),
+            limit=q.limit,
+            cached=cached_size is not None,
+            estimated_bytes=(
+                cached_size
+                if cached_size is not None
+                else plan_module.estimate_payload_bytes(
+                    options["result_format"], fields, q.limit
+                )
+            ),
+        )
+        return entry
 
+    async def _project_fields(self, q, result_needs):
+        """
+        Returns the narrowed field list for a query, or None when it cannot be
+        narrowed. See :mod:`looker_powerpoint.pushdown`.
+        """
+        if result_needs.all_columns or not q.fields or q.pivots or q.dynamic_fields:
+            return None
         try:
+            explore_fields = await self.get_explore_fields(q.model, q.view)
+        except Exception as e:
+            logging.debug(f"Not narrowing query on {q.model}::{q.view}: {e}")
+            return None
+        measures = {
+            name for name, f in explore_fields.items() if f["category"] == "measure"
+        }
+        projected = pushdown.project_fields(q, result_needs, measures)
+        if projected is not None:
+            logging.debug(
+                f"Narrowed query on {q.model}::{q.view} from {len(q.fields)} to "
+                f"{len(projected)} fields for {result_needs}"
+            )
+        return projected
+
+    async def get_explore_fields(self, model: str, explore: str) -> dict:
+        """
+        Fetches an explore's dimensions and measures, at most once per run.
+
+        Args:
+            model: The LookML model.
+            explore: The explore (``Query.view``).
+        Returns:
+            ``{name: field}``, each field a dict with its ``name``, ``category``
+            (``dimension`` or ``measure``), ``label``, ``label_short``,
+            ``field_group_variant`` and ``is_numeric``, the keys ``json_bi``
+            result metadata uses.
+        """
 
-            @retry(
-                stop=stop_after_attempt(retries + 1),
-                wait=wait_fixed(2),
-                before_sleep=before_sleep_log(logging.getLogger(), logging.WARNING),
-                reraise=True,
+        # Explores share the Look definition store, but have no updated_at to
+        # revalidate them by; they are refetched once the cache TTL is over.
+        cache_key = self._definition_key(f"explore:{model}::{explore}")
+
+        async def fetch():
+            cached = None
+            if self.cache is not None and await self._cache_call(
+                self.cache.look_is_fresh, cache_key
+            ):
+                cached = await self._cache_call(self.cache.get_look, cache_key)
+            if cached is not None:
+                logging.debug(f"Reusing cached fields of {model}::{explore}")
+                return json.loads(cached[1])
+            metadata = await self._api(
+                "lookml_model_explore", model, explore, fields="fields"
             )
-            async def run_query_with_retry():
-                return await self.run_query(query_object["query"])
+            fields = {}
+            for category, group in (
+                ("dimension", metadata.fields.dimensions),
+                ("measure", metadata.fields.measures),
+            ):
+                for f in group or []:
+                    field = {"name": f.name, "category": category}
+                    for key in (
+                        "label",
+                        "label_short",
+                        "field_group_variant",
+                        "is_numeric",
+                    ):
+                        if getattr(f, key, None) is not None:
+                            field[key] = getattr(f, key)
+                    fields[f.name] = field
+            if self.cache is not None:
+                await self._cache_call(
+                    self.cache.set_look,
+                    cache_key,
+                    "",
+                    json.dumps(fields).encode("utf-8"),
+                )
+            return fields
 
-            result = await run_query_with_retry()
+        return await self._single_flight(
+            (model, explore), self._explores, self._explore_tasks, fetch
+        )
 
-            if result and result_format in ["json", "json_bi"]:
-                try:
-                    parsed = json.loads(result)
-                    if isinstance(parsed, dict):
-                        # Pack the sorts and pivots into the payload
-                        parsed["custom_sorts"] = list(q.sorts) if q.sorts else []
-                        parsed["custom_pivots"] = list(q.pivots) if q.pivots else []
-                        result = json.dumps(parsed)
-                except (json.JSONDecodeError, TypeError, ValueError) as e:
-                    logging.warning(
-                        "Failed to inject custom_sorts/custom_pivots for shape_id %s, look_id %s: %s",
-                        shape_id,
-                        id,
-                        e,
-                        exc_info=True,
-                    )
+    async def _run(self, id, q, fields, options: dict, retries: int):
+        """
+        Runs the Look's query ``q`` with ``fields`` selected, as ``csv`` when
+        CSV results are enabled and the query qualifies (see
+        :mod:`looker_powerpoint.csv_results`), or else as requested.
+        """
+        if (
+            self.csv_results
+            and options["result_format"] == "json_bi"
+            and not options["apply_vis"]
+            and not options["apply_formatting"]
+        ):
+            columns = await self._csv_fields(q, fields)
+            if columns is not None:
+                csv_options = {**options, "result_format": csv_results.CSV_FORMAT}
+                result = await self._execute(
+                    id, q, fields, csv_options, retries, csv_fields=columns
+                )
+                if result.raw is None or csv_results.header_matches(
+                    result.raw, columns
+                ):
+                    return result
+                logging.warning(
+                    f"CSV result of Look {id} does not match its fields; "
+                    "running json_bi queries for the rest of the run"
+                )
+                self.csv_results = False
+        return await self._execute(id, q, fields, options, retries)
 
-        except looker_sdk.error.SDKError as e:
-            logging.error(f"Error retrieving Look with ID {id} : {e}")
-            result = None
+    async def _csv_fields(self, q, fields):
+        """The columns of ``q``'s CSV result, or None without a CSV fast path."""
+        try:
+            explore_fields = await self.get_explore_fields(q.model, q.view)
         except Exception as e:
-            logging.error(f"Unexpected error retrieving Look with ID {id} : {e}")
-            result = None
+            logging.debug(f"Not reading {q.model}::{q.view} as CSV: {e}")
+            return None
+        narrowed = copy.copy(q)
+        narrowed.fields = fields
+        return csv_results.csv_fields(narrowed, explore_fields)
 
-        return {shape_id: result}
+    async def _execute(
+        self, id, q, fields, options: dict, retries: int, csv_fields=None
+    ):
+        """
+        Runs the Look's query ``q`` with ``fields`` selected.
+
+        Shapes that end up with an identical query share one execution, and the
+        result cache is consulted first when it is enabled.
+
+        Args:
+            id: The Look id, for logging.
+            q: The (modified) ``models.Query`` of the Look.
+            fields: The fields to select.
+            options: ``result_format``, ``apply_vis``, ``apply_formatting`` and
+                ``server_table_calcs``.
+            retries: Retries allowed for this query.
+            csv_fields: The columns of the result, for ``csv`` queries run in
+                place of ``json_bi``.
+        Returns:
+            A ``QueryResult``.
+        """
+        body = write_query(q, fields)
+        query = {**options, "body": body}
+        result_format = options["result_format"]
+        fingerprint = query_fingerprint(query)
+
+        async def run_query_once(query):
+            if (
+                result_format in RENDER_TASK_FORMATS
+                and query.get("image_width")
+                and query.get("image_height")
+                and not query.get("cache_only")
+            ):
+                attempt = self.run_render_task(query)
+            elif self.query_tasks and result_format in QUERY_TASK_FORMATS:
+                attempt = self.run_query_task(query)
+            else:
+                attempt = self.run_query(query)
+            return await attempt
+
+        run_query_with_retry = retry(
+            # The run-wide budget is only charged while attempts remain.
+            stop=stop_after_attempt(retries + 1) | self.retry_budget,
+            wait=retry_module.wait_retry_after(),
+            retry=retry_if_exception(retry_module.is_retryable),
+            before_sleep=before_sleep_log(logging.getLogger(), logging.WARNING),
+            reraise=True,
+        )(run_query_once)
+
+        async def execute():
+            self.queries_executed += 1
+            started = time.monotonic()
+            payload = None
+            from_cache = False
+            from_looker_cache = False
+            result_key = None
+            if self.cache is not None:
+                result_key = self._result_key(query)
+            # Shapes setting cache: false always run against the warehouse.
+            if result_key is not None and query.get("cache") is not False:
+                payload = await self._cache_call(self.cache.get, result_key)
+                if payload is not None:
+                    logging.debug(
+                        f"Result cache hit for Look {id} ({fingerprint[:12]})"
+                    )
+                    self.cache_hits += 1
+                    from_cache = True
+
+            if payload is None:
+                payload, from_looker_cache = await self._fetch(
+                    id, query, run_query_with_retry, run_query_once
+                )
+                if result_key is not None and payload:
+                    await self._cache_call(
+                        self.cache.set,
+                        result_key,
+                        payload
+                        if isinstance(payload, (str, bytes))
+                        else json.dumps(payload),
+                    )
+
+            result = QueryResult.from_payload(
+                payload,
+                result_format,
+                sorts=list(q.sorts) if q.sorts else [],
+                pivots=list(q.pivots) if q.pivots else [],
+                elapsed=time.monotonic() - started,
+                from_cache=from_cache,
+                from_looker_cache=from_looker_cache,
+                fields=csv_fields,
+            )
+            logging.debug(
+                f"Query for Look {id} returned "
+                f"{result.size if result.size is not None else 'decoded'} bytes "
+                f"in {result.elapsed:.2f}s"
+            )
+            return result
+
+        return await self._single_flight(
+            fingerprint, self._results, self._result_tasks, execute
+        )
+
+    async def _fetch(self, id, query: dict, run, probe):
+        """
+        Runs ``query`` with ``run``, taking the result from Looker's result
+        cache first when the run prefers cached results.
+
+        A cached result is asked for with ``cache_only``, once and without
+        retries; an error, timeout or empty response means Looker has none,
+        and the query then runs against the warehouse, unless the run (or the
+        shape) is cache-only. Shapes setting ``cache: false`` always run
+        against the warehouse.
+
+        Args:
+            id: The Look id, for logging.
+            query: The query object.
+            run: Coroutine function running a query object, with retries.
+            probe: Coroutine function running a query object once.
+        Returns:
+            ``(payload, from_looker_cache)``.
+        """
+        if query.get("cache_only"):
+            payload = await run(query)
+            self.looker_cache_hits += 1
+            return payload, True
+        if not self.prefer_cached or query.get("cache") is False:
+            return await run(query), False
+
+        payload = None
+        try:
+            payload = await probe({**query, "cache": True, "cache_only": True})
+        except (looker_sdk.error.SDKError, TimeoutError) as e:
+            logging.debug(f"No cached Looker result for Look {id}: {e}")
+        if payload:
+            self.looker_cache_hits += 1
+            return payload, True
+        if self.cache_only:
+            raise looker_sdk.error.SDKError(
+                f"Looker has no cached result for Look {id} and --cache-only is set"
+            )
+        return await run(query), False
 
     async def _async_write_queries(self, shape_id, filter_value=None, **kwargs):
         """
@@ -1,5 +1,6 @@
+import json
 import logging
-from typing import List, Optional
+from typing import Any, List, Optional, Union
 from pydantic import BaseModel, Field, model_validator, field_validator, ValidationError
 
 
@@ -11,12 +12,17 @@ class LookerReference(BaseModel):
 
     id: str = Field(
         ...,
-        description="The ID of the Look or meta-look (meta_name) you want to reference.",
+        description="The ID of the Look, dashboard or meta-look (meta_name) you want to reference.",
     )
     id_type: str = Field(
         default="look",
-        description="The type of ID provided: 'look' or 'meta'. Defaults to 'look'."
-        " Setting to 'meta' indicates that the ID refers to a meta Look.",
+        description="The type of ID provided: 'look', 'dashboard' or 'meta'. Defaults to 'look'."
+        " Setting to 'meta' indicates that the ID refers to a meta Look."
+        " Setting to 'dashboard' runs the query of the dashboard tile selected with 'tile'.",
+    )
+    tile: str = Field(
+        default=None,
+        description="With id_type 'dashboard', the title or element id of the dashboard tile whose query to run. The dashboard's default filter values are applied.",
     )
     meta: bool = Field(
         default=False,
@@ -84,9 +90,21 @@ class LookerReference(BaseModel):
         default=0,
         description="Number of retries for the Looker API request in case of failure. Defaults to 0.",
     )
+    cache: bool = Field(
+        default=None,
+        description="Whether Looker may answer from its result cache. Unset uses Looker's default (yes).",
+    )
+    cache_only: bool = Field(
+        default=None,
+        description="Only take the result from Looker's result cache, even if it has expired; the shape fails if there is none.",
+    )
+    force_production: bool = Field(
+        default=None,
+        description="Run the query against the production LookML even when the API user is in development mode.",
+    )
     # optional parameters for the Look (Default to None)
 
-    @field_validator("id", mode="before")
+    @field_validator("id", "tile", mode="before")
     @classmethod
     def convert_int(cls, value):
         """Validation: Convert integer values to strings."""
@@ -134,8 +152,13 @@ class LookerShape(BaseModel):
                 data["integration"]["result_format"] = data["integration"].get(
                     "result_format", "json_bi"
                 )
-                data["integration"]["image_width"] = round(data["shape_width"])
-                data["integration"]["image_height"] = round(data["shape_height"])
+                # Render at the picture's size unless the alt text sets one.
+                data["integration"]["image_width"] = data["integration"].get(
+                    "image_width"
+                ) or round(data["shape_width"])
+                data["integration"]["image_height"] = data["integration"].get(
+                    "image_height"
+                ) or round(data["shape_height"])
 
             elif data["shape_type"] == "TABLE":
                 if data["integration"].get("apply_formatting") is None:
@@ -229,3 +252,92 @@ class GeminiShape(BaseModel):
     shape_height: Optional[int] = Field(default=None)
     integration: GeminiConfig
     shape_number: Optional[int] = Field(default=None)
+
+
+class QueryResult(BaseModel):
+    """
+    The result of a Looker query as handed from ``LookerClient`` to the CLI.
+
+    The response is decoded exactly once: JSON result formats are parsed into
+    ``data``, anything else (images, csv) is kept as received in ``raw``.
+    """
+
+    result_format: str = Field(
+        default="json_bi", description="The result format the query was run with."
+    )
+    data: Any = Field(
+        default=None,
+        description="The parsed payload for JSON result formats, e.g. ``{'metadata': ..., 'rows': [...]}``.",
+    )
+    raw: Optional[Union[str, bytes]] = Field(
+        default=None,
+        description="The payload as received, for result formats that are not JSON.",
+    )
+    sorts: List[str] = Field(
+        default_factory=list,
+        description="The sorts of the query, e.g. ``'view.date desc 0'``.",
+    )
+    pivots: List[str] = Field(
+        default_factory=list, description="The pivot fields of the query."
+    )
+    size: Optional[int] = Field(
+        default=None,
+        description="Size of the response in bytes, or None if it arrived already decoded.",
+    )
+    elapsed: float = Field(
+        default=0.0, description="Seconds spent fetching the result."
+    )
+    from_cache: bool = Field(
+        default=False,
+        description="Whether the result came from the query result cache.",
+    )
+    from_looker_cache: bool = Field(
+        default=False,
+        description="Whether Looker answered from its own result cache instead of the warehouse.",
+    )
+    fields: Optional[List[dict]] = Field(
+        default=None,
+        description="For csv results run in place of json_bi: the field of each column, in column order.",
+    )
+
+    @classmethod
+    def from_payload(cls, payload, result_format: str = "json_bi", **kwargs):
+        """
+        Build a result from a Looker response, parsing it if it is JSON.
+
+        Args:
+            payload: The response as ``str`` or ``bytes``, or an already decoded
+                JSON object (query tasks return those).
+            result_format: The result format the query was run with.
+            **kwargs: Other fields, e.g. ``sorts`` or ``elapsed``.
+        """
+        if not isinstance(payload, (str, bytes)):
+            return cls(result_format=result_format, data=payload, **kwargs)
+        size = len(payload)
+        if result_format.startswith("json") or result_format == "inline_json":
+            try:
+                return cls(
+                    result_format=result_format,
+                    data=json.loads(payload),
+                    size=size,
+                    **kwargs,
+                )
+            except ValueError as e:
+                logging.warning(f"Could not parse {result_format} result: {e}")
+        return cls(result_format=result_format, raw=payload, size=size, **kwargs)
+
+    def parsed(self):
+        """The parsed JSON payload, parsing ``raw`` if it was not JSON-decoded yet."""
+        if self.data is None and self.raw is not None:
+            return json.loads(self.raw)
+        return self.data
+
+    def metadata_fields(self) -> dict:
+        """The result's ``metadata.fields``, for JSON and csv results alike."""
+        if self.fields is not None:
+            return {
+                "dimensions": [f for f in self.fields if f["category"] == "dimension"],
+                "measures": [f for f in self.fields if f["category"] == "measure"],
+                "table_calculations": [],
+            }
+        return (self.parsed() or {}).get("metadata", {}).get("fields", {})
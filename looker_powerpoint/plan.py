@@ -0,0 +1,104 @@
+"""
+Query plans: what a deck will ask of Looker, worked out without running it.
+
+``lppt --plan`` reads the deck, fetches the Look and dashboard definitions its
+shapes reference and builds the ``WriteQuery`` each shape would run, with the
+same filters, pushdown and result format as a real run, but executes none of
+them.  ``LookerClient.plan_query`` describes each shape's query as a plan
+entry; :func:`summarize` adds up the entries into a report of the distinct
+Looks and queries, how many queries would be deduplicated or served from the
+result cache and how much data would be transferred.
+
+Payload sizes are estimates: the row count is the query's ``limit`` (Looker's
+default limit when it has none) and every cell is assumed to take
+:data:`CELL_BYTES` bytes in the result format.  Results found in the result
+cache are counted with their actual size.  Pivots multiply the columns of a
+result in ways the query does not describe, so their sizes are a lower bound.
+"""
+
+from typing import List, Optional
+
+# Rows Looker returns for a query without a limit.
+DEFAULT_ROW_LIMIT = 5000
+# Approximate bytes per cell of a result, by result format. json_bi wraps every
+# cell in an object with its value, rendered value and links.
+CELL_BYTES = {"json_bi": 64, "json": 24, "csv": 12, "txt": 12}
+DEFAULT_CELL_BYTES = 32
+
+
+def estimate_payload_bytes(
+    result_format: str, fields: Optional[List[str]], limit: Optional[str]
+) -> Optional[int]:
+    """
+    Estimate the size of a query result in bytes.
+
+    Args:
+        result_format: The format the query runs as.
+        fields: The fields the query selects.
+        limit: The query's ``limit``.
+    Returns:
+        The estimated size, or ``None`` for images, whose size the query does
+        not tell.
+    """
+    if result_format in ("png", "jpg"):
+        return None
+    try:
+        rows = int(limit)
+    except (TypeError, ValueError):
+        rows = None
+    if rows is None or rows <= 0:
+        rows = DEFAULT_ROW_LIMIT
+    cell_bytes = CELL_BYTES.get(result_format, DEFAULT_CELL_BYTES)
+    return rows * len(fields or []) * cell_bytes
+
+
+def summarize(entries: List[dict]) -> dict:
+    """
+    Add up the plan entries of a deck's shapes.
+
+    Args:
+        entries: One dict per shape, as returned by ``LookerClient.plan_query``:
+            its ``id_type`` and ``id`` and, unless it has an ``error``, the
+            query's ``fingerprint``, whether it is ``cached`` and its
+            ``estimated_bytes``.
+    Returns:
+        The report: distinct Looks and dashboards, the number of queries
+        requested and distinct queries, the dedup ratio, the distinct queries
+        expected to be served from the result cache and to run, the estimated
+        payload of the distinct queries and the ``shapes`` entries themselves.
+    """
+    looks = set()
+    dashboards = set()
+    queries = {}
+    errors = 0
+    for entry in entries:
+        if entry["id_type"] == "dashboard":
+            dashboards.add(entry["id"])
+        else:
+            looks.add(entry["id"])
+        if entry.get("error"):
+            errors += 1
+            continue
+        queries.setdefault(entry["fingerprint"], entry)
+
+    requested = len(entries) - errors
+    cache_hits = sum(1 for entry in queries.values() if entry["cached"])
+    estimates = [
+        entry["estimated_bytes"]
+        for entry in queries.values()
+        if entry["estimated_bytes"] is not None
+    ]
+    return {
+        "looks": sorted(looks, key=str),
+        "dashboards": sorted(dashboards, key=str),
+        "distinct_looks": len(looks),
+        "distinct_dashboards": len(dashboards),
+        "queries_requested": requested,
+        "distinct_queries": len(queries),
+        "dedup_ratio": round(requested / max(len(queries), 1), 2),
+        "expected_cache_hits": cache_hits,
+        "queries_to_run": len(queries) - cache_hits,
+        "estimated_bytes": sum(estimates),
+        "errors": errors,
+        "shapes": entries,
+    }
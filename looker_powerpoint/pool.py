@@ -0,0 +1,48 @@
+"""
+The HTTP connection pool shared by Looker API calls and image downloads.
+
+The Looker SDK sends its requests through a ``requests.Session`` that keeps
+only a handful of connections per host, and image downloads used to open a new
+TCP and TLS connection for every PICTURE shape.  :func:`configure_session`
+mounts one keep-alive pool on the SDK's session, sized to the run's
+concurrency, and ``LookerClient.download_image`` downloads through the same
+session, so a deck with dozens of images from one CDN reuses a few warm
+connections.
+
+Each host gets its own pool of at most ``max_per_host`` connections; requests
+beyond that wait for a connection to be returned instead of opening more, so a
+large deck never floods a single host.  Pools of the least recently used hosts
+are closed once more than ``max_hosts`` hosts were contacted.
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Number of hosts whose connections are kept open at once: the Looker instance
+# plus the image hosts a deck links to.
+DEFAULT_MAX_HOSTS = 10
+
+
+def configure_session(
+    session: requests.Session,
+    max_per_host: int,
+    max_hosts: int = DEFAULT_MAX_HOSTS,
+) -> requests.Session:
+    """
+    Mount a keep-alive connection pool with a per-host limit on ``session``.
+
+    Args:
+        session: The session to configure, typically the Looker SDK's.
+        max_per_host: Connections kept open, and used at once, per host.
+        max_hosts: Hosts whose pools are kept open at once.
+    Returns:
+        ``session``, for chaining.
+    """
+    adapter = HTTPAdapter(
+        pool_connections=max(1, max_hosts),
+        pool_maxsize=max(1, max_per_host),
+        pool_block=True,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
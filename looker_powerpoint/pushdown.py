@@ -0,0 +1,231 @@
+"""
+Query pushdown: narrow a Look's query to what the shapes using it consume.
+
+A text box that shows ``label: revenue`` or ``column: 2`` only reads one value
+of the result, yet the Look may select dozens of measures and thousands of
+rows.  :func:`shape_result_needs` works out which columns and how many rows a
+shape reads, :meth:`ResultNeeds.merge` combines the needs of every shape using
+the same Look (so they still share one query), :func:`project_fields` drops
+the measures none of them read and :func:`row_limit` lowers the query's
+``limit`` to the rows they read.
+
+Projection is deliberately conservative:
+
+* Dimensions are always kept, since they define the grain (and therefore the
+  rows) of the result.  Measures used in sorts are kept as well.
+* Queries with pivots or dynamic fields (custom fields, table calculations)
+  are never narrowed, as their columns depend on each other.
+* Shapes that read the whole result (tables, charts, meta shapes, text boxes
+  with Jinja tags) disable projection for every shape sharing their Look.
+
+Row limits follow the same rules.  A text box reads rows up to its ``row``
+index and a table reads as many rows as it has below its header; charts and
+the other whole-result shapes need every row.  Queries with subtotals or filled
+dimensions are never limited, since those add rows to the result.
+"""
+
+from typing import Iterable, List, Optional
+
+from looker_powerpoint.models import LookerShape
+from looker_powerpoint.tools.pptx_text_handler import has_jinja_tags
+
+# Shape types whose content is a single value picked with label / column.
+TEXT_SHAPE_TYPES = ("TEXT_BOX", "TITLE", "AUTO_SHAPE")
+# Result formats projection applies to; images and other formats are left alone.
+PROJECTABLE_FORMATS = ("json", "json_bi")
+
+
+class ResultNeeds:
+    """
+    The columns and rows a group of shapes reads from a query result.
+
+    Args:
+        labels: Column labels read with ``label``.
+        max_column: Highest column index read with ``column``.
+        all_columns: Whether some shape reads every column.
+        rows: Number of leading rows read, or ``None`` if some shape reads
+            every row.
+    """
+
+    def __init__(
+        self,
+        labels: Iterable[str] = (),
+        max_column: Optional[int] = None,
+        all_columns: bool = False,
+        rows: Optional[int] = None,
+    ):
+        self.labels = frozenset(labels)
+        self.max_column = max_column
+        self.all_columns = all_columns
+        self.rows = rows
+
+    @classmethod
+    def all(cls) -> "ResultNeeds":
+        return cls(all_columns=True)
+
+    @property
+    def everything(self) -> bool:
+        """Whether the whole result is read, leaving nothing to push down."""
+        return self.all_columns and self.rows is None
+
+    def merge(self, other: "ResultNeeds") -> "ResultNeeds":
+        """The needs of both groups of shapes together."""
+        rows = None
+        if self.rows is not None and other.rows is not None:
+            rows = max(self.rows, other.rows)
+        if self.all_columns or other.all_columns:
+            return ResultNeeds(all_columns=True, rows=rows)
+        columns = [c for c in (self.max_column, other.max_column) if c is not None]
+        return ResultNeeds(
+            labels=self.labels | other.labels,
+            max_column=max(columns) if columns else None,
+            rows=rows,
+        )
+
+    def as_dict(self) -> dict:
+        """
+        The needs as plain data: ``columns`` (``"all"``, or the labels and
+        highest column index read) and ``rows`` (``None`` for every row).
+        """
+        if self.all_columns:
+            columns = "all"
+        else:
+            columns = {"labels": sorted(self.labels), "max_column": self.max_column}
+        return {"columns": columns, "rows": self.rows}
+
+    def __repr__(self):
+        if self.everything:
+            return "ResultNeeds(everything)"
+        if self.all_columns:
+            columns = "all_columns"
+        else:
+            columns = f"labels={sorted(self.labels)}, max_column={self.max_column}"
+        return f"ResultNeeds({columns}, rows={self.rows})"
+
+
+def shape_result_needs(
+    shape: LookerShape,
+    text: Optional[str] = None,
+    table_rows: Optional[int] = None,
+) -> ResultNeeds:
+    """
+    Work out which columns and rows of its query result a shape reads.
+
+    Args:
+        shape: The shape.
+        text: The shape's current text, for text shapes.
+        table_rows: Number of rows of the shape's table, header included, for
+            table shapes.
+    """
+    integration = shape.integration
+    if integration.meta:
+        return ResultNeeds.all()
+    if shape.shape_type == "TABLE":
+        # Cli._fill_table writes data from the second table row onwards.
+        if table_rows is None:
+            return ResultNeeds.all()
+        return ResultNeeds(all_columns=True, rows=max(0, table_rows - 1))
+    if shape.shape_type in TEXT_SHAPE_TYPES:
+        # Jinja templates can reference any column through header_rows.
+        if has_jinja_tags(text):
+            return ResultNeeds.all()
+    elif shape.shape_type != "PICTURE" or integration.result_format in ("jpg", "png"):
+        return ResultNeeds.all()
+
+    # A single value is read from one row, as in Cli._select_slice_from_df.
+    row = integration.row if integration.row is not None else 0
+    rows = row + 1 if row >= 0 else None
+    # Label takes precedence over column.
+    if integration.label is not None:
+        return ResultNeeds(labels=[integration.label], rows=rows)
+    if integration.column is not None and integration.column >= 0:
+        return ResultNeeds(max_column=integration.column, rows=rows)
+    return ResultNeeds.all()
+
+
+def column_label(field: dict) -> str:
+    """The column name ``Cli._make_df`` gives a field from the result metadata."""
+    return (
+        field.get("field_group_variant", field["name"])
+        .strip()
+        .lower()
+        .replace(" ", "_")
+    )
+
+
+def result_labels(fields: dict) -> set:
+    """All column labels of a result, given its ``metadata.fields``."""
+    return {
+        column_label(field)
+        for group in ("dimensions", "measures", "table_calculations")
+        for field in fields.get(group, [])
+    }
+
+
+def _field_for_label(label: str, fields: List[str]) -> Optional[str]:
+    """
+    Guess which field a label refers to: its full name, or the part after the
+    view name. The guess is checked against the result's metadata afterwards.
+    """
+    normalized = label.strip().lower().replace(" ", "_")
+    for field in fields:
+        if normalized in (field.lower(), field.split(".")[-1].lower()):
+            return field
+    return None
+
+
+def project_fields(query, needs: ResultNeeds, measures: set) -> Optional[List[str]]:
+    """
+    The narrowed field list for a query, or ``None`` if it cannot be narrowed.
+
+    Args:
+        query: The Look's ``models.Query``.
+        needs: The merged needs of every shape using the query.
+        measures: Names of the measures in the query's explore.
+    """
+    if needs.all_columns or not query.fields or query.pivots or query.dynamic_fields:
+        return None
+
+    dimensions = [f for f in query.fields if f not in measures]
+    selected = [f for f in query.fields if f in measures]
+    keep = set()
+    for label in needs.labels:
+        field = _field_for_label(label, query.fields)
+        if field is None:
+            return None
+        keep.add(field)
+    if needs.max_column is not None:
+        # Columns are dimensions first, then measures, in query order; keep every
+        # measure up to the highest index so positions do not shift.
+        keep.update(selected[: max(0, needs.max_column - len(dimensions) + 1)])
+    for sort in query.sorts or []:
+        keep.add(str(sort).split()[0])
+
+    projected = [f for f in query.fields if f in dimensions or f in keep]
+    if len(projected) == len(query.fields):
+        return None
+    return projected
+
+
+def row_limit(query, needs: ResultNeeds) -> Optional[str]:
+    """
+    The lowered ``limit`` for a query, or ``None`` if it cannot be lowered.
+
+    Args:
+        query: The Look's ``models.Query``.
+        needs: The merged needs of every shape using the query.
+    """
+    if needs.rows is None or query.subtotals or query.fill_fields:
+        return None
+    # Pivoted columns and table calculations can depend on every returned row.
+    if query.pivots or query.dynamic_fields:
+        return None
+    rows = max(1, needs.rows)
+    try:
+        current = int(query.limit)
+    except (TypeError, ValueError):
+        current = None
+    # A missing or negative limit means Looker's default or no limit at all.
+    if current is not None and 0 < current <= rows:
+        return None
+    return str(rows)
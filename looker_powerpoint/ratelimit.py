@@ -0,0 +1,71 @@
+"""
+Request rate limiting for the Looker API.
+
+:class:`TokenBucket` caps the number of requests started per second across the
+whole run, no matter whether they are issued from the event loop, a worker
+thread or the (synchronous) image download loop.  Callers *reserve* a token and
+are told how long to wait for it, so a burst of callers is spread out evenly
+instead of all retrying at once.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Tokens are added continuously at ``rate`` per second up to ``burst``.  Each
+    request takes one token; when none is left the request is scheduled for the
+    moment its token becomes available.
+
+    Args:
+        rate: Requests per second. ``0`` or less disables the limit.
+        burst: Number of requests that may start at once after an idle period.
+            Defaults to ``max(1, rate)``.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def reserve(self) -> float:
+        """
+        Take a token and return the number of seconds to wait before using it.
+        """
+        if not self.enabled:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self) -> float:
+        """Block until a token is available. Returns the time waited."""
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    async def acquire_async(self) -> float:
+        """Wait on the event loop until a token is available. Returns the time waited."""
+        delay = self.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+        return delay
@@ -0,0 +1,191 @@
+"""
+Retry policy for Looker API calls.
+
+Failed queries are retried with exponential backoff and full jitter, so shapes
+that failed together do not retry in lockstep.  When Looker answers 429 or 503
+with a ``Retry-After`` header, that delay is honoured instead.  Only errors that
+can succeed on a second attempt are retried (see :func:`is_retryable`), and a
+:class:`RetryBudget` caps the number of retries across the whole run so an
+outage fails the deck quickly instead of multiplying load on Looker.
+
+The blocking ``looker_sdk`` transport does not expose the HTTP status of a
+failed request, so :func:`record_response` is installed as a ``requests``
+response hook and :meth:`LookerAPIError.from_sdk_error` attaches the status of
+the calling thread's last response to the SDK's error.
+"""
+
+import datetime
+import email.utils
+import logging
+import random
+import threading
+from typing import Optional
+
+import looker_sdk
+import requests
+from tenacity import wait_exponential
+from tenacity.stop import stop_base
+from tenacity.wait import wait_base
+
+# Statuses worth retrying: timeouts, rate limiting and server-side failures.
+RETRYABLE_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+# Retries allowed across the whole run when --retry-budget / RETRY_BUDGET is not set.
+DEFAULT_RETRY_BUDGET = 20
+
+# Exponential backoff: first delay of up to BACKOFF_INITIAL seconds, doubling
+# per attempt, never more than BACKOFF_MAX. Retry-After is capped at
+# MAX_RETRY_AFTER seconds so one header cannot stall the run.
+BACKOFF_INITIAL = 1.0
+BACKOFF_MAX = 30.0
+MAX_RETRY_AFTER = 120.0
+
+_last_response = threading.local()
+
+
+class LookerAPIError(looker_sdk.error.SDKError):
+    """
+    An ``SDKError`` carrying the HTTP status of the failed request.
+
+    Args:
+        message: The error message.
+        status: HTTP status code, or ``None`` if no response was received.
+        retry_after: Seconds to wait before retrying, from ``Retry-After``.
+    """
+
+    def __init__(
+        self,
+        message: str,
+        status: Optional[int] = None,
+        retry_after: Optional[float] = None,
+        **kwargs,
+    ):
+        super().__init__(message, **kwargs)
+        self.status = status
+        self.retry_after = retry_after
+
+    @classmethod
+    def from_sdk_error(cls, error: looker_sdk.error.SDKError):
+        """
+        Wrap an error raised by the blocking SDK with the status recorded by
+        :func:`record_response` for the current thread.
+        """
+        return cls(
+            error.message,
+            status=getattr(_last_response, "status", None),
+            retry_after=getattr(_last_response, "retry_after", None),
+            errors=error.errors,
+            documentation_url=error.documentation_url,
+        )
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a ``Retry-After`` header given in seconds or as an HTTP date.
+
+    Returns:
+        Seconds to wait, or ``None`` if the header is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return max(0.0, (when - now).total_seconds())
+
+
+def record_response(response, *args, **kwargs):
+    """``requests`` response hook remembering the status of the thread's last response."""
+    _last_response.status = response.status_code
+    _last_response.retry_after = parse_retry_after(response.headers.get("Retry-After"))
+
+
+def reset_last_response():
+    """Forget the last response of the current thread before a new SDK call."""
+    _last_response.status = None
+    _last_response.retry_after = None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Whether a failed Looker call may succeed when retried.
+
+    HTTP errors are retryable for :data:`RETRYABLE_STATUSES`; other 4xx
+    responses (bad credentials, missing Looks, invalid queries) are fatal.
+    Connection failures and timeouts, which have no status, are retryable.
+    Other ``SDKError`` s, such as a failed query task, are fatal.
+    """
+    if isinstance(error, LookerAPIError):
+        return error.status is None or error.status in RETRYABLE_STATUSES
+    if isinstance(error, looker_sdk.error.SDKError):
+        return False
+    return isinstance(
+        error,
+        (
+            TimeoutError,
+            ConnectionError,
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+        ),
+    )
+
+
+class RetryBudget(stop_base):
+    """
+    Run-wide cap on the number of retries.
+
+    Used as a ``tenacity`` stop condition: each retry takes one unit from the
+    budget, and once it is spent every further failure is final.
+
+    Args:
+        total: Number of retries allowed across the run.
+    """
+
+    def __init__(self, total: int = DEFAULT_RETRY_BUDGET):
+        self.total = max(0, total)
+        self.used = 0
+        self._lock = threading.Lock()
+        self._exhausted_logged = False
+
+    @property
+    def remaining(self) -> int:
+        return self.total - self.used
+
+    def __call__(self, retry_state) -> bool:
+        with self._lock:
+            if self.used < self.total:
+                self.used += 1
+                return False
+            if not self._exhausted_logged:
+                self._exhausted_logged = True
+                logging.warning(
+                    f"Retry budget of {self.total} retries exhausted; remaining failures are not retried."
+                )
+            return True
+
+
+class wait_retry_after(wait_base):
+    """
+    Wait as long as the failed call's ``Retry-After`` asks, or else a random
+    time between zero and an exponentially growing delay (full jitter).
+
+    Args:
+        initial: Upper bound of the first delay in seconds.
+        maximum: Upper bound of any delay in seconds.
+    """
+
+    def __init__(self, initial: float = BACKOFF_INITIAL, maximum: float = BACKOFF_MAX):
+        self.backoff = wait_exponential(multiplier=initial, max=maximum)
+
+    def __call__(self, retry_state) -> float:
+        error = retry_state.outcome.exception()
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after is not None:
+            return min(retry_after, MAX_RETRY_AFTER)
+        return random.uniform(0, self.backoff(retry_state))
@@ -0,0 +1,118 @@
+"""
+Access tokens shared across ``lppt`` invocations.
+
+Logging in to Looker costs a round trip per run, and a scheduler rendering
+hundreds of decks a morning puts noticeable load on Looker's auth endpoint.
+:class:`TokenCache` keeps the access token of each Looker instance and API
+client in a small JSON file readable only by the current user, so the next
+invocation can reuse it until shortly before it expires.  The client secret is
+never stored; entries are keyed by a hash of the instance URL and client id.
+
+A token Looker rejects before its expiry (e.g. because it was revoked) is
+replaced by logging in again; see ``LookerClient._api``.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import stat
+import tempfile
+import time
+from typing import Optional, Tuple
+
+from looker_powerpoint.cache import default_cache_dir
+
+TOKEN_FILE_NAME = "tokens.json"
+
+# Tokens are not reused during their last REUSE_MARGIN seconds, so a run does
+# not start with a token that expires halfway through it.
+REUSE_MARGIN = 120
+
+
+def _key(base_url: str, client_id: str) -> str:
+    return hashlib.sha256(f"{base_url}\n{client_id}".encode("utf-8")).hexdigest()
+
+
+class TokenCache:
+    """
+    User-private store of Looker access tokens and their expiry.
+
+    Args:
+        cache_dir: Directory holding the token file. Created if missing.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.path = os.path.join(self.cache_dir, TOKEN_FILE_NAME)
+
+    def _read(self) -> dict:
+        try:
+            if os.name != "nt" and os.stat(self.path).st_mode & (
+                stat.S_IRWXG | stat.S_IRWXO
+            ):
+                logging.warning(
+                    f"Ignoring token cache {self.path}: it is readable by other users."
+                )
+                return {}
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.debug(f"Could not read token cache {self.path}: {e}")
+            return {}
+
+    def _write(self, tokens: dict):
+        os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+        # Write to a private temporary file and rename it, so concurrent runs
+        # never read a partially written file.
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix=".tokens-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(tokens, f)
+            os.chmod(tmp, 0o600)
+            os.replace(tmp, self.path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def get(self, base_url: str, client_id: str) -> Optional[Tuple[str, float]]:
+        """
+        Return ``(access_token, seconds_left)`` for an instance and client, or
+        ``None`` if no token is stored or it expires within :data:`REUSE_MARGIN`.
+        """
+        entry = self._read().get(_key(base_url, client_id))
+        if not entry:
+            return None
+        seconds_left = entry["expires_at"] - time.time()
+        if seconds_left <= REUSE_MARGIN:
+            return None
+        return entry["access_token"], seconds_left
+
+    def set(self, base_url: str, client_id: str, access_token: str, expires_in: float):
+        """Store a token valid for another ``expires_in`` seconds."""
+        now = time.time()
+        tokens = {
+            key: entry
+            for key, entry in self._read().items()
+            if entry.get("expires_at", 0) > now
+        }
+        tokens[_key(base_url, client_id)] = {
+            "access_token": access_token,
+            "expires_at": now + expires_in,
+        }
+        try:
+            self._write(tokens)
+        except OSError as e:
+            logging.debug(f"Could not write token cache {self.path}: {e}")
+
+    def forget(self, base_url: str, client_id: str):
+        """Drop the token stored for an instance and client."""
+        tokens = self._read()
+        if tokens.pop(_key(base_url, client_id), None) is not None:
+            try:
+                self._write(tokens)
+            except OSError as e:
+                logging.debug(f"Could not write token cache {self.path}: {e}")
@@ -91,9 +91,32 @@ def get_presentation_objects_with_descriptions(pptx_path):
         print(f"Error opening presentation: {e}")
         return []
 
-    objects_with_descriptions = []
+    return [
+        description
+        for slide_descriptions in iter_slide_descriptions(presentation)
+        for description in slide_descriptions
+    ]
 
+
+def iter_slide_descriptions(presentation):
+    """
+    Yields the shapes with descriptions of an opened presentation, one slide at
+    a time, so callers can act on the first slides while later ones have not
+    been read yet.
+
+    Each slide is read completely before it is yielded, so the caller may modify
+    it (e.g. replace a picture) without disturbing the scan.
+
+    Args:
+        presentation: A ``pptx.Presentation``.
+
+    Yields:
+        list: The dictionaries described in
+              :func:`get_presentation_objects_with_descriptions` for one slide;
+              empty for slides without descriptions.
+    """
     for i, slide in enumerate(presentation.slides, start=0):
+        objects_with_descriptions = []
         for shape in slide.shapes:
             description = extract_alt_text(shape)  # Generate description
 
@@ -122,7 +145,7 @@ def get_presentation_objects_with_descriptions(pptx_path):
                     }
                 )
 
-    return objects_with_descriptions
+        yield objects_with_descriptions
 
 
 if __name__ == "__main__":
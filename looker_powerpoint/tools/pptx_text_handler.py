@@ -226,13 +226,21 @@ def extract_text_and_run_meta(text_frame):
 
 
 # ---------- High-level processor ----------
+# Jinja expressions ({{ ... }}) and statements ({% ... %}).
+JINJA_TAG_RE = re.compile(r"({{.*?}}|{%.+?%})", re.DOTALL)
+
+
+def has_jinja_tags(text):
+    """Whether *text* contains Jinja expressions or statements."""
+    return bool(text) and JINJA_TAG_RE.search(text) is not None
+
+
 def process_text_field(shape, text_to_insert, df, env=None):
     text_to_insert = str(text_to_insert)
-    jinja_tag_re = re.compile(r"({{.*?}}|{%.+?%})", re.DOTALL)
     text_frame = shape.text_frame
     full_text, run_meta = extract_text_and_run_meta(text_frame)
 
-    if not jinja_tag_re.search(full_text):
+    if not has_jinja_tags(full_text):
         logging.debug("No Jinja tags found in shape; applying fallback if different.")
         if full_text != (text_to_insert or ""):
             update_text_frame_preserving_formatting(text_frame, text_to_insert or "")
@@ -0,0 +1,334 @@
+"""
+Optional native asyncio transport for the Looker API.
+
+The ``looker_sdk`` package ships a blocking ``requests`` transport, so
+:class:`~looker_powerpoint.looker.LookerClient` normally runs every SDK call in
+a worker thread.  This module talks to the handful of endpoints the client
+actually needs (login, ``look``, ``dashboard``, ``lookml_model_explore``,
+``run_inline_query``, ``run_query``, query tasks and render tasks) over a single
+``httpx.AsyncClient``, so many queries can be multiplexed on one event loop and
+one connection pool, all authenticated with the same access token.  With the
+transport enabled the blocking SDK makes no API calls and never logs in.
+
+The module imports cleanly when ``httpx`` is not installed; check
+:func:`is_available` before constructing :class:`AsyncLookerTransport`.
+Install the optional dependency with::
+
+    pip install looker_powerpoint[async]
+
+Request bodies and responses are (de)serialized with the SDK's own
+``serialize40`` / ``deserialize40`` so callers receive the same model objects
+the blocking SDK would return.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from looker_sdk import models40 as models
+from looker_sdk.rtl import serialize
+
+from looker_powerpoint.retry import LookerAPIError, parse_retry_after
+
+try:
+    import httpx  # type: ignore[import]
+
+    _HAS_HTTPX = True
+except ImportError:  # pragma: no cover
+    _HAS_HTTPX = False
+
+# Seconds before the reported expiry at which a token is considered stale,
+# matching the lag used by looker_sdk's AuthToken.
+TOKEN_LAG_SECONDS = 10
+
+
+def is_available() -> bool:
+    """Return ``True`` if the ``httpx`` package is installed."""
+    return _HAS_HTTPX
+
+
+class AsyncLookerTransport:
+    """
+    Minimal asyncio client for the Looker API endpoints used by ``LookerClient``.
+
+    Method names and arguments mirror ``looker_sdk.methods40.Looker40SDK`` so the
+    two can be used interchangeably by ``LookerClient``.
+
+    Args:
+        base_url: The Looker instance URL, e.g. ``https://company.looker.com``.
+        client_id: API client id.
+        client_secret: API client secret.
+        api_version: Looker API version. Defaults to ``"4.0"``.
+        timeout: Request timeout in seconds.
+        verify_ssl: Whether to verify TLS certificates.
+        max_connections: Size of the shared connection pool.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        client_id: str,
+        client_secret: str,
+        api_version: str = "4.0",
+        timeout: float = 120,
+        verify_ssl: bool = True,
+        max_connections: int = 8,
+    ):
+        if not _HAS_HTTPX:
+            raise ImportError(
+                "httpx is not installed. "
+                "Install it with 'pip install looker_powerpoint[async]' to use the async transport."
+            )
+        self.api_url = f"{base_url.rstrip('/')}/api/{api_version}"
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.timeout = timeout
+        self.verify_ssl = verify_ssl
+        self.max_connections = max_connections
+
+        self.access_token: Optional[str] = None
+        self.token_expires_at = 0.0
+
+        # Both are bound to the running event loop, so they are created lazily
+        # on first use and dropped again by aclose().
+        self._http = None
+        self._login_lock = None
+
+    @classmethod
+    def from_settings(cls, settings, max_connections: int = 8):
+        """
+        Build a transport from the ``ApiSettings`` of an initialised Looker SDK.
+
+        Args:
+            settings: ``looker_sdk.rtl.api_settings.ApiSettings`` (``sdk.auth.settings``).
+            max_connections: Size of the shared connection pool.
+        """
+        config = settings.read_config()
+        return cls(
+            base_url=settings.base_url,
+            client_id=config.get("client_id"),
+            client_secret=config.get("client_secret"),
+            timeout=settings.timeout,
+            verify_ssl=settings.verify_ssl,
+            max_connections=max_connections,
+        )
+
+    def _ensure_http(self):
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=self.api_url,
+                timeout=self.timeout,
+                verify=self.verify_ssl,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+            self._login_lock = asyncio.Lock()
+        return self._http
+
+    async def aclose(self):
+        """Close the connection pool. The access token is kept for later reuse."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+            self._login_lock = None
+
+    @property
+    def is_authenticated(self) -> bool:
+        return bool(self.access_token) and time.monotonic() < self.token_expires_at
+
+    @property
+    def token_expires_in(self) -> float:
+        """Seconds until the held access token expires (minus the safety lag)."""
+        return self.token_expires_at - time.monotonic()
+
+    def use_token(self, access_token: str, expires_in: float):
+        """Use an access token obtained earlier, e.g. by a previous run."""
+        self.access_token = access_token
+        self.token_expires_at = time.monotonic() + expires_in - TOKEN_LAG_SECONDS
+
+    async def login(self, rejected_token: Optional[str] = None):
+        """
+        Log in with the client credentials unless a valid token is already held.
+
+        Concurrent callers share a single login round trip.
+
+        Args:
+            rejected_token: A token Looker just answered 401 for; it is replaced
+                even if it has not expired yet.
+        """
+        http = self._ensure_http()
+        async with self._login_lock:
+            # Another coroutine may have refreshed the token while we waited.
+            if self.is_authenticated and self.access_token != rejected_token:
+                return
+            response = await http.post(
+                "/login",
+                data={
+                    "client_id": self.client_id,
+                    "client_secret": self.client_secret,
+                },
+            )
+            if response.status_code >= 400:
+                raise LookerAPIError(
+                    f"Looker login failed ({response.status_code}): {response.text}",
+                    status=response.status_code,
+                )
+            token = response.json()
+            self.access_token = token["access_token"]
+            self.token_expires_at = (
+                time.monotonic() + int(token.get("expires_in") or 0) - TOKEN_LAG_SECONDS
+            )
+            logging.debug("Logged in to Looker through the async transport.")
+
+    async def _request(self, method: str, path: str, **kwargs):
+        """
+        Send an authenticated request, logging in again once on a 401.
+
+        Returns:
+            The ``httpx.Response``.
+
+        Raises:
+            LookerAPIError: If Looker answers with an error status, or no
+                response is received.
+        """
+        http = self._ensure_http()
+        headers = {}
+        if "content" in kwargs:
+            headers["Content-Type"] = "application/json"
+        if kwargs.get("params"):
+            kwargs["params"] = {
+                k: v for k, v in kwargs["params"].items() if v is not None
+            }
+        for attempt in range(2):
+            if not self.is_authenticated:
+                await self.login()
+            token = self.access_token
+            try:
+                response = await http.request(
+                    method,
+                    path,
+                    headers={**headers, "Authorization": f"Bearer {token}"},
+                    **kwargs,
+                )
+            except httpx.TransportError as e:
+                raise LookerAPIError(f"{method} {path} failed: {e!r}") from e
+            if response.status_code == 401 and attempt == 0:
+                await self.login(rejected_token=token)
+                continue
+            break
+
+        if response.status_code >= 400:
+            raise LookerAPIError(
+                f"{method} {path} failed ({response.status_code}): {response.text}",
+                status=response.status_code,
+                retry_after=parse_retry_after(response.headers.get("Retry-After")),
+            )
+        return response
+
+    @staticmethod
+    def _result(response):
+        """Return text for textual content types and bytes for images."""
+        content_type = response.headers.get("content-type", "")
+        if content_type.startswith("image/") or "octet-stream" in content_type:
+            return response.content
+        return response.text
+
+    async def look(self, look_id: str, fields: Optional[str] = None):
+        response = await self._request(
+            "GET", f"/looks/{look_id}", params={"fields": fields}
+        )
+        return serialize.deserialize40(
+            data=response.content, structure=models.LookWithQuery
+        )
+
+    async def dashboard(self, dashboard_id: str, fields: Optional[str] = None):
+        response = await self._request(
+            "GET", f"/dashboards/{dashboard_id}", params={"fields": fields}
+        )
+        return serialize.deserialize40(
+            data=response.content, structure=models.Dashboard
+        )
+
+    async def lookml_model_explore(
+        self, lookml_model_name: str, explore_name: str, fields: Optional[str] = None
+    ):
+        response = await self._request(
+            "GET",
+            f"/lookml_models/{lookml_model_name}/explores/{explore_name}",
+            params={"fields": fields},
+        )
+        return serialize.deserialize40(
+            data=response.content, structure=models.LookmlModelExplore
+        )
+
+    async def run_inline_query(
+        self, result_format: str, body: models.WriteQuery, **params
+    ):
+        response = await self._request(
+            "POST",
+            f"/queries/run/{result_format}",
+            params=params,
+            content=serialize.serialize40(api_model=body),
+        )
+        return self._result(response)
+
+    async def run_query(self, query_id: str, result_format: str, **params):
+        response = await self._request(
+            "GET", f"/queries/{query_id}/run/{result_format}", params=params
+        )
+        return self._result(response)
+
+    async def create_query(self, body: models.WriteQuery, fields: Optional[str] = None):
+        response = await self._request(
+            "POST",
+            "/queries",
+            params={"fields": fields},
+            content=serialize.serialize40(api_model=body),
+        )
+        return serialize.deserialize40(data=response.content, structure=models.Query)
+
+    async def create_query_task(self, body: models.WriteCreateQueryTask, **params):
+        response = await self._request(
+            "POST",
+            "/query_tasks",
+            params=params,
+            content=serialize.serialize40(api_model=body),
+        )
+        return serialize.deserialize40(
+            data=response.content, structure=models.QueryTask
+        )
+
+    async def query_task_multi_results(self, query_task_ids):
+        response = await self._request(
+            "GET",
+            "/query_tasks/multi_results",
+            params={"query_task_ids": ",".join(query_task_ids)},
+        )
+        return response.json()
+
+    async def create_query_render_task(
+        self, query_id: str, result_format: str, width: int, height: int
+    ):
+        response = await self._request(
+            "POST",
+            f"/render_tasks/queries/{query_id}/{result_format}",
+            params={"width": width, "height": height},
+        )
+        return serialize.deserialize40(
+            data=response.content, structure=models.RenderTask
+        )
+
+    async def render_task(self, render_task_id: str, fields: Optional[str] = None):
+        response = await self._request(
+            "GET", f"/render_tasks/{render_task_id}", params={"fields": fields}
+        )
+        return serialize.deserialize40(
+            data=response.content, structure=models.RenderTask
+        )
+
+    async def render_task_results(self, render_task_id: str):
+        response = await self._request("GET", f"/render_tasks/{render_task_id}/results")
+        return response.content
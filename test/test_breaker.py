@@ -0,0 +1,106 @@
+"""Tests for the Looker circuit breaker."""
+
+from unittest.mock import patch
+
+import pytest
+
+from looker_powerpoint.breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+)
+
+
+def _at(timestamp):
+    """Patch the breaker's clock to *timestamp*."""
+    return patch("looker_powerpoint.breaker.time.monotonic", return_value=timestamp)
+
+
+def _call(breaker, ok):
+    breaker.before_call()
+    if ok:
+        breaker.record_success()
+    else:
+        breaker.record_failure()
+
+
+class TestCircuitBreaker:
+    def test_opens_at_error_rate(self):
+        breaker = CircuitBreaker(error_rate=0.5, window=4, min_calls=4)
+        for ok in (True, False, True):
+            _call(breaker, ok)
+        assert breaker.state == CLOSED
+        _call(breaker, False)
+        assert breaker.state == OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        assert breaker.rejected == 1
+
+    def test_needs_min_calls(self):
+        breaker = CircuitBreaker(error_rate=0.5, min_calls=3)
+        _call(breaker, False)
+        _call(breaker, False)
+        assert breaker.state == CLOSED
+
+    def test_old_failures_leave_the_window(self):
+        breaker = CircuitBreaker(error_rate=0.5, window=4, min_calls=4)
+        for ok in (False, True, False, True, True, True, False):
+            _call(breaker, ok)
+        assert breaker.state == CLOSED
+
+    def test_half_open_probe_closes_on_success(self):
+        with _at(100.0):
+            breaker = CircuitBreaker(error_rate=1, cooldown=10, min_calls=1)
+            _call(breaker, False)
+        with _at(105.0), pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        with _at(111.0):
+            breaker.before_call()
+            assert breaker.state == HALF_OPEN
+            # Only one probe at a time.
+            with pytest.raises(CircuitOpenError):
+                breaker.before_call()
+            breaker.record_success()
+        assert breaker.state == CLOSED
+        breaker.before_call()
+
+    def test_failed_probe_reopens(self):
+        with _at(100.0):
+            breaker = CircuitBreaker(error_rate=1, cooldown=10, min_calls=1)
+            _call(breaker, False)
+        with _at(111.0):
+            _call(breaker, False)
+        assert (breaker.state, breaker.times_opened) == (OPEN, 2)
+        with _at(120.0), pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+    def test_cancelled_probe_frees_the_slot(self):
+        with _at(100.0):
+            breaker = CircuitBreaker(error_rate=1, cooldown=10, min_calls=1)
+            _call(breaker, False)
+        with _at(111.0):
+            breaker.before_call()
+            breaker.record_cancelled()
+            breaker.before_call()
+
+    def test_check_does_not_take_the_probe(self):
+        with _at(100.0):
+            breaker = CircuitBreaker(error_rate=1, cooldown=10, min_calls=1)
+            _call(breaker, False)
+            with pytest.raises(CircuitOpenError):
+                breaker.check()
+        with _at(111.0):
+            breaker.check()
+            breaker.check()
+            assert breaker.state == OPEN
+            breaker.before_call()
+            with pytest.raises(CircuitOpenError):
+                breaker.check()
+
+    def test_disabled(self):
+        breaker = CircuitBreaker(error_rate=0, min_calls=1)
+        for _ in range(10):
+            _call(breaker, False)
+        assert breaker.state == CLOSED
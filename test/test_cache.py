@@ -0,0 +1,170 @@
+"""Tests for the SQLite-backed query result cache."""
+
+import sqlite3
+from unittest.mock import patch
+
+from looker_powerpoint.cache import (
+    CACHE_FILE_NAME,
+    LOOK_RETENTION,
+    QUERY_ID_RETENTION,
+    QueryCache,
+    default_cache_dir,
+)
+
+
+def _at(timestamp):
+    """Patch the cache's clock to *timestamp*."""
+    return patch("looker_powerpoint.cache.time.time", return_value=timestamp)
+
+
+class TestQueryCache:
+    def test_creates_cache_file(self, tmp_path):
+        cache = QueryCache(str(tmp_path / "nested"))
+        assert (tmp_path / "nested" / CACHE_FILE_NAME).exists()
+        cache.close()
+
+    def test_missing_key_returns_none(self, tmp_path):
+        cache = QueryCache(str(tmp_path))
+        assert cache.get("nope") is None
+
+    def test_text_round_trip(self, tmp_path):
+        cache = QueryCache(str(tmp_path))
+        cache.set("k", '{"rows": []}')
+        assert cache.get("k") == '{"rows": []}'
+
+    def test_bytes_round_trip(self, tmp_path):
+        cache = QueryCache(str(tmp_path))
+        cache.set("img", b"\x89PNG\x00")
+        assert cache.get("img") == b"\x89PNG\x00"
+
+    def test_persists_across_instances(self, tmp_path):
+        cache = QueryCache(str(tmp_path))
+        cache.set("k", "v")
+        cache.close()
+        assert QueryCache(str(tmp_path)).get("k") == "v"
+
+    def test_expired_entry_is_not_returned(self, tmp_path):
+        cache = QueryCache(str(tmp_path), ttl=60)
+        with _at(1000):
+            cache.set("k", "v")
+        with _at(1059):
+            assert cache.get("k") == "v"
+        with _at(1061):
+            assert cache.get("k") is None
+
+    def test_evict_removes_expired_entries(self, tmp_path):
+        cache = QueryCache(str(tmp_path), ttl=60)
+        with _at(1000):
+            cache.set("old", "v")
+        with _at(1050):
+            cache.set("new", "v")
+        with _at(1070):
+            cache.evict()
+            assert cache.get("old") is None
+            assert cache.get("new") == "v"
+
+    def test_evict_enforces_size_limit_lru(self, tmp_path):
+        cache = QueryCache(str(tmp_path), max_bytes=10)
+        with _at(1000):
+            cache.set("a", "12345")
+        with _at(1001):
+            cache.set("b", "12345")
+        with _at(1002):
+            # Touch "a" so "b" becomes the least recently used entry.
+            cache.get("a")
+            cache.set("c", "12345")
+            cache.evict()
+            assert cache.size() <= 10
+            assert cache.get("b") is None
+            assert cache.get("a") == "12345"
+            assert cache.get("c") == "12345"
+
+    def test_cached_size_does_not_touch_entry(self, tmp_path):
+        cache = QueryCache(str(tmp_path), ttl=60, max_bytes=10)
+        with _at(1000):
+            cache.set("a", "12345")
+        with _at(1001):
+            cache.set("b", "12345")
+        with _at(1002):
+            assert cache.cached_size("a") == 5
+            assert cache.cached_size("missing") is None
+            cache.set("c", "12345")
+            cache.evict()
+            # "a" is still the least recently used entry.
+            assert cache.get("a") is None
+        with _at(1062):
+            assert cache.cached_size("b") is None
+
+    def test_default_cache_dir_honours_xdg(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+        assert default_cache_dir() == str(tmp_path / "looker_powerpoint")
+
+
+class TestLookStore:
+    def test_round_trip(self, tmp_path):
+        cache = QueryCache(str(tmp_path))
+        cache.set_look("1", "2024-01-01", b'{"model": "m"}')
+        assert cache.get_look("1") == ("2024-01-01", b'{"model": "m"}')
+        assert cache.get_look("2") is None
+
+    def test_looks_survive_result_ttl(self, tmp_path):
+        cache = QueryCache(str(tmp_path), ttl=10)
+        with _at(1000):
+            cache.set_look("1", "2024-01-01", b"{}")
+        with _at(2000):
+            cache.evict()
+            assert cache.get_look("1") is not None
+
+    def test_looks_are_fresh_within_ttl_of_their_check(self, tmp_path):
+        cache = QueryCache(str(tmp_path), ttl=60)
+        with _at(1000):
+            cache.set_look("1", "2024-01-01", b"{}")
+        with _at(1060):
+            assert cache.look_is_fresh("1")
+            assert not cache.look_is_fresh("2")
+        with _at(1061):
+            assert not cache.look_is_fresh("1")
+            cache.mark_look_checked("1")
+        with _at(1120):
+            assert cache.look_is_fresh("1")
+
+    def test_looks_of_older_cache_files_are_not_fresh(self, tmp_path):
+        conn = sqlite3.connect(str(tmp_path / CACHE_FILE_NAME))
+        conn.execute(
+            "CREATE TABLE looks (look_id TEXT PRIMARY KEY, updated_at TEXT NOT NULL, "
+            "query BLOB NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        conn.execute("INSERT INTO looks VALUES ('1', '2024-01-01', x'7b7d', 0)")
+        conn.commit()
+        conn.close()
+        cache = QueryCache(str(tmp_path))
+        assert cache.get_look("1") == ("2024-01-01", b"{}")
+        assert not cache.look_is_fresh("1")
+
+    def test_unused_looks_are_evicted(self, tmp_path):
+        cache = QueryCache(str(tmp_path))
+        with _at(1000):
+            cache.set_look("1", "2024-01-01", b"{}")
+        with _at(1000 + LOOK_RETENTION + 1):
+            cache.evict()
+            assert cache.get_look("1") is None
+
+
+class TestQueryIdStore:
+    def test_round_trip_and_forget(self, tmp_path):
+        cache = QueryCache(str(tmp_path))
+        cache.set_query_id("abc", 101)
+        assert cache.get_query_id("abc") == "101"
+        cache.forget_query_id("abc")
+        assert cache.get_query_id("abc") is None
+
+    def test_ids_survive_result_ttl_until_unused(self, tmp_path):
+        cache = QueryCache(str(tmp_path), ttl=10)
+        with _at(1000):
+            cache.set_query_id("abc", "101")
+        with _at(2000):
+            cache.evict()
+            assert cache.get_query_id("abc") == "101"
+        with _at(2000 + QUERY_ID_RETENTION + 1):
+            cache.evict()
+            assert cache.get_query_id("abc") is None
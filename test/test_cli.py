@@ -1,11 +1,15 @@
+import asyncio
 import json
+import os
+import re
+import time
 import pandas as pd
 import pytest
-from unittest.mock import patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from pptx import Presentation
 from pptx.util import Inches
 from looker_powerpoint.cli import Cli
-from looker_powerpoint.models import LookerReference, LookerShape
+from looker_powerpoint.models import LookerReference, LookerShape, QueryResult
 
 
 def test_default_output_dir():
@@ -236,6 +240,82 @@ class TestMakeDf:
             "view.revenue|FIELD|Feb.value",
         ]
 
+    def test_query_result_matches_string_result(self):
+        """A QueryResult yields the same frame as the equivalent JSON string."""
+        cli = _make_cli()
+        result = _make_result(
+            dimensions=["view.region"],
+            measures=["view.revenue"],
+            table_calculations=[],
+            rows=[
+                {
+                    "view.region.value": "North",
+                    "view.revenue|FIELD|2024-01.value": 10,
+                    "view.revenue|FIELD|2024-02.value": 20,
+                }
+            ],
+            custom_pivots=["view.month"],
+            custom_sorts=["view.month desc 0"],
+        )
+        data = json.loads(result)
+        query_result = QueryResult(
+            data=data,
+            sorts=data.pop("custom_sorts"),
+            pivots=data.pop("custom_pivots"),
+        )
+        pd.testing.assert_frame_equal(cli._make_df(query_result), cli._make_df(result))
+
+
+# ---------------------------------------------------------------------------
+# QueryResult
+# ---------------------------------------------------------------------------
+
+
+class TestQueryResult:
+    def test_json_payload_is_parsed_once(self):
+        result = QueryResult.from_payload('{"rows": []}', "json_bi")
+        assert result.data == {"rows": []}
+        assert result.raw is None
+        assert result.size == 12
+
+    def test_image_payload_is_kept_raw(self):
+        result = QueryResult.from_payload(b"\x89PNG", "png")
+        assert result.raw == b"\x89PNG"
+        assert result.data is None
+
+    def test_decoded_payload_has_no_size(self):
+        result = QueryResult.from_payload({"rows": []}, "json_bi")
+        assert result.data == {"rows": []}
+        assert result.size is None
+
+    def test_invalid_json_is_kept_raw(self):
+        result = QueryResult.from_payload("not json", "json")
+        assert result.raw == "not json"
+
+
+def test_log_cached_shapes(caplog):
+    cli = _make_cli()
+    cli.looker_shapes = [
+        LookerShape.model_validate(
+            {
+                "shape_id": shape_id,
+                "shape_type": "TEXT_BOX",
+                "slide_number": 0,
+                "integration": {"id": "1"},
+            }
+        )
+        for shape_id in ("0,1", "0,2", "0,3")
+    ]
+    cli.data = {
+        "0,1": QueryResult(from_looker_cache=True),
+        "0,2": QueryResult(),
+        "0,3": None,
+    }
+    with caplog.at_level("INFO"):
+        cli._log_cached_shapes()
+    assert "1 of 3 shapes were served from Looker's result cache: 0,1" in caplog.text
+    assert "local result cache" not in caplog.text
+
 
 # ---------------------------------------------------------------------------
 # Parser default / flag tests
@@ -369,7 +449,13 @@ class TestParser:
         """--filter stores the supplied filter value."""
         cli = _make_cli()
         args = cli.parser.parse_args(["--filter", "2024"])
-        assert args.filter == "2024"
+        assert args.filter == ["2024"]
+
+    def test_filter_flag_several_values(self):
+        """--filter accepts several values, one deck per value."""
+        cli = _make_cli()
+        args = cli.parser.parse_args(["--filter", "EMEA", "APAC"])
+        assert args.filter == ["EMEA", "APAC"]
 
     def test_debug_queries_flag(self):
         """--debug-queries sets debug_queries to True."""
@@ -377,6 +463,481 @@ class TestParser:
         args = cli.parser.parse_args(["--debug-queries"])
         assert args.debug_queries is True
 
+    def test_default_max_workers(self):
+        """--max-workers defaults to None so the client falls back to MAX_WORKERS."""
+        cli = _make_cli()
+        args = cli.parser.parse_args([])
+        assert args.max_workers is None
+
+    def test_max_workers_flag(self):
+        """--max-workers stores the supplied integer."""
+        cli = _make_cli()
+        args = cli.parser.parse_args(["--max-workers", "16"])
+        assert args.max_workers == 16
+
+    def test_api_limit_flags(self):
+        """--max-concurrent-queries and --requests-per-second default to None."""
+        cli = _make_cli()
+        args = cli.parser.parse_args([])
+        assert args.max_concurrent_queries is None
+        assert args.requests_per_second is None
+        args = cli.parser.parse_args(
+            ["--max-concurrent-queries", "4", "--requests-per-second", "2.5"]
+        )
+        assert args.max_concurrent_queries == 4
+        assert args.requests_per_second == 2.5
+
+    def test_no_pushdown_flag(self):
+        cli = _make_cli()
+        assert cli.parser.parse_args([]).no_pushdown is False
+        assert cli.parser.parse_args(["--no-pushdown"]).no_pushdown is True
+
+    def test_looker_cache_flags(self):
+        cli = _make_cli()
+        args = cli.parser.parse_args([])
+        assert (args.prefer_cached, args.cache_only) == (False, False)
+        args = cli.parser.parse_args(["--prefer-cached", "--cache-only"])
+        assert (args.prefer_cached, args.cache_only) == (True, True)
+
+    def test_csv_results_flag(self):
+        cli = _make_cli()
+        assert cli.parser.parse_args([]).csv_results is False
+        assert cli.parser.parse_args(["--csv-results"]).csv_results is True
+
+    def test_retry_budget_flag(self):
+        cli = _make_cli()
+        assert cli.parser.parse_args([]).retry_budget is None
+        assert cli.parser.parse_args(["--retry-budget", "5"]).retry_budget == 5
+
+    def test_query_tasks_flag(self):
+        """--query-tasks is off by default and enabled by the flag."""
+        cli = _make_cli()
+        assert cli.parser.parse_args([]).query_tasks is False
+        assert cli.parser.parse_args(["--query-tasks"]).query_tasks is True
+
+    def test_default_cache_options(self):
+        """The result cache is on by default with TTL, directory and size unset."""
+        cli = _make_cli()
+        args = cli.parser.parse_args([])
+        assert args.no_cache is False
+        assert args.cache_ttl is None
+        assert args.cache_dir is None
+        assert args.cache_max_size is None
+
+    def test_cache_flags(self):
+        cli = _make_cli()
+        args = cli.parser.parse_args(
+            [
+                "--no-cache",
+                "--cache-ttl",
+                "60",
+                "--cache-dir",
+                "c",
+                "--cache-max-size",
+                "5",
+            ]
+        )
+        assert args.no_cache is True
+        assert args.cache_ttl == 60
+        assert args.cache_dir == "c"
+        assert args.cache_max_size == 5
+
+    def test_timeout_flags(self):
+        cli = _make_cli()
+        args = cli.parser.parse_args([])
+        assert args.query_timeout is None and args.deadline is None
+        args = cli.parser.parse_args(["--query-timeout", "30", "--deadline", "600"])
+        assert args.query_timeout == 30
+        assert args.deadline == 600
+
+    def test_circuit_breaker_flags(self):
+        cli = _make_cli()
+        args = cli.parser.parse_args([])
+        assert args.circuit_breaker_error_rate is None
+        assert args.circuit_breaker_cooldown is None
+        args = cli.parser.parse_args(
+            ["--circuit-breaker-error-rate", "0.3", "--circuit-breaker-cooldown", "10"]
+        )
+        assert (args.circuit_breaker_error_rate, args.circuit_breaker_cooldown) == (
+            0.3,
+            10,
+        )
+
+    def test_deadline_from_environment(self, monkeypatch):
+        cli = _make_cli()
+        cli.args = cli.parser.parse_args([])
+        assert cli._init_deadline() is None
+        monkeypatch.setenv("DEADLINE", "60")
+        assert cli._init_deadline() - time.monotonic() == pytest.approx(60, abs=1)
+        assert cli.args.deadline == 60
+
+    def test_filter_values_from_file(self, tmp_path):
+        path = tmp_path / "regions.txt"
+        path.write_text("# regions\nAPAC\n\n  Nordics  \nEMEA\n")
+        cli = _make_cli()
+        cli.args = cli.parser.parse_args(
+            ["--filter", "EMEA", "--filter-file", str(path)]
+        )
+        assert cli._filter_values() == ["EMEA", "APAC", "Nordics"]
+
+    def test_missing_filter_file_exits(self, tmp_path, caplog):
+        cli = _make_cli()
+        missing = str(tmp_path / "missing.txt")
+        cli.args = cli.parser.parse_args(["--filter-file", missing])
+        with pytest.raises(SystemExit) as exc:
+            cli._filter_values()
+        assert exc.value.code == 1
+        assert f"Error reading {missing}" in caplog.text
+
+    def test_variant_destination_is_named_after_filter_value(self):
+        cli = _make_cli()
+        cli.args = cli.parser.parse_args(["-o", "out"])
+        cli.file_path = "decks/report.pptx"
+        assert os.path.basename(cli._destination()).startswith("report_2")
+        variant = cli._variant("North / South")
+        assert variant.filter_value == "North / South"
+        assert os.path.dirname(variant._destination()) == "out"
+        assert os.path.basename(variant._destination()).startswith(
+            "report_North_South_"
+        )
+
+    def test_variant_names_are_unique(self):
+        names = Cli._variant_names([">10", "<10", "EU", "eu", "", "?"])
+        assert names[">10"] == "10" and names["EU"] == "EU"
+        assert re.fullmatch(r"10_[0-9a-f]{8}", names["<10"])
+        assert re.fullmatch(r"eu_[0-9a-f]{8}", names["eu"])
+        assert names[""] == "blank"
+        assert len({name.lower() for name in names.values()}) == len(names)
+
+    def test_no_token_cache_flag(self):
+        cli = _make_cli()
+        assert cli.parser.parse_args([]).no_token_cache is False
+        assert cli.parser.parse_args(["--no-token-cache"]).no_token_cache is True
+
+
+# ---------------------------------------------------------------------------
+# _init_cache tests
+# ---------------------------------------------------------------------------
+
+
+class TestInitCache:
+    """Tests for Cli._init_cache."""
+
+    def _cli(self, argv):
+        cli = _make_cli()
+        cli.args = cli.parser.parse_args(argv)
+        return cli
+
+    def test_no_cache_returns_none(self, tmp_path):
+        cli = self._cli(["--no-cache", "--cache-dir", str(tmp_path)])
+        assert cli._init_cache() is None
+
+    def test_zero_ttl_returns_none(self, tmp_path):
+        cli = self._cli(["--cache-ttl", "0", "--cache-dir", str(tmp_path)])
+        assert cli._init_cache() is None
+
+    def test_arguments_configure_cache(self, tmp_path):
+        cli = self._cli(
+            ["--cache-ttl", "60", "--cache-dir", str(tmp_path), "--cache-max-size", "2"]
+        )
+        cache = cli._init_cache()
+        assert cache.ttl == 60
+        assert cache.max_bytes == 2 * 1024 * 1024
+        assert cache.cache_dir == str(tmp_path)
+        cache.close()
+
+    def test_environment_configures_cache(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("CACHE_TTL", "30")
+        monkeypatch.setenv("CACHE_DIR", str(tmp_path))
+        cache = self._cli([])._init_cache()
+        assert cache.ttl == 30
+        assert cache.cache_dir == str(tmp_path)
+        cache.close()
+
+    def test_token_cache_shares_cache_dir(self, tmp_path):
+        token_cache = self._cli(["--cache-dir", str(tmp_path)])._init_token_cache()
+        assert token_cache.cache_dir == str(tmp_path)
+
+    def test_no_token_cache_returns_none(self, tmp_path):
+        cli = self._cli(["--no-token-cache", "--cache-dir", str(tmp_path)])
+        assert cli._init_token_cache() is None
+
+
+# ---------------------------------------------------------------------------
+# get_queries tests
+# ---------------------------------------------------------------------------
+
+
+def _ref(slide, shape, shape_type, **integration):
+    return {
+        "shape_id": f"{slide},{shape}",
+        "shape_type": shape_type,
+        "slide_number": slide,
+        "shape_number": shape,
+        "shape_width": 200,
+        "shape_height": 100,
+        "integration": integration,
+    }
+
+
+class TestGetQueries:
+    """
+    Shapes are discovered slide by slide, their queries submitted early and
+    each shape rendered as soon as its result arrives.
+    """
+
+    def _run(self, slides, argv=(), delays=None, deadline=None):
+        cli = _make_cli()
+        cli.args = cli.parser.parse_args(list(argv))
+        cli.presentation = object()
+        events = []
+
+        def iter_alt_text(presentation):
+            for number, references in enumerate(slides):
+                events.append(("slide", number))
+                yield references
+
+        async def write_queries(shape_id, filter_value, result_needs=None, **kwargs):
+            events.append(("query", shape_id))
+            await asyncio.sleep((delays or {}).get(shape_id, 0))
+            return {shape_id: QueryResult()}
+
+        def render_shape(looker_shape):
+            assert looker_shape.shape_id in cli.data
+            events.append(("render", looker_shape.shape_id))
+
+        cli.iter_alt_text = iter_alt_text
+        cli._render_shape = render_shape
+        cli._fail_shape = lambda looker_shape: events.append(
+            ("fail", looker_shape.shape_id)
+        )
+        cli.deadline = deadline
+        cli.client = MagicMock()
+        cli.client._async_write_queries = write_queries
+        cli.client.prefetch_look.side_effect = lambda id: events.append(
+            ("prefetch", id)
+        )
+        cli.client.prefetch_dashboard.side_effect = lambda id: events.append(
+            ("prefetch dashboard", id)
+        )
+        cli.client.aclose = AsyncMock()
+        asyncio.run(cli.get_queries())
+        return cli, events
+
+    def test_queries_start_before_later_slides_are_read(self):
+        cli, events = self._run(
+            [[_ref(0, 1, "CHART", id="1")], [_ref(1, 1, "CHART", id="2")]]
+        )
+        assert events.index(("query", "0,1")) < events.index(("slide", 1))
+        assert set(cli.data) == {"0,1", "1,1"}
+        assert cli.references_found == 2
+
+    def test_partial_needs_wait_for_the_whole_deck(self):
+        cli, events = self._run(
+            [
+                [_ref(0, 1, "PICTURE", id="1", label="image_url")],
+                [_ref(1, 1, "PICTURE", id="1", label="logo_url")],
+            ]
+        )
+        assert ("prefetch", "1") in events
+        assert events.index(("query", "0,1")) > events.index(("slide", 1))
+        assert [s.shape_id for s in cli.looker_shapes] == ["0,1", "1,1"]
+
+    def test_without_pushdown_every_query_starts_early(self):
+        cli, events = self._run(
+            [
+                [_ref(0, 1, "PICTURE", id="1", label="image_url")],
+                [_ref(1, 1, "PICTURE", id="1", label="logo_url")],
+            ],
+            argv=["--no-pushdown"],
+        )
+        assert events.index(("query", "0,1")) < events.index(("slide", 1))
+
+    def test_shapes_render_while_other_queries_run(self):
+        cli, events = self._run(
+            [[_ref(0, 1, "CHART", id="1")], [_ref(1, 1, "CHART", id="2")]],
+            delays={"0,1": 0.2},
+        )
+        assert events.index(("render", "1,1")) < events.index(("render", "0,1"))
+
+    def test_every_looker_shape_is_rendered_once(self):
+        cli, events = self._run(
+            [
+                [_ref(0, 1, "CHART", id="1"), _ref(0, 2, "CHART", id="1")],
+                [_ref(1, 1, "PICTURE", id="2", label="image_url")],
+            ]
+        )
+        assert sorted(e[1] for e in events if e[0] == "render") == [
+            "0,1",
+            "0,2",
+            "1,1",
+        ]
+
+    def test_deadline_cancels_outstanding_queries(self):
+        started = time.monotonic()
+        cli, events = self._run(
+            [[_ref(0, 1, "CHART", id="1")], [_ref(1, 1, "CHART", id="2")]],
+            argv=["--deadline", "0.1"],
+            delays={"0,1": 10},
+            deadline=time.monotonic() + 0.1,
+        )
+        assert time.monotonic() - started < 2
+        assert ("render", "1,1") in events
+        assert ("fail", "0,1") in events
+        assert ("render", "0,1") not in events
+        cli.client.cancel_pending.assert_called_once()
+
+    def test_shapes_found_after_the_deadline_are_not_queried(self):
+        deadline = time.monotonic() + 0.05
+
+        def slides():
+            yield [_ref(0, 1, "CHART", id="1")]
+            time.sleep(0.1)
+            yield [_ref(1, 1, "CHART", id="2")]
+
+        cli, events = self._run(
+            slides(), argv=["--deadline", "0.05"], deadline=deadline
+        )
+        assert ("query", "1,1") not in events
+        assert ("fail", "1,1") in events
+
+    def test_other_shapes_are_collected(self):
+        cli, events = self._run(
+            [
+                [
+                    _ref(0, 1, "TABLE", id="dashboard-1"),
+                    _ref(0, 2, "TEXT_BOX", type="gemini", prompt="Summarise"),
+                    {"shape_id": "0,3", "shape_type": "TABLE", "integration": 5},
+                ]
+            ]
+        )
+        assert cli.looker_shapes == []
+        assert [s.shape_id for s in cli.relevant_shapes] == ["0,1"]
+        assert len(cli.gemini_shapes) == 1
+        assert cli.references_found == 3
+
+    def test_dashboard_tiles_are_queried(self):
+        cli, events = self._run(
+            [
+                [
+                    _ref(0, 1, "CHART", id="7", id_type="dashboard", tile="Revenue"),
+                    _ref(0, 2, "TABLE", id="7", id_type="dashboard"),
+                ],
+                [
+                    _ref(
+                        1,
+                        1,
+                        "PICTURE",
+                        id="7",
+                        id_type="dashboard",
+                        tile="Logo",
+                        label="image_url",
+                    )
+                ],
+            ]
+        )
+        assert [s.shape_id for s in cli.looker_shapes] == ["0,1", "1,1"]
+        assert ("prefetch dashboard", "7") in events
+        assert ("render", "1,1") in events
+
+    def test_metadata_links_dashboards(self, monkeypatch):
+        monkeypatch.setenv("LOOKERSDK_BASE_URL", "https://looker.example.com/")
+        cli, _ = self._run(
+            [
+                [
+                    _ref(0, 1, "CHART", id="7", id_type="dashboard", tile="Revenue"),
+                    _ref(0, 2, "CHART", id="7", id_type="dashboard", tile="Cost"),
+                    _ref(0, 3, "CHART", id="7"),
+                ]
+            ]
+        )
+        cli._build_metadata_object()
+        assert [
+            r["looks"]["value"] for r in cli.data["metadata_shapes"].data["rows"]
+        ] == [
+            "https://looker.example.com/dashboards/7",
+            "https://looker.example.com/looks/7",
+        ]
+
+
+class TestGetPlan:
+    """--plan builds every shape's query, per filter value, without running it."""
+
+    def _plan(self, slides, argv=(), filter_values=()):
+        cli = _make_cli()
+        cli.args = cli.parser.parse_args(["--plan", *argv])
+        cli.presentation = object()
+        cli.file_path = "deck.pptx"
+        cli.iter_alt_text = lambda presentation: iter(slides)
+        calls = []
+
+        async def plan_query(shape_id, filter_value, result_needs=None, **kwargs):
+            calls.append((shape_id, filter_value, result_needs))
+            return {
+                "shape_id": shape_id,
+                "id_type": kwargs["id_type"],
+                "id": kwargs["id"],
+                "fingerprint": f"{kwargs['id']}:{kwargs.get('filter') and filter_value}",
+                "cached": False,
+                "estimated_bytes": 10,
+            }
+
+        cli.client = MagicMock()
+        cli.client.plan_query = plan_query
+        cli.client.aclose = AsyncMock()
+        report = asyncio.run(cli.get_plan(list(filter_values)))
+        return report, calls
+
+    def test_shapes_are_planned_with_merged_needs(self):
+        report, calls = self._plan(
+            [
+                [
+                    _ref(0, 1, "PICTURE", id="1", label="image_url"),
+                    _ref(0, 2, "PICTURE", id="1", label="logo_url"),
+                    _ref(0, 3, "TABLE", id="dashboard-1"),
+                ]
+            ]
+        )
+        assert report["deck"] == "deck.pptx"
+        assert (report["queries_requested"], report["distinct_queries"]) == (2, 1)
+        assert {needs.labels for _, _, needs in calls} == {
+            frozenset({"image_url", "logo_url"})
+        }
+        assert report["shapes"][0]["needs"] == {
+            "columns": {"labels": ["image_url"], "max_column": None},
+            "rows": 1,
+        }
+
+    def test_without_pushdown_no_needs_are_passed(self):
+        report, calls = self._plan(
+            [[_ref(0, 1, "PICTURE", id="1", label="image_url")]],
+            argv=["--no-pushdown"],
+        )
+        assert calls == [("0,1", None, None)]
+        assert report["shapes"][0]["needs"]["rows"] == 1
+
+    def test_every_filter_value_is_planned(self):
+        report, calls = self._plan(
+            [
+                [
+                    _ref(0, 1, "CHART", id="1", filter="orders.region"),
+                    _ref(0, 2, "CHART", id="2"),
+                ]
+            ],
+            filter_values=["EMEA", "APAC"],
+        )
+        assert len(calls) == 4
+        assert report["filter_values"] == ["EMEA", "APAC"]
+        # The unfiltered Look runs once for both decks.
+        assert report["distinct_queries"] == 3
+        assert {e["filter_value"] for e in report["shapes"]} == {"EMEA", "APAC"}
+
+    def test_plan_flag(self):
+        cli = _make_cli()
+        assert cli.parser.parse_args([]).plan is None
+        assert cli.parser.parse_args(["--plan"]).plan == "-"
+        assert cli.parser.parse_args(["--plan", "plan.json"]).plan == "plan.json"
+
 
 # ---------------------------------------------------------------------------
 # _test_str_to_int tests
@@ -816,6 +1377,13 @@ class TestLookerShapeModel:
         assert shape.integration.image_width == 200
         assert shape.integration.image_height == 100
 
+    def test_picture_shape_keeps_explicit_image_dimensions(self):
+        data = self._base_data("PICTURE")
+        data["integration"].update(image_width=1200, image_height=675)
+        shape = LookerShape.model_validate(data)
+        assert shape.integration.image_width == 1200
+        assert shape.integration.image_height == 675
+
     def test_table_shape_sets_apply_formatting_true_by_default(self):
         """TABLE shapes default apply_formatting to True."""
         shape = LookerShape.model_validate(self._base_data("TABLE"))
@@ -0,0 +1,140 @@
+"""Tests for the CSV fast path: reading csv results into _make_df's frame."""
+
+import json
+from unittest.mock import patch
+
+import pandas as pd
+from looker_sdk import models40 as models
+
+from looker_powerpoint.cli import Cli
+from looker_powerpoint.csv_results import csv_fields, header_matches, read_frame
+from looker_powerpoint.models import QueryResult
+
+EXPLORE_FIELDS = {
+    "orders.zip": {
+        "name": "orders.zip",
+        "category": "dimension",
+        "label": "Orders Zip",
+        "field_group_variant": "Zip",
+        "is_numeric": False,
+    },
+    "orders.date": {
+        "name": "orders.date",
+        "category": "dimension",
+        "label": "Orders Date",
+        "field_group_variant": "Order Date",
+        "is_numeric": False,
+    },
+    "orders.revenue": {
+        "name": "orders.revenue",
+        "category": "measure",
+        "label": "Orders Revenue",
+        "field_group_variant": "Revenue",
+        "is_numeric": True,
+    },
+    "orders.count": {
+        "name": "orders.count",
+        "category": "measure",
+        "label": "Orders Count",
+        "is_numeric": True,
+    },
+}
+
+# A measure listed before a dimension, to exercise the column reordering.
+FIELDS = ["orders.date", "orders.revenue", "orders.zip", "orders.count"]
+
+CSV = (
+    "Orders Date,Orders Revenue,Orders Zip,Orders Count\n"
+    "2024-01-01,100.5,01234,3\n"
+    "2024-01-02,,NA,4\n"
+)
+
+JSON_BI_ROWS = [
+    {
+        "orders.date": {"value": "2024-01-01"},
+        "orders.revenue": {"value": 100.5},
+        "orders.zip": {"value": "01234"},
+        "orders.count": {"value": 3},
+    },
+    {
+        "orders.date": {"value": "2024-01-02"},
+        "orders.revenue": {"value": None},
+        "orders.zip": {"value": "NA"},
+        "orders.count": {"value": 4},
+    },
+]
+
+
+def _query(**kwargs):
+    return models.Query(model="ecommerce", view="orders", **kwargs)
+
+
+def _columns():
+    return csv_fields(_query(fields=FIELDS), EXPLORE_FIELDS)
+
+
+def _json_bi_frame(rows):
+    """The frame _make_df builds from the equivalent json_bi result."""
+    with patch("os.getenv", return_value="dummy_value"):
+        cli = Cli()
+    metadata = QueryResult(fields=_columns()).metadata_fields()
+    return cli._make_df(
+        QueryResult(data={"metadata": {"fields": metadata}, "rows": rows})
+    )
+
+
+class TestCsvFields:
+    def test_columns_follow_query_order(self):
+        assert [f["name"] for f in _columns()] == FIELDS
+
+    def test_unsupported_queries(self):
+        assert (
+            csv_fields(_query(fields=FIELDS, pivots=["orders.date"]), EXPLORE_FIELDS)
+            is None
+        )
+        assert (
+            csv_fields(_query(fields=FIELDS, dynamic_fields="[]"), EXPLORE_FIELDS)
+            is None
+        )
+        assert csv_fields(_query(fields=["orders.margin"]), EXPLORE_FIELDS) is None
+
+
+class TestHeaderMatches:
+    def test_labels_match(self):
+        assert header_matches(CSV, _columns())
+        assert header_matches(CSV.encode("utf-8-sig"), _columns())
+
+    def test_other_order_does_not_match(self):
+        assert not header_matches(
+            "Orders Revenue,Orders Date,Orders Zip,Orders Count\n", _columns()
+        )
+        assert not header_matches("Orders Date\n", _columns())
+
+
+class TestReadFrame:
+    def test_matches_json_bi_frame(self):
+        pd.testing.assert_frame_equal(
+            read_frame(CSV.encode("utf-8"), _columns()), _json_bi_frame(JSON_BI_ROWS)
+        )
+
+    def test_column_names_and_order(self):
+        df = read_frame(CSV, _columns())
+        assert list(df.columns) == ["order_date", "zip", "revenue", "orders.count"]
+        assert df["zip"].tolist() == ["01234", "NA"]
+
+    def test_empty_result(self):
+        pd.testing.assert_frame_equal(
+            read_frame(CSV.splitlines()[0] + "\n", _columns()), _json_bi_frame([])
+        )
+
+    def test_make_df_reads_csv_results(self):
+        with patch("os.getenv", return_value="dummy_value"):
+            cli = Cli()
+        result = QueryResult(result_format="csv", raw=CSV, fields=_columns())
+        assert list(cli._make_df(result).columns) == [
+            "order_date",
+            "zip",
+            "revenue",
+            "orders.count",
+        ]
+        assert json.loads(cli._make_df(result).to_json())["revenue"]["1"] == ""
@@ -0,0 +1,92 @@
+"""Tests for reducing dashboards to the tiles shapes can reference."""
+
+import pytest
+from looker_sdk import models40 as models
+
+from looker_powerpoint.dashboards import (
+    dashboard_tiles,
+    dump_tiles,
+    find_tile,
+    load_tiles,
+)
+
+
+def _query(**kwargs):
+    return models.Query(
+        model="ecommerce",
+        view="orders",
+        fields=["orders.date", "orders.revenue"],
+        **kwargs,
+    )
+
+
+def _dashboard():
+    listen = models.ResultMakerFilterables(
+        listen=[
+            models.ResultMakerFilterablesListen(
+                dashboard_filter_name="Region", field="orders.region"
+            )
+        ]
+    )
+    return models.Dashboard(
+        id="7",
+        dashboard_filters=[
+            models.DashboardFilter(name="Region", default_value="EU"),
+            models.DashboardFilter(name="Date", default_value=""),
+        ],
+        dashboard_elements=[
+            models.DashboardElement(id="1", title_text="Notes"),
+            models.DashboardElement(
+                id="2",
+                title="Revenue",
+                result_maker=models.ResultMakerWithIdVisConfigAndDynamicFields(
+                    query=_query(filters={"orders.status": "complete"}),
+                    filterables=[listen],
+                ),
+            ),
+            models.DashboardElement(
+                id="3",
+                title="From a Look",
+                look=models.LookWithQuery(query=_query(limit="10")),
+            ),
+            models.DashboardElement(id="4", title="Merged", merge_result_id="9"),
+        ],
+    )
+
+
+class TestDashboardTiles:
+    def test_only_elements_with_a_query_are_tiles(self):
+        assert [t.id for t in dashboard_tiles(_dashboard())] == ["2", "3"]
+
+    def test_filter_defaults_are_applied_to_listening_fields(self):
+        revenue = dashboard_tiles(_dashboard())[0]
+        assert revenue.query.filters == {
+            "orders.status": "complete",
+            "orders.region": "EU",
+        }
+
+    def test_tiles_do_not_modify_the_dashboard(self):
+        dashboard = _dashboard()
+        dashboard_tiles(dashboard)
+        query = dashboard.dashboard_elements[1].result_maker.query
+        assert query.filters == {"orders.status": "complete"}
+
+    def test_serialization_round_trip(self):
+        tiles = load_tiles(dump_tiles(dashboard_tiles(_dashboard())))
+        assert [(t.id, t.title) for t in tiles] == [
+            ("2", "Revenue"),
+            ("3", "From a Look"),
+        ]
+        assert tiles[0].query.filters["orders.region"] == "EU"
+        assert tiles[1].query.limit == "10"
+
+
+class TestFindTile:
+    def test_by_title_ignoring_case_or_by_id(self):
+        tiles = dashboard_tiles(_dashboard())
+        assert find_tile(tiles, "revenue").id == "2"
+        assert find_tile(tiles, "3").title == "From a Look"
+
+    def test_unknown_tile_lists_the_available_ones(self):
+        with pytest.raises(ValueError, match="'Revenue', 'From a Look'"):
+            find_tile(dashboard_tiles(_dashboard()), "Profit")
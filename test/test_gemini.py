@@ -14,6 +14,7 @@ All Gemini API calls are mocked — no live network calls are made.
 
 import json
 import os
+import time
 import pytest
 from unittest.mock import MagicMock, patch
 from pydantic import ValidationError
@@ -376,6 +377,18 @@ class TestProcessGeminiShapes:
             if shape.shape_id == cli.gemini_shapes[0].shape_number:
                 assert shape.text_frame.text == "Synthesized result text"
 
+    def test_skipped_after_the_deadline(self, monkeypatch):
+        cli = self._make_cli_with_gemini_shape()
+        cli.args = cli.parser.parse_args(["--deadline", "1"])
+        cli.deadline = time.monotonic() - 1
+        monkeypatch.setattr(gemini_module, "_HAS_GEMINI", True)
+        synthesize = MagicMock(return_value="Synthesized result text")
+        monkeypatch.setattr(gemini_module, "synthesize", synthesize)
+
+        cli._process_gemini_shapes()
+
+        synthesize.assert_not_called()
+
     def test_meta_look_appears_in_context_data_str(self, monkeypatch):
         cli = self._make_cli_with_gemini_shape()
         monkeypatch.setattr(gemini_module, "_HAS_GEMINI", True)
@@ -5,6 +5,7 @@ Exercises the end-to-end flow:
 """
 
 import argparse
+import asyncio
 import json
 import os
 from unittest.mock import AsyncMock, MagicMock, patch
@@ -36,7 +37,9 @@ def _json_bi(dimensions, measures, table_calculations, rows):
                 "fields": {
                     "dimensions": [_field(d) for d in dimensions],
                     "measures": [_field(m) for m in measures],
-                    "table_calculations": [_field(t) for t in (table_calculations or [])],
+                    "table_calculations": [
+                        _field(t) for t in (table_calculations or [])
+                    ],
                 }
             },
             "rows": rows,
@@ -56,7 +59,29 @@ def _make_args(pptx_path, output_dir):
         parse_date_syntax_in_filename=False,
         quiet=True,
         filter=None,
+        filter_file=None,
+        plan=None,
         debug_queries=False,
+        max_workers=None,
+        async_transport=False,
+        query_tasks=False,
+        max_concurrent_queries=None,
+        max_connections_per_host=None,
+        query_timeout=None,
+        deadline=None,
+        requests_per_second=None,
+        retry_budget=None,
+        circuit_breaker_error_rate=None,
+        circuit_breaker_cooldown=None,
+        no_pushdown=False,
+        csv_results=False,
+        prefer_cached=False,
+        cache_only=False,
+        no_token_cache=True,
+        no_cache=True,
+        cache_ttl=None,
+        cache_dir=None,
+        cache_max_size=None,
         verbose=0,
     )
     # "self" is not a Python keyword, but using it as a kwarg looks odd; setattr is cleaner.
@@ -102,6 +127,7 @@ class TestIntegration:
         mock_client._async_write_queries = AsyncMock(
             return_value={TABLE_SHAPE_ID: mock_result}
         )
+        mock_client.aclose = AsyncMock()
 
         with patch("looker_powerpoint.cli.LookerClient", return_value=mock_client):
             cli.run()
@@ -130,3 +156,96 @@ class TestIntegration:
         assert table.cell(2, 1).text == "pending"
         assert table.cell(2, 2).text == "200"
         assert table.cell(2, 3).text == "10"
+
+    def test_run_renders_one_deck_per_filter_value(self, tmp_path):
+        """Several --filter values give one filled output pptx per value."""
+
+        async def write_queries(shape_id, filter_value, **kwargs):
+            return {
+                shape_id: _json_bi(
+                    dimensions=["orders.region"],
+                    measures=[],
+                    table_calculations=[],
+                    rows=[{"orders.region.value": filter_value}],
+                )
+            }
+
+        args = _make_args(PPTX_PATH, str(tmp_path))
+        args.filter = ["EMEA", "APAC"]
+
+        cli = Cli()
+        cli.parser.parse_args = lambda: args
+
+        mock_client = MagicMock()
+        mock_client.max_workers = 8
+        mock_client._async_write_queries = AsyncMock(side_effect=write_queries)
+        mock_client.aclose = AsyncMock()
+
+        variants = []
+        get_variant_queries = cli.get_variant_queries
+
+        async def capture(filter_values):
+            variants.extend(await get_variant_queries(filter_values))
+            return variants
+
+        cli.get_variant_queries = capture
+        with patch("looker_powerpoint.cli.LookerClient", return_value=mock_client):
+            cli.run()
+
+        # One client, and so one login and connection pool, for both decks.
+        mock_client.close.assert_called_once()
+        # Saved decks do not hold on to their presentation or results.
+        assert [(v.presentation, v.data) for v in variants] == [(None, {})] * 2
+        for region in ("EMEA", "APAC"):
+            (output_file,) = tmp_path.glob(f"table7x7_{region}_*.pptx")
+            prs = Presentation(str(output_file))
+            table = next(s.table for s in prs.slides[0].shapes if s.has_table)
+            assert table.cell(0, 0).text == "region"
+            assert table.cell(1, 0).text == region
+
+    def test_values_with_the_same_file_name_get_separate_decks(self, tmp_path):
+        """Values reduced to the same file name are saved one deck at a time."""
+        in_flight = set()
+        concurrent = []
+
+        async def write_queries(shape_id, filter_value, **kwargs):
+            in_flight.add(filter_value)
+            concurrent.append(len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.discard(filter_value)
+            return {
+                shape_id: _json_bi(
+                    dimensions=["orders.region"],
+                    measures=[],
+                    table_calculations=[],
+                    rows=[{"orders.region.value": filter_value}],
+                )
+            }
+
+        args = _make_args(PPTX_PATH, str(tmp_path))
+        args.filter = [">10", "<10", "North America", "north/america"]
+
+        cli = Cli()
+        cli.parser.parse_args = lambda: args
+        scans = []
+        iter_alt_text = cli.iter_alt_text
+        cli.iter_alt_text = lambda presentation: (
+            scans.append(presentation) or iter_alt_text(presentation)
+        )
+
+        mock_client = MagicMock()
+        mock_client.max_workers = 1
+        mock_client._async_write_queries = AsyncMock(side_effect=write_queries)
+        mock_client.aclose = AsyncMock()
+        with patch("looker_powerpoint.cli.LookerClient", return_value=mock_client):
+            cli.run()
+
+        # The template's alternative text is read once for all decks.
+        assert len(scans) == 1
+        assert max(concurrent) == 1
+        regions = set()
+        for output_file in tmp_path.glob("table7x7_*.pptx"):
+            prs = Presentation(str(output_file))
+            table = next(s.table for s in prs.slides[0].shapes if s.has_table)
+            regions.add(table.cell(1, 0).text)
+        assert regions == set(args.filter)
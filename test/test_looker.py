@@ -0,0 +1,1732 @@
+"""
+Tests for LookerClient.
+
+The Looker SDK is never contacted — ``looker_sdk.init40`` is patched to return a
+``MagicMock`` whose ``look`` / ``run_inline_query`` methods serve fixture data.
+"""
+
+import asyncio
+import datetime
+import inspect
+import json
+import re
+import threading
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import looker_sdk
+import requests
+from looker_sdk import models40 as models
+from looker_sdk.rtl import auth_token
+
+from looker_powerpoint import looker as looker_module
+from looker_powerpoint.breaker import MIN_CALLS, CircuitOpenError
+from looker_powerpoint.cache import QueryCache
+from looker_powerpoint.looker import LookerClient, ResultMemo, query_fingerprint
+from looker_powerpoint.models import QueryResult
+from looker_powerpoint.pushdown import ResultNeeds
+from looker_powerpoint.retry import LookerAPIError, record_response
+from looker_powerpoint.tokens import TokenCache
+from looker_powerpoint.transport import AsyncLookerTransport
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+
+def _make_look(
+    fields=None,
+    filters=None,
+    sorts=None,
+    pivots=None,
+    limit="500",
+    updated_at=datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc),
+):
+    """Build a ``models.LookWithQuery`` with id ``1``."""
+    query = models.Query(
+        model="ecommerce",
+        view="orders",
+        fields=fields or ["orders.date", "orders.revenue"],
+        filters=filters if filters is not None else {"orders.region": "EU"},
+        sorts=sorts or [],
+        pivots=pivots,
+        limit=limit,
+    )
+    return models.LookWithQuery(id="1", updated_at=updated_at, query=query)
+
+
+def _make_sdk(look=None, result=None):
+    """Build a mocked Looker40SDK."""
+    sdk = MagicMock()
+    sdk.look.return_value = look or _make_look()
+    sdk.run_inline_query.return_value = result or json.dumps(
+        {"metadata": {"fields": {}}, "rows": []}
+    )
+    # Queries run by id when the result cache (and with it the query id index)
+    # is enabled.
+    sdk.create_query.return_value = models.Query(id="101", model="m", view="v")
+    sdk.run_query.return_value = sdk.run_inline_query.return_value
+    return sdk
+
+
+def _make_client(sdk, **kwargs):
+    """Create a LookerClient wired to *sdk* instead of a live Looker instance."""
+    with patch("looker_powerpoint.looker.looker_sdk.init40", return_value=sdk):
+        return LookerClient(**kwargs)
+
+
+# ---------------------------------------------------------------------------
+# Worker pool
+# ---------------------------------------------------------------------------
+
+
+class TestWorkerPool:
+    """Blocking SDK calls are dispatched to a bounded thread pool."""
+
+    def test_max_workers_argument(self):
+        client = _make_client(_make_sdk(), max_workers=3)
+        assert client.max_workers == 3
+
+    def test_max_workers_from_environment(self, monkeypatch):
+        monkeypatch.setenv("MAX_WORKERS", "5")
+        client = _make_client(_make_sdk())
+        assert client.max_workers == 5
+
+    def test_max_workers_is_at_least_one(self):
+        client = _make_client(_make_sdk(), max_workers=0)
+        assert client.max_workers == 1
+
+    def test_queries_run_concurrently(self):
+        """All four run_inline_query calls must be in flight at the same time."""
+        barrier = threading.Barrier(4, timeout=5)
+        sdk = _make_sdk()
+        result = json.dumps({"metadata": {}, "rows": []})
+
+        def run_inline_query(**kwargs):
+            # Raises BrokenBarrierError if the calls were serialised.
+            barrier.wait()
+            return result
+
+        sdk.run_inline_query.side_effect = run_inline_query
+        client = _make_client(sdk, max_workers=4)
+
+        async def run_all():
+            # Distinct filter values so the four queries are not deduplicated.
+            return await asyncio.gather(
+                *(
+                    client.make_query(
+                        f"0,{i}", id="1", filter="orders.region", filter_value=str(i)
+                    )
+                    for i in range(4)
+                )
+            )
+
+        results = asyncio.run(run_all())
+        client.close()
+
+        merged = {}
+        for r in results:
+            merged.update(r)
+        assert set(merged) == {"0,0", "0,1", "0,2", "0,3"}
+        assert all(v is not None for v in merged.values())
+
+
+# ---------------------------------------------------------------------------
+# make_query
+# ---------------------------------------------------------------------------
+
+
+class TestMakeQuery:
+    """Tests for LookerClient.make_query."""
+
+    def test_returns_result_keyed_by_shape_id(self):
+        client = _make_client(_make_sdk())
+        result = asyncio.run(client.make_query("0,4", id="1"))
+        assert list(result) == ["0,4"]
+        assert isinstance(result["0,4"], QueryResult)
+        assert result["0,4"].data == {"metadata": {"fields": {}}, "rows": []}
+        assert result["0,4"].sorts == []
+
+    def test_result_carries_sorts_pivots_and_size(self):
+        look = _make_look(sorts=["orders.date desc 0"], pivots=["orders.region"])
+        payload = json.dumps({"metadata": {}, "rows": [{"a": 1}]})
+        client = _make_client(_make_sdk(look=look, result=payload))
+        result = asyncio.run(client.make_query("0,4", id="1"))["0,4"]
+        assert result.sorts == ["orders.date desc 0"]
+        assert result.pivots == ["orders.region"]
+        assert result.size == len(payload)
+        assert result.from_cache is False
+
+    def test_invalid_look_returns_none(self):
+        sdk = _make_sdk()
+        sdk.look.side_effect = Exception("not found")
+        client = _make_client(sdk)
+        assert asyncio.run(client.make_query("0,4", id="999")) == {"0,4": None}
+
+    def test_filter_value_applied_to_body(self):
+        sdk = _make_sdk()
+        client = _make_client(sdk)
+        asyncio.run(
+            client.make_query("0,4", id="1", filter="orders.region", filter_value="US")
+        )
+        body = sdk.run_inline_query.call_args.kwargs["body"]
+        assert body.filters == {"orders.region": "US"}
+
+
+# ---------------------------------------------------------------------------
+# Look definition memo
+# ---------------------------------------------------------------------------
+
+
+class TestLookMemo:
+    """Each Look definition is fetched at most once per run."""
+
+    def test_concurrent_shapes_share_one_fetch(self):
+        sdk = _make_sdk()
+        client = _make_client(sdk)
+
+        async def run_all():
+            return await asyncio.gather(
+                *(client.make_query(f"0,{i}", id="1") for i in range(5))
+            )
+
+        asyncio.run(run_all())
+        assert sdk.look.call_count == 1
+
+    def test_sequential_calls_hit_the_memo(self):
+        sdk = _make_sdk()
+        client = _make_client(sdk)
+        asyncio.run(client.make_query("0,1", id="1"))
+        asyncio.run(client.make_query("0,2", id="1"))
+        assert sdk.look.call_count == 1
+
+    def test_distinct_looks_are_fetched_separately(self):
+        sdk = _make_sdk()
+        client = _make_client(sdk)
+        asyncio.run(client.make_query("0,1", id="1"))
+        asyncio.run(client.make_query("0,2", id="2"))
+        assert sdk.look.call_count == 2
+
+    def test_prefetch_is_shared_with_the_query(self):
+        sdk = _make_sdk()
+        client = _make_client(sdk)
+
+        async def run():
+            client.prefetch_look("1")
+            return await client.make_query("0,1", id="1")
+
+        assert asyncio.run(run())["0,1"] is not None
+        assert sdk.look.call_count == 1
+
+    def test_failed_prefetch_is_retried_by_the_query(self):
+        sdk = _make_sdk()
+        sdk.look.side_effect = [LookerAPIError("boom", status=404), _make_look()]
+        client = _make_client(sdk)
+
+        async def run():
+            await asyncio.wait([client.prefetch_look("1")])
+            return await client.make_query("0,1", id="1")
+
+        assert asyncio.run(run())["0,1"] is not None
+        assert sdk.look.call_count == 2
+
+    def test_failed_fetch_is_not_memoised(self):
+        sdk = _make_sdk()
+        sdk.look.side_effect = [Exception("boom"), _make_look()]
+        client = _make_client(sdk)
+        assert asyncio.run(client.make_query("0,1", id="1")) == {"0,1": None}
+        assert asyncio.run(client.make_query("0,2", id="1"))["0,2"] is not None
+        assert sdk.look.call_count == 2
+
+    def test_shapes_do_not_share_query_modifications(self):
+        """Filters applied for one shape must not leak into the memoised Look."""
+        sdk = _make_sdk()
+        client = _make_client(sdk)
+        asyncio.run(
+            client.make_query("0,1", id="1", filter="orders.region", filter_value="US")
+        )
+        asyncio.run(client.make_query("0,2", id="1"))
+        bodies = [c.kwargs["body"] for c in sdk.run_inline_query.call_args_list]
+        assert bodies[0].filters == {"orders.region": "US"}
+        assert bodies[1].filters == {"orders.region": "EU"}
+
+
+def _make_dashboard(
+    updated_at=datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc),
+):
+    """Build a ``models.Dashboard`` whose tiles "Revenue" and "Revenue again"
+    run the query of :func:`_make_look`."""
+    look = _make_look()
+    return models.Dashboard(
+        id="7",
+        updated_at=updated_at,
+        dashboard_elements=[
+            models.DashboardElement(id="11", title="Revenue", query=look.query),
+            models.DashboardElement(id="12", title="Revenue again", query=look.query),
+        ],
+    )
+
+
+class TestDashboardTiles:
+    """Shapes referencing dashboard tiles share one dashboard fetch."""
+
+    def test_tiles_share_one_dashboard_fetch_and_identical_queries(self):
+        sdk = _make_sdk()
+        sdk.dashboard.return_value = _make_dashboard()
+        client = _make_client(sdk)
+
+        async def run_all():
+            return await asyncio.gather(
+                *(
+                    client.make_query(f"0,{i}", id="7", id_type="dashboard", tile=tile)
+                    for i, tile in enumerate(["Revenue", "Revenue again", "11"])
+                )
+            )
+
+        results = asyncio.run(run_all())
+        assert all(r is not None for result in results for r in result.values())
+        assert sdk.dashboard.call_count == 1
+        assert sdk.look.call_count == 0
+        # Both tiles run the same query.
+        assert sdk.run_inline_query.call_count == 1
+
+    def test_tile_query_is_filtered_like_a_look(self):
+        sdk = _make_sdk()
+        sdk.dashboard.return_value = _make_dashboard()
+        client = _make_client(sdk)
+        asyncio.run(
+            client.make_query(
+                "0,1",
+                id="7",
+                id_type="dashboard",
+                tile="Revenue",
+                filter="orders.region",
+                filter_value="US",
+            )
+        )
+        body = sdk.run_inline_query.call_args.kwargs["body"]
+        assert body.filters == {"orders.region": "US"}
+
+    def test_unknown_tile_fails_the_shape(self, caplog):
+        sdk = _make_sdk()
+        sdk.dashboard.return_value = _make_dashboard()
+        client = _make_client(sdk)
+        result = asyncio.run(
+            client.make_query("0,1", id="7", id_type="dashboard", tile="Profit")
+        )
+        assert result == {"0,1": None}
+        assert "available tiles: 'Revenue', 'Revenue again'" in caplog.text
+
+    def test_unchanged_dashboard_is_not_refetched(self, tmp_path):
+        sdk = _make_sdk()
+        dashboard = _make_dashboard()
+
+        def fetch(dashboard_id, fields=None):
+            if fields == "id,updated_at":
+                return models.Dashboard(
+                    id=dashboard_id, updated_at=dashboard.updated_at
+                )
+            return dashboard
+
+        sdk.dashboard.side_effect = fetch
+        asyncio.run(
+            _make_client(sdk, cache=QueryCache(str(tmp_path))).get_dashboard("7")
+        )
+        # Within the TTL the cached tiles are used without asking Looker.
+        second = _make_client(sdk, cache=QueryCache(str(tmp_path)))
+        tile = asyncio.run(second.get_tile("7", "Revenue again"))
+        assert sdk.dashboard.call_count == 1
+        assert tile.query.filters == {"orders.region": "EU"}
+
+        # After it they are revalidated.
+        third = _make_client(sdk, cache=QueryCache(str(tmp_path), ttl=0))
+        tile = asyncio.run(third.get_tile("7", "Revenue again"))
+        fields = [c.kwargs["fields"] for c in sdk.dashboard.call_args_list]
+        assert fields.count("id,updated_at") == 1
+        assert len(fields) == 2
+        assert tile.query.filters == {"orders.region": "EU"}
+
+
+# ---------------------------------------------------------------------------
+# Query fingerprinting and deduplication
+# ---------------------------------------------------------------------------
+
+
+def _query(body=None, **options):
+    query = {
+        "result_format": "json_bi",
+        "body": body
+        or models.WriteQuery(
+            model="ecommerce",
+            view="orders",
+            fields=["orders.date"],
+            filters={"a": "1", "b": "2"},
+        ),
+        "apply_vis": True,
+        "apply_formatting": False,
+        "server_table_calcs": True,
+    }
+    query.update(options)
+    return query
+
+
+class TestQueryFingerprint:
+    def test_identical_queries_match(self):
+        assert query_fingerprint(_query()) == query_fingerprint(_query())
+
+    def test_filter_order_does_not_matter(self):
+        reordered = models.WriteQuery(
+            model="ecommerce",
+            view="orders",
+            fields=["orders.date"],
+            filters={"b": "2", "a": "1"},
+        )
+        assert query_fingerprint(_query()) == query_fingerprint(_query(reordered))
+
+    def test_field_order_matters(self):
+        swapped = models.WriteQuery(
+            model="ecommerce",
+            view="orders",
+            fields=["orders.revenue", "orders.date"],
+        )
+        unswapped = models.WriteQuery(
+            model="ecommerce",
+            view="orders",
+            fields=["orders.date", "orders.revenue"],
+        )
+        assert query_fingerprint(_query(swapped)) != query_fingerprint(
+            _query(unswapped)
+        )
+
+    def test_run_options_are_part_of_the_fingerprint(self):
+        assert query_fingerprint(_query()) != query_fingerprint(
+            _query(apply_formatting=True)
+        )
+        assert query_fingerprint(_query()) != query_fingerprint(
+            _query(result_format="json")
+        )
+
+
+class TestQueryDedup:
+    def test_identical_queries_execute_once(self):
+        sdk = _make_sdk()
+        client = _make_client(sdk)
+
+        async def run_all():
+            return await asyncio.gather(
+                *(client.make_query(f"0,{i}", id="1", row=i) for i in range(3))
+            )
+
+        results = asyncio.run(run_all())
+        assert sdk.run_inline_query.call_count == 1
+        assert {k for r in results for k in r} == {"0,0", "0,1", "0,2"}
+        assert len({id(v) for r in results for v in r.values()}) == 1
+        assert (client.queries_requested, client.queries_executed) == (3, 1)
+
+    def test_different_filters_execute_separately(self):
+        sdk = _make_sdk()
+        client = _make_client(sdk)
+        for value in ("EU", "US"):
+            asyncio.run(
+                client.make_query(
+                    "0,1", id="1", filter="orders.region", filter_value=value
+                )
+            )
+        assert sdk.run_inline_query.call_count == 2
+
+    def test_failed_query_is_retried_by_next_shape(self):
+        sdk = _make_sdk()
+        sdk.run_inline_query.side_effect = [
+            Exception("boom"),
+            json.dumps({"rows": []}),
+        ]
+        client = _make_client(sdk)
+        assert asyncio.run(client.make_query("0,1", id="1")) == {"0,1": None}
+        assert asyncio.run(client.make_query("0,2", id="1"))["0,2"] is not None
+
+    def test_result_memo_drops_least_recently_used(self):
+        memo = ResultMemo(max_bytes=10)
+        memo["a"] = QueryResult(size=4)
+        memo["b"] = QueryResult(size=4)
+        memo["a"]
+        memo["c"] = QueryResult(size=4)
+        assert list(memo) == ["a", "c"]
+        assert memo.bytes == 8
+        # A result larger than the budget is kept until the next one arrives.
+        memo["d"] = QueryResult(data={"rows": ["x" * 20]})
+        assert list(memo) == ["d"]
+
+    def test_dropped_result_runs_again(self):
+        sdk = _make_sdk()
+        client = _make_client(sdk)
+        client._results.max_bytes = 1
+        for i in range(3):
+            asyncio.run(
+                client.make_query(
+                    f"0,{i}", id="1", filter="orders.region", filter_value=str(i % 2)
+                )
+            )
+        assert sdk.run_inline_query.call_count == 3
+        assert len(client._results) == 1
+
+    def test_dedup_ratio_logged(self, caplog):
+        client = _make_client(_make_sdk())
+
+        async def run_all():
+            await asyncio.gather(
+                *(client.make_query(f"0,{i}", id="1") for i in range(4))
+            )
+
+        asyncio.run(run_all())
+        with caplog.at_level("INFO"):
+            client.log_dedup_stats()
+        assert "dedup ratio 4.00x" in caplog.text
+
+
+# ---------------------------------------------------------------------------
+# Persistent result cache
+# ---------------------------------------------------------------------------
+
+
+class TestResultCache:
+    def test_second_run_is_served_from_cache(self, tmp_path):
+        sdk = _make_sdk()
+        first = _make_client(sdk, cache=QueryCache(str(tmp_path)))
+        result = asyncio.run(first.make_query("0,1", id="1"))
+        first.close()
+
+        second = _make_client(sdk, cache=QueryCache(str(tmp_path)))
+        cached = asyncio.run(second.make_query("0,1", id="1"))
+        assert cached["0,1"].data == result["0,1"].data
+        assert cached["0,1"].from_cache is True
+        assert sdk.run_query.call_count == 1
+        assert second.cache_hits == 1
+
+    def test_results_are_kept_per_instance_and_user(self, tmp_path):
+        def sdk_for(base_url, client_id):
+            sdk = _make_sdk()
+            sdk.auth.settings.base_url = base_url
+            sdk.auth.settings.read_config.return_value = {"client_id": client_id}
+            return sdk
+
+        staging = sdk_for("https://staging.example.com", "client")
+        asyncio.run(
+            _make_client(staging, cache=QueryCache(str(tmp_path))).make_query(
+                "0,1", id="1"
+            )
+        )
+        for sdk in (
+            sdk_for("https://looker.example.com", "client"),
+            sdk_for("https://staging.example.com", "other"),
+        ):
+            client = _make_client(sdk, cache=QueryCache(str(tmp_path)))
+            result = asyncio.run(client.make_query("0,1", id="1"))["0,1"]
+            assert result.from_cache is False
+            sdk.run_query.assert_called_once()
+
+    def test_failed_query_is_not_cached(self, tmp_path):
+        sdk = _make_sdk()
+        sdk.run_query.side_effect = Exception("boom")
+        cache = QueryCache(str(tmp_path))
+        client = _make_client(sdk, cache=cache)
+        asyncio.run(client.make_query("0,1", id="1"))
+        assert cache.size() == 0
+
+    def test_client_id_is_read_once(self, tmp_path):
+        sdk = _make_sdk()
+        client = _make_client(sdk, cache=QueryCache(str(tmp_path)))
+        for i in range(3):
+            asyncio.run(client.make_query(f"0,{i}", id="1", limit=str(i + 1)))
+        sdk.auth.settings.read_config.assert_called_once()
+
+    def test_cache_is_not_used_on_the_event_loop(self, tmp_path):
+        cache = QueryCache(str(tmp_path))
+        threads = set()
+        for name in ("get", "set", "get_look", "set_look", "get_query_id"):
+            method = getattr(cache, name)
+
+            def record(*args, method=method):
+                threads.add(threading.current_thread())
+                return method(*args)
+
+            setattr(cache, name, record)
+        client = _make_client(_make_sdk(), cache=cache)
+        asyncio.run(client.make_query("0,1", id="1"))
+        assert threads
+        assert threading.main_thread() not in threads
+
+    """With the cache enabled, queries are saved once and then run by id."""
+
+    def _run(self, sdk, tmp_path, **kwargs):
+        # A zero TTL keeps the result cache from answering the query.
+        client = _make_client(sdk, cache=QueryCache(str(tmp_path), ttl=0))
+        asyncio.run(client.make_query("0,1", id="1", **kwargs))
+        return client
+
+    def test_query_is_saved_once_across_runs(self, tmp_path):
+        sdk = _make_sdk()
+        self._run(sdk, tmp_path)
+        second = self._run(sdk, tmp_path)
+        assert sdk.create_query.call_count == 1
+        assert [c.kwargs["query_id"] for c in sdk.run_query.call_args_list] == [
+            "101",
+            "101",
+        ]
+        assert second.query_ids_reused == 1
+        sdk.run_inline_query.assert_not_called()
+
+    def test_different_queries_get_their_own_ids(self, tmp_path):
+        sdk = _make_sdk()
+        self._run(sdk, tmp_path)
+        self._run(sdk, tmp_path, limit="10")
+        assert sdk.create_query.call_count == 2
+
+    def test_unknown_id_is_replaced(self, tmp_path):
+        sdk = _make_sdk()
+        self._run(sdk, tmp_path)
+        sdk.create_query.return_value = models.Query(id="202", model="m", view="v")
+
+        def run_query(query_id, **kwargs):
+            if query_id == "101":
+                raise LookerAPIError("Not found", status=404)
+            return sdk.run_inline_query.return_value
+
+        sdk.run_query.side_effect = run_query
+        second = self._run(sdk, tmp_path)
+        assert second.queries_executed == 1
+        assert sdk.create_query.call_count == 2
+        # The new id is indexed for the next run.
+        third = self._run(sdk, tmp_path)
+        assert third.query_ids_reused == 1
+        assert sdk.create_query.call_count == 2
+
+    def test_other_errors_keep_the_id(self, tmp_path):
+        sdk = _make_sdk()
+        self._run(sdk, tmp_path)
+        sdk.run_query.side_effect = LookerAPIError("Bad request", status=400)
+        self._run(sdk, tmp_path)
+        assert sdk.create_query.call_count == 1
+
+
+class TestLookDefinitionCache:
+    """Look definitions persist across runs and are revalidated by updated_at."""
+
+    def _sdk(self, stored_look, current_updated_at):
+        sdk = _make_sdk()
+
+        def look(look_id, fields=None):
+            if fields == "id,updated_at":
+                return models.LookWithQuery(id=look_id, updated_at=current_updated_at)
+            return stored_look
+
+        sdk.look.side_effect = look
+        return sdk
+
+    def _get_look(self, sdk, tmp_path, ttl=3600):
+        client = _make_client(sdk, cache=QueryCache(str(tmp_path), ttl=ttl))
+        return asyncio.run(client.get_look("1"))
+
+    def test_look_is_not_checked_within_ttl(self, tmp_path):
+        stored = _make_look(filters={"orders.region": "EU"})
+        sdk = self._sdk(stored, stored.updated_at)
+        self._get_look(sdk, tmp_path)
+        look = self._get_look(sdk, tmp_path)
+        sdk.look.assert_called_once_with("1")
+        assert look.query.filters == {"orders.region": "EU"}
+
+    def test_unchanged_look_is_not_refetched(self, tmp_path):
+        stored = _make_look(filters={"orders.region": "EU"})
+        sdk = self._sdk(stored, stored.updated_at)
+        self._get_look(sdk, tmp_path)
+        look = self._get_look(sdk, tmp_path, ttl=0)
+
+        full_fetches = [c for c in sdk.look.call_args_list if "fields" not in c.kwargs]
+        assert len(full_fetches) == 1
+        assert sdk.look.call_count == 2
+        assert look.query.filters == {"orders.region": "EU"}
+
+    def test_changed_look_is_refetched(self, tmp_path):
+        stored = _make_look()
+        newer = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+        sdk = self._sdk(stored, newer)
+        self._get_look(sdk, tmp_path)
+        self._get_look(sdk, tmp_path, ttl=0)
+
+        full_fetches = [c for c in sdk.look.call_args_list if "fields" not in c.kwargs]
+        assert len(full_fetches) == 2
+
+    def test_looks_are_kept_per_instance(self, tmp_path):
+        sdk = self._sdk(_make_look(), _make_look().updated_at)
+        self._get_look(sdk, tmp_path)
+        sdk.auth.settings.base_url = "https://staging.example.com"
+        self._get_look(sdk, tmp_path)
+        assert sdk.look.call_count == 2
+
+    def test_re_render_within_ttl_does_not_call_looker(self, tmp_path):
+        sdk = _projection_sdk()
+        needs = ResultNeeds(labels=["cost"], rows=1)
+        for _ in range(2):
+            client = _make_client(sdk, cache=QueryCache(str(tmp_path)))
+            asyncio.run(client.make_query("0,1", id="1", result_needs=needs))
+        assert sdk.look.call_count == 1
+        assert sdk.lookml_model_explore.call_count == 1
+        assert sdk.run_query.call_count == 1
+
+    def test_without_cache_no_revalidation_call(self):
+        sdk = _make_sdk()
+        asyncio.run(_make_client(sdk).get_look("1"))
+        sdk.look.assert_called_once_with("1")
+
+
+class TestLookerCacheModes:
+    """--prefer-cached / --cache-only take results from Looker's result cache."""
+
+    OK = json.dumps({"rows": []})
+
+    def _sdk(self, cached=True):
+        sdk = _make_sdk()
+
+        def run_inline_query(**kwargs):
+            if kwargs.get("cache_only") and not cached:
+                raise looker_sdk.error.SDKError("No cached result")
+            return self.OK
+
+        sdk.run_inline_query.side_effect = run_inline_query
+        return sdk
+
+    def _calls(self, sdk):
+        return [c.kwargs.get("cache_only") for c in sdk.run_inline_query.call_args_list]
+
+    def test_prefer_cached_hit(self):
+        sdk = self._sdk()
+        client = _make_client(sdk, prefer_cached=True)
+        result = asyncio.run(client.make_query("0,1", id="1"))["0,1"]
+        assert result.from_looker_cache is True
+        assert self._calls(sdk) == [True]
+        assert client.looker_cache_hits == 1
+
+    def test_prefer_cached_miss_queries_warehouse(self):
+        sdk = self._sdk(cached=False)
+        client = _make_client(sdk, prefer_cached=True)
+        result = asyncio.run(client.make_query("0,1", id="1"))["0,1"]
+        assert result.from_looker_cache is False
+        assert self._calls(sdk) == [True, None]
+
+    def test_cache_probe_is_not_retried(self):
+        sdk = _make_sdk()
+
+        def run_inline_query(**kwargs):
+            if kwargs.get("cache_only"):
+                raise LookerAPIError("Unavailable", status=503, retry_after=0)
+            return self.OK
+
+        sdk.run_inline_query.side_effect = run_inline_query
+        client = _make_client(sdk, prefer_cached=True)
+        result = asyncio.run(client.make_query("0,1", id="1", retries=2))["0,1"]
+        assert result.from_looker_cache is False
+        assert self._calls(sdk) == [True, None]
+        assert client.retry_budget.used == 0
+
+    def test_cache_probe_timeout_queries_warehouse(self):
+        sdk = _make_sdk()
+
+        def run_inline_query(**kwargs):
+            if kwargs.get("cache_only"):
+                time.sleep(0.5)
+            return self.OK
+
+        sdk.run_inline_query.side_effect = run_inline_query
+        client = _make_client(sdk, prefer_cached=True, query_timeout=0.1)
+        result = asyncio.run(client.make_query("0,1", id="1"))["0,1"]
+        assert result.from_looker_cache is False
+        assert self._calls(sdk) == [True, None]
+
+    def test_cache_only_miss_fails_the_shape(self):
+        sdk = self._sdk(cached=False)
+        client = _make_client(sdk, cache_only=True)
+        assert asyncio.run(client.make_query("0,1", id="1"))["0,1"] is None
+        assert self._calls(sdk) == [True]
+
+    def test_modes_from_environment(self, monkeypatch):
+        monkeypatch.setenv("CACHE_ONLY", "1")
+        client = _make_client(_make_sdk())
+        assert client.cache_only and client.prefer_cached
+
+    def test_shape_options_are_passed_through(self):
+        sdk = self._sdk()
+        asyncio.run(
+            _make_client(sdk).make_query(
+                "0,1", id="1", cache_only=True, force_production=True
+            )
+        )
+        kwargs = sdk.run_inline_query.call_args.kwargs
+        assert (kwargs["cache_only"], kwargs["force_production"]) == (True, True)
+
+    def test_shape_without_cache_skips_looker_cache(self):
+        sdk = self._sdk()
+        client = _make_client(sdk, prefer_cached=True)
+        result = asyncio.run(client.make_query("0,1", id="1", cache=False))["0,1"]
+        assert result.from_looker_cache is False
+        assert sdk.run_inline_query.call_args.kwargs["cache"] is False
+
+    def test_cache_control_is_not_fingerprinted(self):
+        body = _make_look().query
+        plain = query_fingerprint({"result_format": "json", "body": body})
+        assert plain == query_fingerprint(
+            {"result_format": "json", "cache_only": True, "body": body}
+        )
+        assert plain != query_fingerprint(
+            {"result_format": "json", "force_production": True, "body": body}
+        )
+        assert plain == query_fingerprint(
+            {"result_format": "json", "cache": True, "body": body}
+        )
+        assert plain != query_fingerprint(
+            {"result_format": "json", "cache": False, "body": body}
+        )
+
+    def test_shape_without_cache_does_not_share_a_cached_result(self):
+        sdk = self._sdk()
+        client = _make_client(sdk, prefer_cached=True)
+
+        async def run_all():
+            return await asyncio.gather(
+                client.make_query("0,1", id="1"),
+                client.make_query("0,2", id="1", cache=False),
+            )
+
+        first, second = asyncio.run(run_all())
+        assert first["0,1"].from_looker_cache is True
+        assert second["0,2"].from_looker_cache is False
+        assert client.queries_executed == 2
+
+    def test_shape_without_cache_skips_result_cache(self, tmp_path):
+        sdk = self._sdk()
+        asyncio.run(
+            _make_client(sdk, cache=QueryCache(str(tmp_path))).make_query("0,1", id="1")
+        )
+        client = _make_client(sdk, cache=QueryCache(str(tmp_path)))
+        result = asyncio.run(client.make_query("0,1", id="1", cache=False))["0,1"]
+        assert result.from_cache is False
+        assert sdk.run_query.call_count == 2
+        # Its fresh result is stored for shapes that allow cached results.
+        cached = asyncio.run(client.make_query("0,2", id="1"))["0,2"]
+        assert cached.from_cache is True
+
+
+class TestTokenReuse:
+    """Access tokens are stored across runs and replaced when rejected."""
+
+    def _sdk(self):
+        sdk = _make_sdk()
+        sdk.auth.settings.base_url = "https://looker.example.com"
+        sdk.auth.settings.read_config.return_value = {"client_id": "client"}
+        sdk.auth.token = auth_token.AuthToken()
+        return sdk
+
+    def test_token_is_stored_and_reused(self, tmp_path):
+        first_sdk = self._sdk()
+        first = _make_client(first_sdk, token_cache=TokenCache(str(tmp_path)))
+        # What the SDK holds after logging in during the run.
+        first_sdk.auth.token = auth_token.AuthToken(
+            auth_token.AccessToken(access_token="t1", expires_in=3600)
+        )
+        first.close()
+
+        second_sdk = self._sdk()
+        _make_client(second_sdk, token_cache=TokenCache(str(tmp_path)))
+        assert second_sdk.auth.token.access_token == "t1"
+        assert second_sdk.auth.token.is_active
+
+    def test_without_token_cache_nothing_is_stored(self, tmp_path):
+        sdk = self._sdk()
+        client = _make_client(sdk)
+        sdk.auth.token = auth_token.AuthToken(
+            auth_token.AccessToken(access_token="t1", expires_in=3600)
+        )
+        client.close()
+        assert not any(tmp_path.iterdir())
+
+    def test_rejected_token_logs_in_again(self):
+        sdk = self._sdk()
+        sdk.auth.token = auth_token.AuthToken(
+            auth_token.AccessToken(access_token="revoked", expires_in=3600)
+        )
+        calls = []
+
+        def look(look_id, **kwargs):
+            calls.append(sdk.auth.token.access_token)
+            if len(calls) == 1:
+                raise LookerAPIError("Unauthorized", status=401)
+            return _make_look()
+
+        sdk.look.side_effect = look
+        look = asyncio.run(_make_client(sdk).get_look("1"))
+        assert look.id == "1"
+        # The second attempt no longer carries the rejected token.
+        assert calls == ["revoked", ""]
+
+
+# ---------------------------------------------------------------------------
+# Query-task mode
+# ---------------------------------------------------------------------------
+
+
+def _task_sdk(statuses):
+    """
+    Build an SDK that runs queries as tasks. ``statuses`` lists, per poll, the
+    status reported for every pending task; the last entry repeats.
+    """
+    sdk = _make_sdk()
+    sdk.create_query.side_effect = lambda body, fields=None: models.Query(
+        id=f"q-{body.filters['orders.region']}", model=body.model, view=body.view
+    )
+    sdk.create_query_task.side_effect = lambda body, **kwargs: models.QueryTask(
+        id=f"task-{body.query_id}"
+    )
+    polls = []
+
+    def multi_results(query_task_ids):
+        status = statuses[min(len(polls), len(statuses) - 1)]
+        polls.append(list(query_task_ids))
+        return {
+            task_id: {"status": status, "data": {"rows": [{"task": task_id}]}}
+            for task_id in query_task_ids
+        }
+
+    sdk.query_task_multi_results.side_effect = multi_results
+    return sdk, polls
+
+
+class TestQueryTasks:
+    """Queries are submitted as tasks and collected by one batched poller."""
+
+    def _run(self, client, regions, **kwargs):
+        async def run_all():
+            return await asyncio.gather(
+                *(
+                    client.make_query(
+                        f"0,{i}",
+                        id="1",
+                        filter="orders.region",
+                        filter_value=region,
+                        **kwargs,
+                    )
+                    for i, region in enumerate(regions)
+                )
+            )
+
+        with patch("looker_powerpoint.looker.QUERY_TASK_POLL_INTERVAL", 0.01):
+            results = asyncio.run(run_all())
+        merged = {}
+        for r in results:
+            merged.update(r)
+        return merged
+
+    def test_disabled_by_default(self):
+        sdk, polls = _task_sdk(["complete"])
+        self._run(_make_client(sdk), ["EU"])
+        sdk.create_query_task.assert_not_called()
+
+    def test_enabled_from_environment(self, monkeypatch):
+        monkeypatch.setenv("QUERY_TASKS", "true")
+        assert _make_client(_make_sdk()).query_tasks is True
+
+    def test_pending_tasks_are_polled_together(self):
+        sdk, polls = _task_sdk(["running", "complete"])
+        results = self._run(_make_client(sdk, query_tasks=True), ["EU", "US", "DE"])
+
+        sdk.run_inline_query.assert_not_called()
+        assert len(polls) == 2
+        assert sorted(polls[0]) == ["task-q-DE", "task-q-EU", "task-q-US"]
+        assert results["0,1"].data == {"rows": [{"task": "task-q-US"}]}
+
+    def test_failed_task_returns_none(self):
+        sdk, polls = _task_sdk(["error"])
+        results = self._run(_make_client(sdk, query_tasks=True), ["EU"])
+        assert results == {"0,0": None}
+
+    def test_task_missing_from_results_fails(self):
+        sdk, polls = _task_sdk(["running"])
+        sdk.query_task_multi_results.side_effect = lambda query_task_ids: (
+            polls.append(list(query_task_ids)) or {}
+        )
+        results = self._run(_make_client(sdk, query_tasks=True), ["EU"])
+        assert results == {"0,0": None}
+        assert len(polls) == looker_module.QUERY_TASK_MISSING_POLLS
+
+    def test_image_formats_run_inline(self):
+        sdk, polls = _task_sdk(["complete"])
+        sdk.run_inline_query.return_value = b"\x89PNG"
+        results = self._run(
+            _make_client(sdk, query_tasks=True), ["EU"], result_format="png"
+        )
+        sdk.create_query_task.assert_not_called()
+        assert results["0,0"].raw == b"\x89PNG"
+
+
+# ---------------------------------------------------------------------------
+# Render tasks
+# ---------------------------------------------------------------------------
+
+
+def _render_sdk(statuses):
+    """
+    Build an SDK that renders images with render tasks. ``statuses`` lists, per
+    poll round, the status reported for every pending task; the last repeats.
+    """
+    sdk, _ = _task_sdk(["complete"])
+    sdk.create_query_render_task.side_effect = (
+        lambda query_id, result_format, width, height: models.RenderTask(
+            id=f"render-{query_id}-{width}x{height}"
+        )
+    )
+    polls = []
+
+    def render_task(render_task_id, fields=None):
+        rounds = sum(1 for p in polls if p == render_task_id)
+        polls.append(render_task_id)
+        status = statuses[min(rounds, len(statuses) - 1)]
+        return models.RenderTask(
+            id=render_task_id, status=status, status_detail="render failed"
+        )
+
+    sdk.render_task.side_effect = render_task
+    sdk.render_task_results.side_effect = lambda render_task_id: (
+        f"PNG {render_task_id}".encode()
+    )
+    return sdk, polls
+
+
+class TestRenderTasks:
+    """Picture shapes are rendered with render tasks at the shape's size."""
+
+    def _run(self, client, shapes):
+        async def run_all():
+            return await asyncio.gather(
+                *(
+                    client.make_query(
+                        f"0,{i}",
+                        id="1",
+                        filter="orders.region",
+                        filter_value=region,
+                        result_format="png",
+                        image_width=width,
+                        image_height=height,
+                    )
+                    for i, (region, width, height) in enumerate(shapes)
+                )
+            )
+
+        with patch("looker_powerpoint.looker.QUERY_TASK_POLL_INTERVAL", 0.01):
+            results = asyncio.run(run_all())
+        merged = {}
+        for r in results:
+            merged.update(r)
+        return merged
+
+    def test_image_is_rendered_at_shape_size(self):
+        sdk, polls = _render_sdk(["rendering", "success"])
+        results = self._run(_make_client(sdk), [("EU", 640, 360)])
+        sdk.run_inline_query.assert_not_called()
+        sdk.create_query_render_task.assert_called_once_with(
+            query_id="q-EU", result_format="png", width=640, height=360
+        )
+        assert results["0,0"].raw == b"PNG render-q-EU-640x360"
+        assert len(polls) == 2
+
+    def test_pending_renders_are_polled_together(self):
+        sdk, polls = _render_sdk(["rendering", "success"])
+        # All three tasks are pending before the first poll round.
+        submitted = threading.Barrier(3, timeout=5)
+        create = sdk.create_query_render_task.side_effect
+
+        def create_query_render_task(**kwargs):
+            submitted.wait()
+            return create(**kwargs)
+
+        sdk.create_query_render_task.side_effect = create_query_render_task
+        results = self._run(
+            _make_client(sdk), [("EU", 640, 360), ("US", 640, 360), ("DE", 320, 180)]
+        )
+        assert sorted(polls[:3]) == [
+            "render-q-DE-320x180",
+            "render-q-EU-640x360",
+            "render-q-US-640x360",
+        ]
+        assert results["0,2"].raw == b"PNG render-q-DE-320x180"
+
+    def test_shapes_of_one_size_share_a_render(self):
+        sdk, polls = _render_sdk(["success"])
+        results = self._run(
+            _make_client(sdk), [("EU", 640, 360), ("EU", 640, 360), ("EU", 100, 50)]
+        )
+        assert sdk.create_query_render_task.call_count == 2
+        assert results["0,0"].raw == results["0,1"].raw
+
+    def test_failed_render_returns_none(self):
+        sdk, polls = _render_sdk(["failure"])
+        assert self._run(_make_client(sdk), [("EU", 640, 360)]) == {"0,0": None}
+
+    def test_images_without_size_run_inline(self):
+        sdk, polls = _render_sdk(["success"])
+        sdk.run_inline_query.return_value = b"\x89PNG"
+        results = self._run(_make_client(sdk), [("EU", None, None)])
+        sdk.create_query_render_task.assert_not_called()
+        assert results["0,0"].raw == b"\x89PNG"
+
+
+# ---------------------------------------------------------------------------
+# Concurrency and rate limits
+# ---------------------------------------------------------------------------
+
+
+class TestApiLimits:
+    """Every Looker API call goes through the run-wide semaphore and rate limiter."""
+
+    def test_limits_from_environment(self, monkeypatch):
+        monkeypatch.setenv("MAX_CONCURRENT_QUERIES", "3")
+        monkeypatch.setenv("REQUESTS_PER_SECOND", "2.5")
+        client = _make_client(_make_sdk())
+        assert client.max_concurrent == 3
+        assert client.rate_limiter.rate == 2.5
+
+    def test_max_concurrent_defaults_to_max_workers(self):
+        client = _make_client(_make_sdk(), max_workers=6)
+        assert client.max_concurrent == 6
+        assert client.rate_limiter.enabled is False
+
+    def test_semaphore_caps_calls_in_flight(self):
+        sdk = _make_sdk()
+        lock = threading.Lock()
+        state = {"running": 0, "peak": 0}
+        result = json.dumps({"metadata": {}, "rows": []})
+
+        def run_inline_query(**kwargs):
+            with lock:
+                state["running"] += 1
+                state["peak"] = max(state["peak"], state["running"])
+            threading.Event().wait(0.02)
+            with lock:
+                state["running"] -= 1
+            return result
+
+        sdk.run_inline_query.side_effect = run_inline_query
+        client = _make_client(sdk, max_workers=8, max_concurrent=2)
+
+        async def run_all():
+            await asyncio.gather(
+                *(
+                    client.make_query(
+                        f"0,{i}", id="1", filter="orders.region", filter_value=str(i)
+                    )
+                    for i in range(6)
+                )
+            )
+
+        asyncio.run(run_all())
+        client.close()
+        assert state["peak"] == 2
+
+    def test_api_waits_for_rate_limiter(self):
+        client = _make_client(_make_sdk(), requests_per_second=5)
+        with patch.object(
+            client.rate_limiter, "acquire_async", AsyncMock(return_value=0)
+        ) as acquire:
+            asyncio.run(client._api("look", "1"))
+        acquire.assert_awaited_once()
+
+    def test_download_image_is_rate_limited(self):
+        client = _make_client(_make_sdk(), requests_per_second=5)
+        response = MagicMock(content=b"\x89PNG")
+        with (
+            patch.object(client.rate_limiter, "acquire", return_value=0) as acquire,
+            patch.object(client.session, "get", return_value=response) as get,
+        ):
+            assert client.download_image("https://img/1.png") == b"\x89PNG"
+        acquire.assert_called_once()
+        assert get.call_args.args == ("https://img/1.png",)
+
+
+class TestConnectionPool:
+    """SDK calls and image downloads share one pooled session."""
+
+    def _sdk(self):
+        sdk = _make_sdk()
+        sdk.transport.session = requests.Session()
+        sdk.transport.session.headers["x-looker-appid"] = "looker-powerpoint"
+        sdk.transport.session.verify = False
+        return sdk
+
+    def test_sdk_session_is_shared_and_sized(self):
+        sdk = self._sdk()
+        client = _make_client(sdk, max_workers=6)
+        assert client.session is sdk.transport.session
+        adapter = client.session.get_adapter("https://cdn.example.com/a.png")
+        assert adapter._pool_maxsize == 6
+
+    def test_max_connections_per_host(self, monkeypatch):
+        assert (
+            _make_client(self._sdk(), max_connections_per_host=3)
+            .session.get_adapter("https://looker.example.com")
+            ._pool_maxsize
+            == 3
+        )
+        monkeypatch.setenv("MAX_CONNECTIONS_PER_HOST", "2")
+        assert _make_client(self._sdk()).max_connections_per_host == 2
+
+    def test_image_download_drops_looker_settings(self):
+        client = _make_client(self._sdk())
+        response = MagicMock(content=b"\x89PNG")
+        with patch.object(client.session, "get", return_value=response) as get:
+            client.download_image("https://img/1.png")
+        assert get.call_args.kwargs["verify"] is True
+        assert get.call_args.kwargs["headers"] == {"x-looker-appid": None}
+
+
+# ---------------------------------------------------------------------------
+# Timeouts
+# ---------------------------------------------------------------------------
+
+
+class TestQueryTimeout:
+    """A query attempt taking longer than --query-timeout is given up on."""
+
+    def test_slow_query_fails_its_shape(self):
+        sdk = _make_sdk()
+        release = threading.Event()
+
+        def slow_query(**kwargs):
+            release.wait(5)
+            return json.dumps({"metadata": {}, "rows": []})
+
+        sdk.run_inline_query.side_effect = slow_query
+        client = _make_client(sdk, query_timeout=0.05)
+        started = time.monotonic()
+        try:
+            assert asyncio.run(client.make_query("0,1", id="1")) == {"0,1": None}
+        finally:
+            release.set()
+        assert time.monotonic() - started < 2
+        # The HTTP request itself is limited too, freeing the worker thread.
+        assert sdk.run_inline_query.call_args.kwargs["transport_options"] == {
+            "timeout": 1
+        }
+
+    def test_waiting_for_a_slot_does_not_count(self):
+        sdk = _make_sdk()
+
+        def query(**kwargs):
+            time.sleep(0.1)
+            return json.dumps({"metadata": {}, "rows": []})
+
+        sdk.run_inline_query.side_effect = query
+        client = _make_client(sdk, max_concurrent=1, query_timeout=0.3)
+
+        async def run_all():
+            return await asyncio.gather(
+                *(
+                    client.make_query(
+                        f"0,{i}", id="1", filter="orders.region", filter_value=str(i)
+                    )
+                    for i in range(6)
+                )
+            )
+
+        results = asyncio.run(run_all())
+        assert all(r is not None for result in results for r in result.values())
+        assert sdk.run_inline_query.call_count == 6
+        assert client.retry_budget.used == 0
+        assert client.breaker.times_opened == 0
+
+    def test_requests_end_by_the_deadline(self):
+        sdk = _make_sdk()
+        client = _make_client(sdk, deadline=time.monotonic() + 5, query_timeout=30)
+        asyncio.run(client.make_query("0,1", id="1"))
+        assert sdk.run_inline_query.call_args.kwargs["transport_options"] == {
+            "timeout": 5
+        }
+        sdk.look.assert_called_once_with("1", transport_options={"timeout": 5})
+
+    def test_cancel_pending_stops_shared_executions(self):
+        sdk = _make_sdk()
+        release = threading.Event()
+        sdk.run_inline_query.side_effect = lambda **kwargs: release.wait(5)
+        client = _make_client(sdk)
+
+        async def run():
+            shape = asyncio.ensure_future(client.make_query("0,1", id="1"))
+            while not client._result_tasks:
+                await asyncio.sleep(0.01)
+            execution = next(iter(client._result_tasks.values()))
+            client.cancel_pending()
+            await asyncio.gather(shape, return_exceptions=True)
+            return execution
+
+        try:
+            execution = asyncio.run(run())
+        finally:
+            release.set()
+        assert execution.cancelled()
+        assert client._result_tasks == {}
+
+    def test_no_timeout_by_default(self):
+        sdk = _make_sdk()
+        client = _make_client(sdk)
+        assert client.query_timeout is None
+        assert asyncio.run(client.make_query("0,1", id="1"))["0,1"] is not None
+        assert "transport_options" not in sdk.run_inline_query.call_args.kwargs
+
+    def test_environment(self, monkeypatch):
+        monkeypatch.setenv("QUERY_TIMEOUT", "30")
+        assert _make_client(_make_sdk()).query_timeout == 30
+
+
+# ---------------------------------------------------------------------------
+# Retries
+# ---------------------------------------------------------------------------
+
+
+class TestRetries:
+    """Only retryable errors are retried, within the run-wide budget."""
+
+    OK = json.dumps({"metadata": {}, "rows": []})
+
+    def _run(self, client, count=1, retries=3):
+        async def run_all():
+            return await asyncio.gather(
+                *(
+                    client.make_query(
+                        f"0,{i}",
+                        id="1",
+                        filter="orders.region",
+                        filter_value=str(i),
+                        retries=retries,
+                    )
+                    for i in range(count)
+                )
+            )
+
+        # No jitter delay, so tests do not sleep.
+        with patch("looker_powerpoint.retry.random.uniform", return_value=0):
+            results = asyncio.run(run_all())
+        merged = {}
+        for r in results:
+            merged.update(r)
+        return merged
+
+    def test_transient_error_is_retried(self):
+        sdk = _make_sdk()
+        sdk.run_inline_query.side_effect = [
+            LookerAPIError("unavailable", status=503),
+            self.OK,
+        ]
+        client = _make_client(sdk)
+        assert self._run(client)["0,0"] is not None
+        assert sdk.run_inline_query.call_count == 2
+        assert client.retry_budget.used == 1
+
+    def test_fatal_error_is_not_retried(self):
+        sdk = _make_sdk()
+        sdk.run_inline_query.side_effect = LookerAPIError("bad query", status=400)
+        client = _make_client(sdk)
+        assert self._run(client) == {"0,0": None}
+        assert sdk.run_inline_query.call_count == 1
+
+    def test_retry_after_is_honoured(self, caplog):
+        sdk = _make_sdk()
+        sdk.run_inline_query.side_effect = [
+            LookerAPIError("slow down", status=429, retry_after=0.05),
+            self.OK,
+        ]
+        self._run(_make_client(sdk))
+        assert "in 0.05 seconds" in caplog.text
+
+    def test_budget_caps_retries_across_shapes(self):
+        sdk = _make_sdk()
+        sdk.run_inline_query.side_effect = LookerAPIError("down", status=503)
+        client = _make_client(sdk, retry_budget=2)
+        results = self._run(client, count=3, retries=5)
+        assert set(results.values()) == {None}
+        # Three first attempts plus the two retries the budget allows.
+        assert sdk.run_inline_query.call_count == 5
+
+    def test_budget_from_environment(self, monkeypatch):
+        monkeypatch.setenv("RETRY_BUDGET", "7")
+        assert _make_client(_make_sdk()).retry_budget.total == 7
+
+    def test_sdk_error_is_classified_by_recorded_status(self):
+        """Plain SDKErrors from the blocking SDK take the status of the response."""
+        sdk = _make_sdk()
+        calls = []
+
+        def run_inline_query(**kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                # What the requests response hook records for a failed call.
+                record_response(MagicMock(status_code=503, headers={}))
+                raise looker_sdk.error.SDKError("Service Unavailable")
+            return self.OK
+
+        sdk.run_inline_query.side_effect = run_inline_query
+        assert self._run(_make_client(sdk))["0,0"] is not None
+        assert len(calls) == 2
+
+
+class TestCircuitBreaker:
+    """Once Looker keeps failing, remaining shapes fail without calling it."""
+
+    def _run(self, client, count):
+        async def run_all():
+            results = {}
+            # One shape after the other, as the breaker sees them complete.
+            for i in range(count):
+                results.update(
+                    await client.make_query(
+                        f"0,{i}", id="1", filter="orders.region", filter_value=str(i)
+                    )
+                )
+            return results
+
+        return asyncio.run(run_all())
+
+    def test_outage_fails_remaining_shapes_fast(self):
+        sdk = _make_sdk()
+        sdk.run_inline_query.side_effect = LookerAPIError("down", status=503)
+        client = _make_client(sdk, circuit_breaker_error_rate=0.5)
+        results = self._run(client, 20)
+        assert set(results.values()) == {None}
+        # The successful Look fetch and four failed queries open the circuit.
+        assert sdk.run_inline_query.call_count == MIN_CALLS - 1
+        assert client.breaker.rejected == 20 - (MIN_CALLS - 1)
+
+    def test_fatal_errors_do_not_open_the_circuit(self):
+        sdk = _make_sdk()
+        sdk.run_inline_query.side_effect = LookerAPIError("bad query", status=400)
+        client = _make_client(sdk)
+        self._run(client, 10)
+        assert sdk.run_inline_query.call_count == 10
+        assert client.breaker.times_opened == 0
+
+    def test_timeouts_open_the_circuit(self):
+        sdk = _make_sdk()
+        sdk.run_inline_query.side_effect = lambda **kwargs: time.sleep(0.2)
+        client = _make_client(sdk, query_timeout=0.01)
+        self._run(client, MIN_CALLS)
+        assert client.breaker.times_opened == 1
+
+    def test_open_circuit_skips_look_fetches(self, caplog):
+        sdk = _make_sdk()
+        client = _make_client(sdk, circuit_breaker_cooldown=60)
+        for _ in range(MIN_CALLS):
+            client.breaker.record_failure()
+        assert self._run(client, 1) == {"0,0": None}
+        sdk.look.assert_not_called()
+        assert "circuit breaker is open" in caplog.text
+
+    def test_open_circuit_does_not_wait_for_rate_limit(self):
+        sdk = _make_sdk()
+        client = _make_client(sdk, requests_per_second=2, circuit_breaker_cooldown=60)
+        for _ in range(MIN_CALLS):
+            client.breaker.record_failure()
+
+        async def run_all():
+            return await asyncio.gather(
+                *(client._api("look", str(i)) for i in range(20)),
+                return_exceptions=True,
+            )
+
+        started = time.monotonic()
+        with patch.object(
+            client.rate_limiter,
+            "acquire_async",
+            wraps=client.rate_limiter.acquire_async,
+        ) as acquire:
+            results = asyncio.run(run_all())
+        assert time.monotonic() - started < 1
+        assert all(isinstance(r, CircuitOpenError) for r in results)
+        acquire.assert_not_called()
+        sdk.look.assert_not_called()
+
+    def test_disabled(self):
+        sdk = _make_sdk()
+        sdk.run_inline_query.side_effect = LookerAPIError("down", status=503)
+        client = _make_client(sdk, circuit_breaker_error_rate=0)
+        self._run(client, 10)
+        assert sdk.run_inline_query.call_count == 10
+
+    def test_environment(self, monkeypatch):
+        monkeypatch.setenv("CIRCUIT_BREAKER_ERROR_RATE", "0.8")
+        monkeypatch.setenv("CIRCUIT_BREAKER_COOLDOWN", "5")
+        breaker = _make_client(_make_sdk()).breaker
+        assert (breaker.error_rate, breaker.cooldown) == (0.8, 5)
+
+
+# ---------------------------------------------------------------------------
+# Field projection pushdown
+# ---------------------------------------------------------------------------
+
+
+def _projection_sdk(result_fields=None):
+    """
+    Build an SDK whose explore has measures ``orders.revenue`` and
+    ``orders.cost`` and whose results describe ``result_fields``.
+    """
+    look = _make_look(fields=["orders.date", "orders.revenue", "orders.cost"])
+    sdk = _make_sdk(look=look)
+    sdk.lookml_model_explore.return_value = models.LookmlModelExplore(
+        fields=models.LookmlModelExploreFieldset(
+            measures=[
+                models.LookmlModelExploreField(name="orders.revenue"),
+                models.LookmlModelExploreField(name="orders.cost"),
+            ]
+        )
+    )
+
+    def run_inline_query(body, **kwargs):
+        names = result_fields or body.fields
+        return json.dumps(
+            {
+                "metadata": {
+                    "fields": {
+                        "measures": [
+                            {"name": n, "field_group_variant": n.split(".")[-1]}
+                            for n in names
+                        ]
+                    }
+                },
+                "rows": [],
+            }
+        )
+
+    sdk.run_inline_query.side_effect = run_inline_query
+    return sdk
+
+
+class TestFieldProjection:
+    """Measures no shape reads are dropped from the query."""
+
+    def test_unread_measures_are_dropped(self):
+        sdk = _projection_sdk()
+        client = _make_client(sdk)
+        result = asyncio.run(
+            client.make_query(
+                "0,1", id="1", label="cost", result_needs=ResultNeeds(labels=["cost"])
+            )
+        )
+        assert result["0,1"] is not None
+        body = sdk.run_inline_query.call_args.kwargs["body"]
+        assert body.fields == ["orders.date", "orders.cost"]
+
+    def test_shapes_sharing_needs_share_one_query(self):
+        sdk = _projection_sdk()
+        client = _make_client(sdk)
+        needs = ResultNeeds(labels=["cost"], max_column=1)
+
+        async def run_all():
+            await asyncio.gather(
+                client.make_query("0,1", id="1", label="cost", result_needs=needs),
+                client.make_query("0,2", id="1", column=1, result_needs=needs),
+            )
+
+        asyncio.run(run_all())
+        assert sdk.run_inline_query.call_count == 1
+        assert sdk.lookml_model_explore.call_count == 1
+
+    def test_missing_label_falls_back_to_full_query(self):
+        # The narrowed result does not provide the label, e.g. because the
+        # column is labelled differently than the field name suggests.
+        sdk = _projection_sdk(result_fields=["orders.gross"])
+        client = _make_client(sdk)
+        asyncio.run(
+            client.make_query(
+                "0,1", id="1", label="cost", result_needs=ResultNeeds(labels=["cost"])
+            )
+        )
+        bodies = [c.kwargs["body"] for c in sdk.run_inline_query.call_args_list]
+        assert [b.fields for b in bodies] == [
+            ["orders.date", "orders.cost"],
+            ["orders.date", "orders.revenue", "orders.cost"],
+        ]
+
+    def test_explore_lookup_failure_runs_full_query(self):
+        sdk = _projection_sdk()
+        sdk.lookml_model_explore.side_effect = Exception("no access")
+        client = _make_client(sdk)
+        asyncio.run(
+            client.make_query("0,1", id="1", result_needs=ResultNeeds(labels=["cost"]))
+        )
+        body = sdk.run_inline_query.call_args.kwargs["body"]
+        assert len(body.fields) == 3
+
+    def test_without_needs_the_query_is_unchanged(self):
+        sdk = _projection_sdk()
+        asyncio.run(_make_client(sdk).make_query("0,1", id="1"))
+        sdk.lookml_model_explore.assert_not_called()
+        assert sdk.run_inline_query.call_args.kwargs["body"].limit == "500"
+
+    def test_row_limit_is_lowered(self):
+        sdk = _projection_sdk()
+        client = _make_client(sdk)
+        needs = ResultNeeds(all_columns=True, rows=4)
+        asyncio.run(client.make_query("0,1", id="1", result_needs=needs))
+        body = sdk.run_inline_query.call_args.kwargs["body"]
+        assert (body.limit, len(body.fields)) == ("4", 3)
+        # The shared Look keeps its own limit for later queries.
+        assert client._looks["1"].query.limit == "500"
+
+    def test_row_limit_skips_images(self):
+        sdk = _projection_sdk()
+        asyncio.run(
+            _make_client(sdk).make_query(
+                "0,1", id="1", result_format="png", result_needs=ResultNeeds(rows=1)
+            )
+        )
+        assert sdk.run_inline_query.call_args.kwargs["body"].limit == "500"
+
+
+class TestPlanQuery:
+    """plan_query builds a shape's query without running it."""
+
+    def test_nothing_is_run(self):
+        sdk = _projection_sdk()
+        client = _make_client(sdk)
+        needs = ResultNeeds(labels=["cost"], rows=1)
+        entry = asyncio.run(
+            client.plan_query(
+                "0,1", "US", id="1", filter="orders.region", result_needs=needs
+            )
+        )
+        sdk.run_inline_query.assert_not_called()
+        sdk.create_query.assert_not_called()
+        assert entry["fields"] == ["orders.date", "orders.cost"]
+        assert entry["limit"] == "1"
+        assert entry["cached"] is False
+        assert entry["estimated_bytes"] == 1 * 2 * 64
+        assert client.queries_requested == 0
+
+    def test_fingerprint_matches_executed_query(self, tmp_path):
+        sdk = _make_sdk()
+        cache = QueryCache(str(tmp_path))
+        client = _make_client(sdk, cache=cache)
+        before = asyncio.run(client.plan_query("0,1", id="1"))
+        asyncio.run(client.make_query("0,1", id="1"))
+        after = asyncio.run(client.plan_query("0,1", id="1"))
+        assert before["fingerprint"] == after["fingerprint"]
+        assert (before["cached"], after["cached"]) == (False, True)
+        assert after["estimated_bytes"] == len(sdk.run_query.return_value)
+
+    def test_unknown_look_is_an_error(self):
+        sdk = _make_sdk()
+        sdk.look.side_effect = Exception("404")
+        entry = asyncio.run(_make_client(sdk).plan_query("0,1", id="9"))
+        assert entry["error"]
+        assert "fingerprint" not in entry
+
+
+# ---------------------------------------------------------------------------
+# CSV results
+# ---------------------------------------------------------------------------
+
+
+def _csv_sdk(header="Orders Date,Orders Revenue"):
+    """Build an SDK answering csv queries with ``header`` and one row."""
+    sdk = _make_sdk()
+    sdk.lookml_model_explore.return_value = models.LookmlModelExplore(
+        fields=models.LookmlModelExploreFieldset(
+            dimensions=[
+                models.LookmlModelExploreField(
+                    name="orders.date", label="Orders Date", field_group_variant="Date"
+                )
+            ],
+            measures=[
+                models.LookmlModelExploreField(
+                    name="orders.revenue", label="Orders Revenue", is_numeric=True
+                )
+            ],
+        )
+    )
+
+    def run_inline_query(result_format, body, **kwargs):
+        if result_format == "csv":
+            return f"{header}\n2024-01-01,100\n"
+        return json.dumps({"metadata": {"fields": {}}, "rows": []})
+
+    sdk.run_inline_query.side_effect = run_inline_query
+    return sdk
+
+
+class TestCsvResults:
+    """json_bi queries run as csv when CSV results are enabled."""
+
+    def test_json_bi_query_runs_as_csv(self):
+        sdk = _csv_sdk()
+        client = _make_client(sdk, csv_results=True)
+        result = asyncio.run(client.make_query("0,1", id="1"))["0,1"]
+        assert sdk.run_inline_query.call_args.kwargs["result_format"] == "csv"
+        assert result.result_format == "csv"
+        assert [f["name"] for f in result.fields] == ["orders.date", "orders.revenue"]
+
+    def test_disabled_by_default(self):
+        sdk = _csv_sdk()
+        asyncio.run(_make_client(sdk).make_query("0,1", id="1"))
+        assert sdk.run_inline_query.call_args.kwargs["result_format"] == "json_bi"
+        sdk.lookml_model_explore.assert_not_called()
+
+    def test_enabled_from_environment(self, monkeypatch):
+        monkeypatch.setenv("CSV_RESULTS", "true")
+        assert _make_client(_csv_sdk()).csv_results
+
+    def test_formatted_queries_stay_json_bi(self):
+        sdk = _csv_sdk()
+        client = _make_client(sdk, csv_results=True)
+        asyncio.run(client.make_query("0,1", id="1", apply_formatting=True))
+        assert sdk.run_inline_query.call_args.kwargs["result_format"] == "json_bi"
+
+    def test_header_mismatch_falls_back_to_json_bi(self):
+        sdk = _csv_sdk(header="Revenue,Date")
+        client = _make_client(sdk, csv_results=True)
+        result = asyncio.run(client.make_query("0,1", id="1"))["0,1"]
+        formats = [
+            c.kwargs["result_format"] for c in sdk.run_inline_query.call_args_list
+        ]
+        assert formats == ["csv", "json_bi"]
+        assert result.fields is None
+        assert not client.csv_results
+
+
+# ---------------------------------------------------------------------------
+# Async transport routing
+# ---------------------------------------------------------------------------
+
+
+class TestAsyncTransportRouting:
+    """LookerClient._api prefers the async transport when one is configured."""
+
+    def test_transport_disabled_by_default(self):
+        client = _make_client(_make_sdk())
+        assert client.transport is None
+
+    def test_api_uses_transport_method(self):
+        sdk = _make_sdk()
+        client = _make_client(sdk)
+        client.transport = MagicMock(spec=["look"])
+        client.transport.look = AsyncMock(return_value="from transport")
+        assert asyncio.run(client._api("look", "1")) == "from transport"
+        sdk.look.assert_not_called()
+
+    def test_api_falls_back_to_sdk_for_unsupported_methods(self):
+        sdk = _make_sdk()
+        sdk.dashboard.return_value = "from sdk"
+        client = _make_client(sdk)
+        client.transport = MagicMock(spec=["look"])
+        assert asyncio.run(client._api("dashboard", "7")) == "from sdk"
+
+    def test_transport_implements_every_method_used(self):
+        """With the transport enabled the blocking SDK makes no API calls."""
+        source = inspect.getsource(looker_module)
+        methods = set(re.findall(r'_api\(\s*"(\w+)"', source))
+        assert {"look", "dashboard", "lookml_model_explore"} <= methods
+        missing = [m for m in methods if not hasattr(AsyncLookerTransport, m)]
+        assert missing == []
@@ -0,0 +1,74 @@
+"""Tests for query plans: payload estimates and the deck summary."""
+
+from looker_powerpoint.plan import (
+    CELL_BYTES,
+    DEFAULT_ROW_LIMIT,
+    estimate_payload_bytes,
+    summarize,
+)
+
+
+def _entry(shape_id, fingerprint, id="1", cached=False, estimated_bytes=100, **kw):
+    return {
+        "shape_id": shape_id,
+        "id_type": "look",
+        "id": id,
+        "fingerprint": fingerprint,
+        "cached": cached,
+        "estimated_bytes": estimated_bytes,
+        **kw,
+    }
+
+
+class TestEstimatePayloadBytes:
+    def test_rows_times_fields(self):
+        assert estimate_payload_bytes("json_bi", ["a", "b"], "10") == (
+            10 * 2 * CELL_BYTES["json_bi"]
+        )
+
+    def test_missing_or_unlimited_limit_uses_default(self):
+        for limit in (None, "-1", "x"):
+            assert estimate_payload_bytes("csv", ["a"], limit) == (
+                DEFAULT_ROW_LIMIT * CELL_BYTES["csv"]
+            )
+
+    def test_images_are_unknown(self):
+        assert estimate_payload_bytes("png", ["a"], "10") is None
+
+
+class TestSummarize:
+    def test_duplicates_and_cache_hits(self):
+        report = summarize(
+            [
+                _entry("0,1", "f1"),
+                _entry("0,2", "f1"),
+                _entry("1,1", "f2", id="2", cached=True, estimated_bytes=7),
+                _entry("1,2", "f3", id="2", estimated_bytes=None),
+            ]
+        )
+        assert report["looks"] == ["1", "2"]
+        assert (report["queries_requested"], report["distinct_queries"]) == (4, 3)
+        assert report["dedup_ratio"] == 1.33
+        assert report["expected_cache_hits"] == 1
+        assert report["queries_to_run"] == 2
+        # Duplicates are transferred once; images have no estimate.
+        assert report["estimated_bytes"] == 107
+        assert len(report["shapes"]) == 4
+
+    def test_errors_and_dashboards(self):
+        report = summarize(
+            [
+                {"shape_id": "0,1", "id_type": "look", "id": "9", "error": "x"},
+                _entry("0,2", "f1", id="7", id_type="dashboard"),
+            ]
+        )
+        assert report["errors"] == 1
+        assert report["looks"] == ["9"]
+        assert report["dashboards"] == ["7"]
+        assert report["queries_requested"] == 1
+        assert report["dedup_ratio"] == 1.0
+
+    def test_empty_deck(self):
+        report = summarize([])
+        assert report["distinct_queries"] == 0
+        assert report["dedup_ratio"] == 0.0
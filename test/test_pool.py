@@ -0,0 +1,90 @@
+"""
+Tests for the shared connection pool.
+
+Requests go to a local keep-alive HTTP server (``http.server`` in a background
+thread) that records the client connections it accepted and the number of
+requests it was serving at once.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from looker_powerpoint.pool import configure_session
+
+
+class _ImageHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        state = self.server.state
+        with state["lock"]:
+            state["connections"].add(self.client_address)
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(state["delay"])
+        with state["lock"]:
+            state["active"] -= 1
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", "4")
+        self.end_headers()
+        self.wfile.write(b"\x89PNG")
+
+
+@pytest.fixture
+def image_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ImageHandler)
+    server.state = {
+        "lock": threading.Lock(),
+        "connections": set(),
+        "active": 0,
+        "peak": 0,
+        "delay": 0,
+    }
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+    )
+    thread.start()
+    host, port = server.server_address
+    server.url = f"http://{host}:{port}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TestConfigureSession:
+    def test_sequential_downloads_reuse_one_connection(self, image_server):
+        session = configure_session(requests.Session(), max_per_host=4)
+        for i in range(40):
+            assert session.get(f"{image_server.url}/{i}.png").content == b"\x89PNG"
+        session.close()
+        assert len(image_server.state["connections"]) == 1
+
+    def test_connections_are_capped_per_host(self, image_server):
+        image_server.state["delay"] = 0.02
+        session = configure_session(requests.Session(), max_per_host=2)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            responses = list(
+                pool.map(
+                    lambda i: session.get(f"{image_server.url}/{i}.png"), range(16)
+                )
+            )
+        session.close()
+        assert all(r.ok for r in responses)
+        assert image_server.state["peak"] <= 2
+        assert len(image_server.state["connections"]) <= 2
+
+    def test_returns_the_session(self):
+        session = requests.Session()
+        assert configure_session(session, max_per_host=1) is session
+        adapter = session.get_adapter("https://cdn.example.com/a.png")
+        assert adapter._pool_maxsize == 1
+        assert adapter._pool_block is True
@@ -0,0 +1,174 @@
+"""Tests for query pushdown: what shapes read and how queries are narrowed."""
+
+from looker_sdk import models40 as models
+
+from looker_powerpoint.models import LookerShape
+from looker_powerpoint.pushdown import (
+    ResultNeeds,
+    project_fields,
+    result_labels,
+    row_limit,
+    shape_result_needs,
+)
+
+MEASURES = {"orders.revenue", "orders.cost", "orders.count"}
+
+
+def _shape(shape_type="TEXT_BOX", **integration):
+    return LookerShape.model_validate(
+        {
+            "shape_id": "0,1",
+            "shape_type": shape_type,
+            "slide_number": 0,
+            "shape_width": 100,
+            "shape_height": 50,
+            "integration": {"id": "1", **integration},
+        }
+    )
+
+
+def _query(**kwargs):
+    defaults = {
+        "model": "ecommerce",
+        "view": "orders",
+        "fields": [
+            "orders.date",
+            "orders.revenue",
+            "orders.cost",
+            "orders.count",
+        ],
+    }
+    return models.Query(**{**defaults, **kwargs})
+
+
+class TestShapeResultNeeds:
+    def test_label(self):
+        needs = shape_result_needs(_shape(label="revenue"))
+        assert needs.labels == {"revenue"}
+        assert not needs.everything
+
+    def test_column(self):
+        assert shape_result_needs(_shape(column=2)).max_column == 2
+
+    def test_label_wins_over_column(self):
+        needs = shape_result_needs(_shape(label="revenue", column=2))
+        assert (needs.labels, needs.max_column) == ({"revenue"}, None)
+
+    def test_whole_result_shapes(self):
+        assert shape_result_needs(_shape("TABLE", column=1)).everything
+        assert shape_result_needs(_shape("CHART")).everything
+        assert shape_result_needs(_shape(label="revenue", meta=True)).everything
+        assert shape_result_needs(_shape()).everything
+
+    def test_jinja_text_reads_everything(self):
+        needs = shape_result_needs(_shape(label="revenue"), "Total: {{ headers }}")
+        assert needs.everything
+
+    def test_picture_url_from_label(self):
+        assert shape_result_needs(_shape("PICTURE", label="image_url")).labels == {
+            "image_url"
+        }
+        assert shape_result_needs(
+            _shape("PICTURE", label="x", result_format="png")
+        ).everything
+
+    def test_merge(self):
+        merged = ResultNeeds(labels=["a"], max_column=1).merge(
+            ResultNeeds(labels=["b"], max_column=3)
+        )
+        assert (merged.labels, merged.max_column) == ({"a", "b"}, 3)
+        assert merged.merge(ResultNeeds.all()).everything
+
+
+class TestShapeRowNeeds:
+    def test_text_reads_up_to_its_row(self):
+        assert shape_result_needs(_shape(label="revenue")).rows == 1
+        assert shape_result_needs(_shape(column=1, row=4)).rows == 5
+
+    def test_negative_row_reads_every_row(self):
+        assert shape_result_needs(_shape(column=1, row=-1)).rows is None
+
+    def test_table_reads_rows_below_header(self):
+        needs = shape_result_needs(_shape("TABLE"), table_rows=6)
+        assert (needs.all_columns, needs.rows) == (True, 5)
+        assert not needs.everything
+
+    def test_merge_takes_most_rows(self):
+        table = ResultNeeds(all_columns=True, rows=5)
+        merged = table.merge(ResultNeeds(labels=["a"], rows=12))
+        assert (merged.all_columns, merged.rows) == (True, 12)
+        assert merged.merge(ResultNeeds.all()).rows is None
+
+    def test_as_dict(self):
+        assert ResultNeeds(labels=["b", "a"], rows=2).as_dict() == {
+            "columns": {"labels": ["a", "b"], "max_column": None},
+            "rows": 2,
+        }
+        assert ResultNeeds.all().as_dict() == {"columns": "all", "rows": None}
+
+
+class TestRowLimit:
+    def test_lowers_limit(self):
+        assert row_limit(_query(limit="500"), ResultNeeds(rows=3)) == "3"
+
+    def test_missing_or_unlimited_limit_is_set(self):
+        assert row_limit(_query(), ResultNeeds(rows=3)) == "3"
+        assert row_limit(_query(limit="-1"), ResultNeeds(rows=3)) == "3"
+
+    def test_never_raises_limit(self):
+        assert row_limit(_query(limit="2"), ResultNeeds(rows=3)) is None
+
+    def test_unsafe_queries_are_not_limited(self):
+        needs = ResultNeeds(rows=1)
+        assert row_limit(_query(pivots=["orders.date"]), needs) is None
+        assert row_limit(_query(dynamic_fields="[{}]"), needs) is None
+        assert row_limit(_query(subtotals=["orders.date"]), needs) is None
+        assert row_limit(_query(fill_fields=["orders.date"]), needs) is None
+        assert row_limit(_query(), ResultNeeds.all()) is None
+
+
+class TestProjectFields:
+    def test_keeps_dimensions_and_labelled_measure(self):
+        fields = project_fields(_query(), ResultNeeds(labels=["cost"]), MEASURES)
+        assert fields == ["orders.date", "orders.cost"]
+
+    def test_column_keeps_measure_prefix(self):
+        fields = project_fields(_query(), ResultNeeds(max_column=2), MEASURES)
+        assert fields == ["orders.date", "orders.revenue", "orders.cost"]
+
+    def test_dimension_column_drops_all_measures(self):
+        fields = project_fields(_query(), ResultNeeds(max_column=0), MEASURES)
+        assert fields == ["orders.date"]
+
+    def test_sorted_measures_are_kept(self):
+        query = _query(sorts=["orders.count desc 0"])
+        fields = project_fields(query, ResultNeeds(labels=["revenue"]), MEASURES)
+        assert fields == ["orders.date", "orders.revenue", "orders.count"]
+
+    def test_unknown_label_disables_projection(self):
+        assert (
+            project_fields(_query(), ResultNeeds(labels=["margin"]), MEASURES) is None
+        )
+
+    def test_unsafe_queries_are_not_narrowed(self):
+        needs = ResultNeeds(labels=["cost"])
+        assert project_fields(_query(pivots=["orders.date"]), needs, MEASURES) is None
+        assert project_fields(_query(dynamic_fields="[{}]"), needs, MEASURES) is None
+        assert project_fields(_query(), ResultNeeds.all(), MEASURES) is None
+
+    def test_no_change_returns_none(self):
+        assert project_fields(_query(), ResultNeeds(max_column=3), MEASURES) is None
+
+
+def test_result_labels():
+    data = {
+        "metadata": {
+            "fields": {
+                "dimensions": [{"name": "orders.date", "field_group_variant": "Date"}],
+                "measures": [
+                    {"name": "orders.revenue", "field_group_variant": "Total Revenue"}
+                ],
+            }
+        }
+    }
+    assert result_labels(data["metadata"]["fields"]) == {"date", "total_revenue"}
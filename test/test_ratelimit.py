@@ -0,0 +1,50 @@
+"""Tests for the token-bucket request rate limiter."""
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from looker_powerpoint.ratelimit import TokenBucket
+
+
+def _at(timestamp):
+    """Patch the limiter's clock to *timestamp*."""
+    return patch("looker_powerpoint.ratelimit.time.monotonic", return_value=timestamp)
+
+
+class TestTokenBucket:
+    def test_disabled_never_waits(self):
+        bucket = TokenBucket(0)
+        assert bucket.enabled is False
+        assert [bucket.reserve() for _ in range(100)] == [0.0] * 100
+
+    def test_burst_is_free_then_requests_are_spaced(self):
+        with _at(100.0):
+            bucket = TokenBucket(rate=2, burst=2)
+            delays = [bucket.reserve() for _ in range(4)]
+        assert delays == [0.0, 0.0, 0.5, 1.0]
+
+    def test_tokens_refill_over_time(self):
+        with _at(100.0):
+            bucket = TokenBucket(rate=2, burst=2)
+            bucket.reserve()
+            bucket.reserve()
+        with _at(101.0):
+            assert bucket.reserve() == 0.0
+
+    def test_refill_is_capped_at_burst(self):
+        with _at(100.0):
+            bucket = TokenBucket(rate=1, burst=1)
+        with _at(1000.0):
+            assert bucket.reserve() == 0.0
+            assert bucket.reserve() == pytest.approx(1.0)
+
+    def test_acquire_async_sleeps_for_reserved_delay(self):
+        bucket = TokenBucket(rate=1, burst=1)
+        with (
+            patch.object(bucket, "reserve", return_value=0.25),
+            patch("looker_powerpoint.ratelimit.asyncio.sleep") as sleep,
+        ):
+            assert asyncio.run(bucket.acquire_async()) == 0.25
+        sleep.assert_called_once_with(0.25)
@@ -0,0 +1,115 @@
+"""Tests for the retry policy: error classification, backoff and the retry budget."""
+
+import datetime
+import email.utils
+from unittest.mock import MagicMock, patch
+
+import looker_sdk
+import pytest
+import requests
+
+from looker_powerpoint import retry as retry_module
+from looker_powerpoint.retry import (
+    LookerAPIError,
+    RetryBudget,
+    is_retryable,
+    parse_retry_after,
+    wait_retry_after,
+)
+
+
+def _retry_state(error, attempt=1):
+    state = MagicMock(attempt_number=attempt)
+    state.outcome.exception.return_value = error
+    return state
+
+
+class TestIsRetryable:
+    @pytest.mark.parametrize("status", [429, 500, 502, 503, 504])
+    def test_transient_statuses(self, status):
+        assert is_retryable(LookerAPIError("x", status=status)) is True
+
+    @pytest.mark.parametrize("status", [400, 401, 403, 404, 422])
+    def test_client_errors_are_fatal(self, status):
+        assert is_retryable(LookerAPIError("x", status=status)) is False
+
+    def test_no_response_is_retryable(self):
+        assert is_retryable(LookerAPIError("connection reset")) is True
+
+    def test_plain_sdk_error_is_fatal(self):
+        assert is_retryable(looker_sdk.error.SDKError("query task error")) is False
+
+    def test_network_errors_are_retryable(self):
+        assert is_retryable(requests.exceptions.ConnectionError()) is True
+        assert is_retryable(TimeoutError()) is True
+
+    def test_other_exceptions_are_fatal(self):
+        assert is_retryable(ValueError("bad data")) is False
+
+
+class TestParseRetryAfter:
+    def test_seconds(self):
+        assert parse_retry_after("7") == 7.0
+
+    def test_http_date(self):
+        when = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
+            seconds=30
+        )
+        value = email.utils.format_datetime(when, usegmt=True)
+        assert 25 <= parse_retry_after(value) <= 30
+
+    def test_missing_or_invalid(self):
+        assert parse_retry_after(None) is None
+        assert parse_retry_after("soon") is None
+
+
+class TestResponseHook:
+    def test_sdk_error_gets_status_of_last_response(self):
+        response = MagicMock(status_code=429, headers={"Retry-After": "3"})
+        retry_module.record_response(response)
+        error = LookerAPIError.from_sdk_error(
+            looker_sdk.error.SDKError("Too many requests")
+        )
+        assert isinstance(error, looker_sdk.error.SDKError)
+        assert (error.message, error.status, error.retry_after) == (
+            "Too many requests",
+            429,
+            3.0,
+        )
+
+    def test_reset_forgets_status(self):
+        retry_module.record_response(MagicMock(status_code=503, headers={}))
+        retry_module.reset_last_response()
+        error = LookerAPIError.from_sdk_error(looker_sdk.error.SDKError("boom"))
+        assert error.status is None
+
+
+class TestWaitRetryAfter:
+    def test_honours_retry_after(self):
+        wait = wait_retry_after()
+        assert wait(_retry_state(LookerAPIError("x", status=429, retry_after=12))) == 12
+
+    def test_retry_after_is_capped(self):
+        wait = wait_retry_after()
+        error = LookerAPIError("x", status=503, retry_after=10_000)
+        assert wait(_retry_state(error)) == retry_module.MAX_RETRY_AFTER
+
+    def test_full_jitter_exponential_backoff(self):
+        wait = wait_retry_after(initial=1, maximum=30)
+        error = LookerAPIError("x", status=503)
+        with patch(
+            "looker_powerpoint.retry.random.uniform", side_effect=lambda a, b: b
+        ):
+            delays = [wait(_retry_state(error, attempt)) for attempt in range(1, 8)]
+        assert delays == [1, 2, 4, 8, 16, 30, 30]
+
+
+class TestRetryBudget:
+    def test_allows_total_retries_then_stops(self):
+        budget = RetryBudget(2)
+        assert [budget(None) for _ in range(4)] == [False, False, True, True]
+        assert budget.used == 2
+        assert budget.remaining == 0
+
+    def test_zero_budget_never_retries(self):
+        assert RetryBudget(0)(None) is True
@@ -0,0 +1,73 @@
+"""Tests for TokenCache, the access token store shared across runs."""
+
+import json
+import os
+import stat
+from unittest.mock import patch
+
+import pytest
+
+from looker_powerpoint.tokens import REUSE_MARGIN, TOKEN_FILE_NAME, TokenCache
+
+URL = "https://looker.example.com"
+
+
+def _at(now):
+    return patch("looker_powerpoint.tokens.time.time", return_value=now)
+
+
+class TestTokenCache:
+    def test_round_trip(self, tmp_path):
+        cache = TokenCache(str(tmp_path))
+        with _at(1000):
+            cache.set(URL, "client", "token-1", 3600)
+        with _at(1600):
+            assert cache.get(URL, "client") == ("token-1", 3000)
+        assert cache.get(URL, "other") is None
+        assert cache.get("https://other.example.com", "client") is None
+
+    def test_token_near_expiry_is_not_reused(self, tmp_path):
+        cache = TokenCache(str(tmp_path))
+        with _at(1000):
+            cache.set(URL, "client", "token-1", 3600)
+        with _at(1000 + 3600 - REUSE_MARGIN):
+            assert cache.get(URL, "client") is None
+
+    def test_forget(self, tmp_path):
+        cache = TokenCache(str(tmp_path))
+        cache.set(URL, "client", "token-1", 3600)
+        cache.forget(URL, "client")
+        assert cache.get(URL, "client") is None
+
+    def test_expired_entries_are_dropped(self, tmp_path):
+        cache = TokenCache(str(tmp_path))
+        with _at(1000):
+            cache.set(URL, "a", "token-a", 10)
+        with _at(2000):
+            cache.set(URL, "b", "token-b", 3600)
+        with open(tmp_path / TOKEN_FILE_NAME) as f:
+            assert len(json.load(f)) == 1
+
+    def test_file_does_not_reveal_credentials(self, tmp_path):
+        TokenCache(str(tmp_path)).set(URL, "client-id", "token-1", 3600)
+        content = (tmp_path / TOKEN_FILE_NAME).read_text()
+        assert "client-id" not in content and URL not in content
+
+    def test_unreadable_file_is_ignored(self, tmp_path):
+        (tmp_path / TOKEN_FILE_NAME).write_text("not json")
+        os.chmod(tmp_path / TOKEN_FILE_NAME, 0o600)
+        assert TokenCache(str(tmp_path)).get(URL, "client") is None
+
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX file permissions")
+class TestTokenFilePermissions:
+    def test_file_is_private(self, tmp_path):
+        TokenCache(str(tmp_path / "cache")).set(URL, "client", "token-1", 3600)
+        mode = os.stat(tmp_path / "cache" / TOKEN_FILE_NAME).st_mode
+        assert stat.S_IMODE(mode) == 0o600
+
+    def test_file_readable_by_others_is_ignored(self, tmp_path):
+        cache = TokenCache(str(tmp_path))
+        cache.set(URL, "client", "token-1", 3600)
+        os.chmod(tmp_path / TOKEN_FILE_NAME, 0o644)
+        assert cache.get(URL, "client") is None
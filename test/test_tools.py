@@ -10,6 +10,7 @@ Covers:
 import io
 import os
 import tempfile
+from unittest.mock import patch
 
 import pandas as pd
 import pytest
@@ -20,6 +21,7 @@ from pptx.util import Inches, Pt
 from looker_powerpoint.tools.find_alt_text import (
     extract_alt_text,
     get_presentation_objects_with_descriptions,
+    iter_slide_descriptions,
 )
 from looker_powerpoint.tools.pptx_text_handler import (
     colorize_positive,
@@ -233,6 +235,39 @@ class TestGetPresentationObjectsWithDescriptions:
             os.unlink(path)
 
 
+class TestIterSlideDescriptions:
+    """Tests for iter_slide_descriptions()."""
+
+    def test_yields_one_list_per_slide(self):
+        prs = _pptx_with_alt_text("id: 42")
+        prs.slides.add_slide(prs.slide_layouts[6])
+        slides = list(iter_slide_descriptions(prs))
+        assert [len(s) for s in slides] == [1, 0]
+        assert slides[0][0]["integration"] == {"id": 42}
+        assert slides[0][0]["slide_number"] == 0
+
+    def test_later_slides_are_read_on_demand(self):
+        prs = _pptx_with_alt_text("id: 42")
+        prs.slides.add_slide(prs.slide_layouts[6]).shapes.add_textbox(
+            Inches(1), Inches(1), Inches(1), Inches(1)
+        )
+        with patch(
+            "looker_powerpoint.tools.find_alt_text.extract_alt_text",
+            side_effect=extract_alt_text,
+        ) as extract:
+            slides = iter_slide_descriptions(prs)
+            next(slides)
+            assert extract.call_count == 1
+            next(slides)
+            assert extract.call_count == 2
+
+    def test_matches_get_presentation_objects(self):
+        prs = Presentation(EXISTING_TABLE_PPTX)
+        assert [
+            d for slide in iter_slide_descriptions(prs) for d in slide
+        ] == get_presentation_objects_with_descriptions(EXISTING_TABLE_PPTX)
+
+
 # ===========================================================================
 # Tests – pptx_text_handler.py  (emoji & sanitization)
 # ===========================================================================
@@ -0,0 +1,319 @@
+"""
+Tests for the optional asyncio Looker transport.
+
+Requests go to a local stand-in Looker server (``http.server`` in a background
+thread) that implements just enough of the API for the transport: login, looks,
+dashboards, explores, inline queries, queries run by id, query tasks and render
+tasks.
+"""
+
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import looker_sdk
+import pytest
+from looker_sdk import models40 as models
+
+from looker_powerpoint import transport as transport_module
+from looker_powerpoint.retry import LookerAPIError
+
+pytest.importorskip("httpx")
+
+
+# ---------------------------------------------------------------------------
+# Stand-in Looker server
+# ---------------------------------------------------------------------------
+
+
+LOOK = {
+    "id": "1",
+    "title": "Revenue",
+    "query": {
+        "model": "ecommerce",
+        "view": "orders",
+        "fields": ["orders.date", "orders.revenue"],
+        "filters": {"orders.region": "EU"},
+        "limit": "500",
+    },
+}
+
+
+class _LookerHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, payload, content_type="application/json", headers=None):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorised(self):
+        state = self.server.state
+        if self.headers.get("Authorization") != f"Bearer {state['token']}":
+            self._send(401, {"message": "Requires authentication."})
+            return False
+        return True
+
+    def do_POST(self):
+        state = self.server.state
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if url.path == "/api/4.0/login":
+            state["logins"] += 1
+            state["token"] = f"token-{state['logins']}"
+            self._send(200, {"access_token": state["token"], "expires_in": 3600})
+            return
+        if not self._authorised():
+            return
+        if url.path.startswith("/api/4.0/queries/run/"):
+            state["queries"].append(
+                {"body": json.loads(body), "params": parse_qs(url.query)}
+            )
+            self._send(200, {"rows": [{"orders.revenue.value": 1}]})
+        elif url.path == "/api/4.0/query_tasks":
+            self._send(200, {"id": f"task-{json.loads(body)['query_id']}"})
+        elif url.path.startswith("/api/4.0/render_tasks/queries/"):
+            self._send(200, {"id": "rt1", "status": "enqueued_for_query"})
+        else:
+            self._send(404, {"message": "Not found"})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if not self._authorised():
+            return
+        if url.path == "/api/4.0/looks/1":
+            self._send(200, LOOK)
+        elif url.path == "/api/4.0/dashboards/7":
+            self._send(
+                200,
+                {
+                    "id": "7",
+                    "dashboard_elements": [
+                        {"id": "11", "title": "Revenue", "query": LOOK["query"]}
+                    ],
+                },
+            )
+        elif url.path == "/api/4.0/lookml_models/ecommerce/explores/orders":
+            self._send(
+                200,
+                {
+                    "fields": {
+                        "dimensions": [{"name": "orders.date"}],
+                        "measures": [{"name": "orders.revenue"}],
+                    }
+                },
+            )
+        elif url.path == "/api/4.0/looks/busy":
+            self._send(
+                429, {"message": "Too many requests"}, headers={"Retry-After": "4"}
+            )
+        elif url.path == "/api/4.0/queries/101/run/json_bi":
+            self.server.state["queries"].append({"params": parse_qs(url.query)})
+            self._send(200, {"rows": [{"orders.revenue.value": 1}]})
+        elif url.path == "/api/4.0/query_tasks/multi_results":
+            ids = parse_qs(url.query)["query_task_ids"][0].split(",")
+            self._send(200, {i: {"status": "complete", "data": {"id": i}} for i in ids})
+        elif url.path == "/api/4.0/render_tasks/rt1":
+            self._send(200, {"id": "rt1", "status": "success"})
+        elif url.path == "/api/4.0/render_tasks/rt1/results":
+            self._send(200, b"\x89PNG", content_type="image/png")
+        else:
+            self._send(404, {"message": "Not found"})
+
+
+@pytest.fixture
+def looker_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _LookerHandler)
+    server.state = {"logins": 0, "token": None, "queries": []}
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+    )
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _make_transport(server, **kwargs):
+    host, port = server.server_address
+    return transport_module.AsyncLookerTransport(
+        base_url=f"http://{host}:{port}",
+        client_id="id",
+        client_secret="secret",
+        **kwargs,
+    )
+
+
+def _run(transport, coro_factory):
+    """Run *coro_factory()* on a fresh loop and close the transport's pool."""
+
+    async def main():
+        try:
+            return await coro_factory()
+        finally:
+            await transport.aclose()
+
+    return asyncio.run(main())
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+
+class TestAsyncLookerTransport:
+    def test_is_available(self):
+        assert transport_module.is_available() is True
+
+    def test_look_is_deserialized_to_sdk_model(self, looker_server):
+        transport = _make_transport(looker_server)
+        look = _run(transport, lambda: transport.look("1"))
+        assert isinstance(look.query, models.Query)
+        assert look.query.filters == {"orders.region": "EU"}
+
+    def test_run_inline_query_serializes_body_and_params(self, looker_server):
+        transport = _make_transport(looker_server)
+        body = models.WriteQuery(model="ecommerce", view="orders", fields=["a"])
+        result = _run(
+            transport,
+            lambda: transport.run_inline_query(
+                result_format="json_bi", body=body, apply_vis=True, limit=None
+            ),
+        )
+        assert json.loads(result)["rows"][0]["orders.revenue.value"] == 1
+        sent = looker_server.state["queries"][0]
+        assert sent["body"] == {"model": "ecommerce", "view": "orders", "fields": ["a"]}
+        assert sent["params"] == {"apply_vis": ["true"]}
+
+    def test_run_query_by_id(self, looker_server):
+        transport = _make_transport(looker_server)
+        result = _run(
+            transport,
+            lambda: transport.run_query(
+                query_id="101", result_format="json_bi", apply_vis=False
+            ),
+        )
+        assert json.loads(result)["rows"][0]["orders.revenue.value"] == 1
+        assert looker_server.state["queries"][0]["params"] == {"apply_vis": ["false"]}
+
+    def test_run_query_unknown_id(self, looker_server):
+        transport = _make_transport(looker_server)
+        with pytest.raises(LookerAPIError) as excinfo:
+            _run(
+                transport,
+                lambda: transport.run_query(query_id="999", result_format="json"),
+            )
+        assert excinfo.value.status == 404
+
+    def test_concurrent_requests_share_one_login(self, looker_server):
+        transport = _make_transport(looker_server, max_connections=4)
+
+        async def many():
+            return await asyncio.gather(*(transport.look("1") for _ in range(10)))
+
+        looks = _run(transport, many)
+        assert len(looks) == 10
+        assert looker_server.state["logins"] == 1
+
+    def test_token_is_reused_after_pool_is_closed(self, looker_server):
+        transport = _make_transport(looker_server)
+        _run(transport, lambda: transport.look("1"))
+        _run(transport, lambda: transport.look("1"))
+        assert looker_server.state["logins"] == 1
+
+    def test_token_from_earlier_run_is_used(self, looker_server):
+        transport = _make_transport(looker_server)
+        looker_server.state["token"] = "from-earlier-run"
+        transport.use_token("from-earlier-run", 3600)
+        _run(transport, lambda: transport.look("1"))
+        assert looker_server.state["logins"] == 0
+        assert 3500 < transport.token_expires_in <= 3600
+
+    def test_relogin_on_401(self, looker_server):
+        transport = _make_transport(looker_server)
+        _run(transport, lambda: transport.look("1"))
+        # Simulate the server revoking the token.
+        looker_server.state["token"] = "revoked"
+        look = _run(transport, lambda: transport.look("1"))
+        assert look.id == "1"
+        assert looker_server.state["logins"] == 2
+
+    def test_error_status_raises_sdk_error(self, looker_server):
+        transport = _make_transport(looker_server)
+        with pytest.raises(looker_sdk.error.SDKError):
+            _run(transport, lambda: transport.look("404"))
+
+    def test_error_carries_status_and_retry_after(self, looker_server):
+        transport = _make_transport(looker_server)
+        with pytest.raises(LookerAPIError) as excinfo:
+            _run(transport, lambda: transport.look("busy"))
+        assert excinfo.value.status == 429
+        assert excinfo.value.retry_after == 4.0
+
+    def test_connection_failure_raises_retryable_error(self):
+        transport = transport_module.AsyncLookerTransport(
+            base_url="http://127.0.0.1:9", client_id="id", client_secret="secret"
+        )
+        transport.access_token = "token"
+        transport.token_expires_at = float("inf")
+        with pytest.raises(LookerAPIError) as excinfo:
+            _run(transport, lambda: transport.look("1"))
+        assert excinfo.value.status is None
+
+    def test_dashboard_and_explore(self, looker_server):
+        transport = _make_transport(looker_server)
+
+        async def fetch():
+            return (
+                await transport.dashboard("7", fields="id,dashboard_elements"),
+                await transport.lookml_model_explore(
+                    "ecommerce", "orders", fields="fields"
+                ),
+            )
+
+        dashboard, explore = _run(transport, fetch)
+        assert dashboard.dashboard_elements[0].query.view == "orders"
+        assert [m.name for m in explore.fields.measures] == ["orders.revenue"]
+        # One login for both calls.
+        assert looker_server.state["logins"] == 1
+
+    def test_render_task_round_trip(self, looker_server):
+        transport = _make_transport(looker_server)
+
+        async def render():
+            task = await transport.create_query_render_task("q1", "png", 100, 50)
+            status = await transport.render_task(task.id)
+            return status.status, await transport.render_task_results(task.id)
+
+        status, image = _run(transport, render)
+        assert status == "success"
+        assert image == b"\x89PNG"
+
+    def test_query_task_round_trip(self, looker_server):
+        transport = _make_transport(looker_server)
+
+        async def submit():
+            tasks = [
+                await transport.create_query_task(
+                    models.WriteCreateQueryTask(
+                        query_id=q, result_format=models.ResultFormat.json_bi
+                    ),
+                    apply_vis=True,
+                )
+                for q in ("q1", "q2")
+            ]
+            return await transport.query_task_multi_results([t.id for t in tasks])
+
+        results = _run(transport, submit)
+        assert results == {
+            "task-q1": {"status": "complete", "data": {"id": "task-q1"}},
+            "task-q2": {"status": "complete", "data": {"id": "task-q2"}},
+        }